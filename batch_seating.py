@@ -0,0 +1,252 @@
+'''
+Description: This script generates movie theater seat assignments for many
+independent showtimes at once, spreading the showtimes across a pool of
+worker processes.
+@manifest_file  filepath to a txt file with one showtime per line in the
+                format <shard_id> <input_file> [layout_file] or
+                <shard_id> <input_file> num_rows seats_per_row
+                space_between_res
+@output_dir     directory to write the per-showtime and merged output files to
+@num_workers    (optional) number of worker processes, one per CPU by default
+python3 batch_seating.py <manifest_file> <output_dir> [num_workers]
+'''
+
+import sys
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from movie_theater_seating import MovieTheaterSeating, TheaterLayout
+
+# A shard ID is used as the name of its output file, so it is limited to
+# letters, digits, underscores and hyphens and cannot name another directory
+SHARD_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+class BatchJob():
+    """
+    A class used to represent one showtime in a batch.
+
+    Attributes
+    ----------
+    shard_id : str
+        The unique ID of the showtime
+    input_path : str
+        The path to the txt file with the reservation requests
+    output_path : str
+        The path to write the reservation details to
+    layout : TheaterLayout
+        The geometry of the theater
+    """
+
+    def __init__(self, shard_id, input_path, output_path, layout=None):
+        """
+        Parameters
+        ----------
+        shard_id : str
+            The unique ID of the showtime
+        input_path : str
+            The path to the txt file with the reservation requests
+        output_path : str
+            The path to write the reservation details to
+        layout : TheaterLayout
+            The geometry of the theater, 10 rows of 20 seats with 3 seats
+            between reservations by default
+        """
+        self.shard_id = shard_id
+        self.input_path = input_path
+        self.output_path = output_path
+        self.layout = layout or TheaterLayout.uniform(10, 20, 3)
+
+def seat_shard(job):
+    """ Seats all the reservation requests for one showtime
+
+    Runs in a worker process, so any error is returned with the result
+    instead of stopping the rest of the batch.
+
+    Parameters
+    ----------
+    job : BatchJob
+        The showtime to seat
+
+    Returns
+    -------
+    result : dict
+        The shard ID, the output path, the number of reservations, the time
+        taken in seconds and the error message (None if the shard succeeded)
+    """
+    start = time.perf_counter()
+    error = None
+    num_reservations = 0
+    try:
+        movie_theater = MovieTheaterSeating(layout=job.layout,
+            retain_details=False)
+        movie_theater.process_requests(job.input_path, job.output_path)
+        num_reservations = len(movie_theater.reservation_ids)
+    except Exception as e:
+        error = str(e)
+    return {
+        "shard_id": job.shard_id,
+        "output_path": os.path.abspath(job.output_path),
+        "reservations": num_reservations,
+        "seconds": time.perf_counter() - start,
+        "error": error
+    }
+
+def merge_outputs(results, merged_path):
+    """ Merges the output files of the successful shards into one file
+
+    Each line of the merged file is the shard ID followed by a line of that
+    shard's output file.
+
+    Parameters
+    ----------
+    results : list
+        The results returned by seat_shard, in the order to merge them
+    merged_path : str
+        The path to write the merged output to
+
+    Returns
+    -------
+    abs_path : str
+        The absolute path to the merged output file
+    """
+    with open(merged_path, 'w') as merged:
+        for result in results:
+            if result["error"] is not None:
+                continue
+            with open(result["output_path"], 'r') as f:
+                for line in f:
+                    merged.write(result["shard_id"] + " " + line)
+    return os.path.abspath(merged_path)
+
+def run_batch(jobs, merged_path, max_workers=None):
+    """ Seats every showtime in a batch across a pool of worker processes
+
+    Parameters
+    ----------
+    jobs : list
+        The BatchJob for each showtime
+    merged_path : str
+        The path to write the merged output to
+    max_workers : int
+        The number of worker processes, one per CPU by default
+
+    Raises
+    ------
+    Exception
+        If two jobs have the same shard ID
+
+    Returns
+    -------
+    results : list
+        The result of each shard in the order of the jobs
+    """
+    shard_ids = set()
+    for job in jobs:
+        if job.shard_id in shard_ids:
+            raise Exception("Duplicate shard ID " + job.shard_id)
+        shard_ids.add(job.shard_id)
+    # Showtimes are independent, so each one is seated in its own task.
+    # Small batches of tasks are sent to each worker to cut down on the
+    # cost of passing jobs between processes
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(seat_shard, jobs, chunksize=chunksize))
+    merge_outputs(results, merged_path)
+    return results
+
+def read_manifest(manifest_path, output_dir):
+    """ Reads the showtimes in a batch from a manifest file
+
+    Parameters
+    ----------
+    manifest_path : str
+        The path to the manifest file
+    output_dir : str
+        The directory to write the output file of each showtime to
+
+    Raises
+    ------
+    Exception
+        If a line of the manifest does not have 2, 3 or 5 parameters
+        If a shard ID is not made of letters, digits, underscores and
+        hyphens, or is "merged"
+        If the theater layout of a showtime is not made of numbers
+
+    Returns
+    -------
+    jobs : list
+        The BatchJob for each showtime in the manifest
+    """
+    jobs = []
+    # Input paths in the manifest are relative to the manifest itself
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r') as f:
+        for line in f:
+            params = line.split()
+            # Skip blank lines
+            if len(params) == 0:
+                continue
+            if len(params) not in (2, 3, 5):
+                raise Exception("Invalid manifest line: " + line.strip())
+            shard_id = params[0]
+            # The merged output file is named merged.txt, so no shard may
+            # use that name
+            if SHARD_ID.fullmatch(shard_id) is None or shard_id == "merged":
+                raise Exception("Invalid shard ID: " + shard_id)
+            input_path = os.path.join(manifest_dir, params[1])
+            output_path = os.path.join(output_dir, shard_id + ".txt")
+            layout = None
+            # The theater layout is either a layout file or the number of
+            # rows, seats per row and space between reservations
+            if len(params) == 3:
+                layout = TheaterLayout.from_file(os.path.join(manifest_dir,
+                    params[2]))
+            elif len(params) == 5:
+                if not all(param.isnumeric() for param in params[2:]):
+                    raise Exception("Invalid theater layout: " + line.strip())
+                layout = TheaterLayout.uniform(*(int(param) for param in
+                    params[2:]))
+            jobs.append(BatchJob(shard_id, input_path, output_path, layout))
+    return jobs
+
+def main():
+    """ Main function to seat a batch of showtimes
+
+    Parameters
+    ----------
+    None
+
+    Raises
+    ------
+    Exception
+        If the wrong number of arguments is provided in the terminal
+
+    Returns
+    -------
+    None
+    """
+    if len(sys.argv) < 3 or len(sys.argv) > 4:
+        raise Exception("Usage: python3 batch_seating.py <manifest_file> " + \
+            "<output_dir> [num_workers]")
+    manifest_path = sys.argv[1]
+    output_dir = sys.argv[2]
+    max_workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = read_manifest(manifest_path, output_dir)
+    merged_path = os.path.join(output_dir, "merged.txt")
+    start = time.perf_counter()
+    results = run_batch(jobs, merged_path, max_workers)
+    total = time.perf_counter() - start
+    # Report the time taken by each shard
+    for result in results:
+        status = "ok" if result["error"] is None else \
+            "failed: " + result["error"]
+        print("%s %d reservations %.4fs %s" % (result["shard_id"],
+            result["reservations"], result["seconds"], status))
+    print("%d shards in %.4fs" % (len(results), total))
+    print(os.path.abspath(merged_path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+'''
+Description: This script contains unit tests for the batch_seating.py
+script.
+python3 batch_seating_test.py
+'''
+
+import tempfile
+import unittest
+from pathlib import Path
+from batch_seating import BatchJob, seat_shard, run_batch, read_manifest
+from movie_theater_seating import TheaterLayout
+
+THIS_DIR = Path(__file__)
+
+class TestBatchSeating(unittest.TestCase):
+    """
+    Tests the functions in batch_seating.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.tmp_dir.name)
+        self.input_path = THIS_DIR.parent / 'test_data/input.txt'
+
+    def tearDown(self):
+        """
+        Removes the output files written by each test
+        """
+        self.tmp_dir.cleanup()
+
+    def test_seat_shard(self):
+        """
+        Tests the seat_shard function.
+        """
+        result = seat_shard(BatchJob("S1", self.input_path,
+            self.output_dir / "S1.txt"))
+        self.assertEqual(result["error"], None)
+        self.assertEqual(result["reservations"], 31)
+        lines = (self.output_dir / "S1.txt").read_text().split('\n')
+        self.assertEqual(lines[0], "R001 J1 J2")
+        self.assertEqual(lines[30], "R0031 F20")
+        result = seat_shard(BatchJob("S2", THIS_DIR.parent / \
+            'test_data/test_parse_input/test_parse_input_1.txt',
+            self.output_dir / "S2.txt"))
+        self.assertEqual(result["error"], "Too many parameters")
+
+    def test_run_batch(self):
+        """
+        Tests the run_batch function.
+        """
+        jobs = [BatchJob("S1", self.input_path, self.output_dir / "S1.txt"),
+            BatchJob("S2", THIS_DIR.parent / \
+            'test_data/test_parse_input/test_parse_input_6.txt',
+            self.output_dir / "S2.txt", TheaterLayout.uniform(2, 5, 1))]
+        results = run_batch(jobs, self.output_dir / "merged.txt",
+            max_workers=2)
+        self.assertEqual([result["shard_id"] for result in results],
+            ["S1", "S2"])
+        merged = (self.output_dir / "merged.txt").read_text().split('\n')
+        self.assertEqual(merged[0], "S1 R001 J1 J2")
+        self.assertEqual(merged[31], "S2 R001 B1 B2")
+        self.assertEqual(len(merged), 33)
+        with self.assertRaises(Exception):
+            run_batch([jobs[0], jobs[0]], self.output_dir / "merged.txt")
+
+    def test_read_manifest(self):
+        """
+        Tests the read_manifest function.
+        """
+        manifest_path = self.output_dir / "manifest.txt"
+        (self.output_dir / "layout.json").write_text(
+            '{"seats_per_row": [6, 8, 10], "space_between_res": 1}')
+        manifest_path.write_text("S1 input.txt\n\nS2 input.txt 5 8 2\n" + \
+            "S3 input.txt layout.json\n")
+        jobs = read_manifest(manifest_path, self.output_dir)
+        self.assertEqual(jobs[0].layout.seats_per_row, [20] * 10)
+        self.assertEqual(jobs[0].layout.space_between_res, 3)
+        self.assertEqual(jobs[1].layout.seats_per_row, [8] * 5)
+        self.assertEqual(jobs[1].layout.space_between_res, 2)
+        self.assertEqual(jobs[1].output_path, str(self.output_dir / "S2.txt"))
+        self.assertEqual(jobs[2].layout.seats_per_row, [6, 8, 10])
+        manifest_path.write_text("S1 input.txt 5 8\n")
+        with self.assertRaises(Exception):
+            read_manifest(manifest_path, self.output_dir)
+        # Shard IDs that would write outside the output directory or over
+        # the merged output
+        for shard_id in ("../S1", "sub/S1", "..", "S1.txt", "merged"):
+            manifest_path.write_text(shard_id + " input.txt\n")
+            with self.assertRaisesRegex(Exception, "Invalid shard ID"):
+                read_manifest(manifest_path, self.output_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,484 @@
+'''
+Description: This script provides a concurrency-safe booking API for a box
+office that sells seats for many showtimes at once, and a load benchmark
+for it.
+@num_requests   number of booking attempts to make in the benchmark
+@num_workers    number of threads (and concurrent async clients) to book with
+python3 box_office.py <num_requests> <num_workers>
+'''
+
+import sys
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from movie_theater_seating import MovieTheaterSeating
+
+class BoxOffice():
+    """
+    A class used to book seats for many showtimes from many threads.
+
+    Every showtime has its own lock, so bookings for different showtimes
+    never wait for each other, and bookings for the same showtime are made
+    one at a time in the order their threads acquire the lock.
+
+    Attributes
+    ----------
+    theaters : dict
+        The MovieTheaterSeating of each showtime ID
+    locks : dict
+        The lock guarding the MovieTheaterSeating of each showtime ID
+    registry_lock : threading.Lock
+        The lock guarding the addition of new showtimes
+
+    Methods
+    -------
+    add_showtime(showtime_id, movie_theater=None)
+        Adds a showtime to the box office
+    reserve(showtime_id, res_id, num_seats_reserved)
+        Books seats for a reservation in a showtime
+    get_reservation(showtime_id, res_id)
+        Gets the reservation details for a reservation in a showtime
+    """
+
+    def __init__(self):
+        self.theaters = {}
+        self.locks = {}
+        self.registry_lock = threading.Lock()
+
+    def add_showtime(self, showtime_id, movie_theater=None):
+        """ Adds a showtime to the box office
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        movie_theater : MovieTheaterSeating
+            The theater to seat the showtime in, an empty 10x20 theater by
+            default
+
+        Raises
+        ------
+        Exception
+            If the showtime ID was already added
+
+        Returns
+        -------
+        None
+        """
+        with self.registry_lock:
+            if showtime_id in self.theaters:
+                raise Exception("Showtime already added")
+            self.locks[showtime_id] = threading.Lock()
+            self.theaters[showtime_id] = movie_theater or MovieTheaterSeating()
+
+    def reserve(self, showtime_id, res_id, num_seats_reserved):
+        """ Books seats for a reservation in a showtime
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        res_id : str
+            The reservation ID associated with this reservation
+        num_seats_reserved : int
+            The number of seats requested
+
+        Raises
+        ------
+        Exception
+            If the showtime does not exist
+            If the number of seats requested is negative or 0
+            If there is a duplicate reservation ID
+            If too many seats are requested
+            If there are not enough seats left together to seat the group
+
+        Returns
+        -------
+        res_details : str
+            A string with the seats of the reservation
+        """
+        if showtime_id not in self.theaters:
+            raise Exception("Showtime does not exist")
+        if num_seats_reserved <= 0:
+            raise Exception("Number of seats requested is " + \
+            "less than or equal to 0")
+        with self.locks[showtime_id]:
+            movie_theater = self.theaters[showtime_id]
+            new_res_id = res_id not in movie_theater.reservation_ids
+            try:
+                res_details = movie_theater.make_reservation(res_id,
+                    num_seats_reserved)
+                if res_id not in movie_theater.bookings:
+                    raise Exception(res_details)
+            except Exception:
+                # Free the reservation ID of a booking that was not seated so
+                # the caller can try again with fewer seats
+                if new_res_id:
+                    movie_theater.cancel_reservation(res_id)
+                raise
+            return res_details
+
+    def get_reservation(self, showtime_id, res_id):
+        """ Gets the reservation details for a reservation in a showtime
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        res_id : str
+            The reservation ID to look up
+
+        Raises
+        ------
+        Exception
+            If the showtime does not exist
+
+        Returns
+        -------
+        res_details : str
+            The reservation details, or None if the reservation was not made
+        """
+        if showtime_id not in self.theaters:
+            raise Exception("Showtime does not exist")
+        with self.locks[showtime_id]:
+            return self.theaters[showtime_id].reservation_details.get(res_id)
+
+class AsyncBoxOffice():
+    """
+    A class used to book seats for many showtimes from asyncio tasks.
+
+    Every showtime has a queue drained by a single writer task, so bookings
+    are made strictly in the order reserve() was called. The writer books
+    everything waiting in its queue in one batch, holding the showtime lock
+    of the underlying BoxOffice, so threads can share the same box office.
+
+    Attributes
+    ----------
+    box_office : BoxOffice
+        The thread-safe box office that makes the bookings
+    queues : dict
+        The queue of pending bookings of each showtime ID
+    writers : dict
+        The writer task of each showtime ID
+
+    Methods
+    -------
+    add_showtime(showtime_id, movie_theater=None)
+        Adds a showtime to the box office
+    reserve(showtime_id, res_id, num_seats_reserved)
+        Books seats for a reservation in a showtime
+    close()
+        Stops the writer tasks
+    """
+
+    def __init__(self, box_office=None):
+        """
+        Parameters
+        ----------
+        box_office : BoxOffice
+            The thread-safe box office that makes the bookings, a new empty
+            one by default
+        """
+        self.box_office = box_office or BoxOffice()
+        self.queues = {}
+        self.writers = {}
+
+    def add_showtime(self, showtime_id, movie_theater=None):
+        """ Adds a showtime to the box office
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        movie_theater : MovieTheaterSeating
+            The theater to seat the showtime in, an empty 10x20 theater by
+            default
+
+        Returns
+        -------
+        None
+        """
+        self.box_office.add_showtime(showtime_id, movie_theater)
+
+    async def reserve(self, showtime_id, res_id, num_seats_reserved):
+        """ Books seats for a reservation in a showtime
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        res_id : str
+            The reservation ID associated with this reservation
+        num_seats_reserved : int
+            The number of seats requested
+
+        Raises
+        ------
+        Exception
+            If the booking fails for any of the reasons in BoxOffice.reserve
+
+        Returns
+        -------
+        res_details : str
+            A string with the reservation details for this reservation ID
+        """
+        queue = self.queues.get(showtime_id)
+        if queue is None:
+            # Only showtimes that exist get a queue and a writer task, so
+            # requests for unknown showtimes leave nothing behind
+            if showtime_id not in self.box_office.theaters:
+                raise Exception("Showtime does not exist")
+            queue = self.queues[showtime_id] = asyncio.Queue()
+            self.writers[showtime_id] = asyncio.create_task(
+                self.write_bookings(showtime_id, queue))
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((res_id, num_seats_reserved, future))
+        return await future
+
+    async def write_bookings(self, showtime_id, queue):
+        """ Books the pending reservations of a showtime in arrival order
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        queue : asyncio.Queue
+            The queue of pending bookings of the showtime
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            # Wait for a booking, then take every other booking already
+            # waiting so they are all made in one batch
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for res_id, num_seats_reserved, future in batch:
+                try:
+                    result = self.box_office.reserve(showtime_id, res_id,
+                        num_seats_reserved)
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+
+    async def close(self):
+        """ Stops the writer tasks
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        for writer in self.writers.values():
+            writer.cancel()
+        await asyncio.gather(*self.writers.values(), return_exceptions=True)
+        self.queues.clear()
+        self.writers.clear()
+
+def percentile(values, p):
+    """ Gets the p-th percentile of a list of sorted values
+
+    Parameters
+    ----------
+    values : list
+        The values sorted in ascending order
+    p : float
+        The percentile between 0 and 100
+
+    Returns
+    -------
+    value : float
+        The p-th percentile of the values, or 0 if there are no values
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def summarize(mode, latencies, seconds):
+    """ Summarizes the throughput and latency of a benchmark run
+
+    Parameters
+    ----------
+    mode : str
+        The name of the benchmark run
+    latencies : list
+        The latency of each booking attempt in seconds
+    seconds : float
+        The total time of the run in seconds
+
+    Returns
+    -------
+    summary : dict
+        The number of bookings, bookings per second and the p50, p99 and
+        max latency in milliseconds
+    """
+    latencies.sort()
+    return {
+        "mode": mode,
+        "bookings": len(latencies),
+        "bookings_per_second": len(latencies) / seconds if seconds else 0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0
+    }
+
+def generate_bookings(num_requests, num_showtimes, seed=0):
+    """ Generates random booking attempts spread over some showtimes
+
+    Parameters
+    ----------
+    num_requests : int
+        The number of booking attempts
+    num_showtimes : int
+        The number of showtimes to spread the bookings over
+    seed : int
+        The seed of the random number generator
+
+    Returns
+    -------
+    bookings : list
+        A list of (showtime ID, reservation ID, number of seats) tuples
+    """
+    rng = random.Random(seed)
+    return [("S%d" % rng.randrange(num_showtimes), "R%d" % i,
+        rng.randint(1, 8)) for i in range(num_requests)]
+
+def book_and_time(box_office, booking):
+    """ Makes one booking attempt and measures its latency
+
+    Parameters
+    ----------
+    box_office : BoxOffice
+        The box office to book with
+    booking : tuple
+        The showtime ID, reservation ID and number of seats to book
+
+    Returns
+    -------
+    latency : float
+        The time taken by the attempt in seconds
+    """
+    start = time.perf_counter()
+    try:
+        box_office.reserve(*booking)
+    except Exception:
+        # A full theater is part of the load being measured
+        pass
+    return time.perf_counter() - start
+
+def run_thread_benchmark(bookings, num_showtimes, num_workers, layout):
+    """ Measures booking throughput and latency from many threads
+
+    Parameters
+    ----------
+    bookings : list
+        The booking attempts to make
+    num_showtimes : int
+        The number of showtimes the bookings are spread over
+    num_workers : int
+        The number of threads to book from
+    layout : tuple
+        The number of rows, seats per row and space between reservations of
+        each theater
+
+    Returns
+    -------
+    summary : dict
+        The throughput and latency of the run
+    """
+    box_office = BoxOffice()
+    for i in range(num_showtimes):
+        box_office.add_showtime("S%d" % i, MovieTheaterSeating(*layout))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        latencies = list(executor.map(lambda booking: book_and_time(
+            box_office, booking), bookings))
+    return summarize("threads", latencies, time.perf_counter() - start)
+
+async def run_async_benchmark(bookings, num_showtimes, num_workers, layout):
+    """ Measures booking throughput and latency from many asyncio clients
+
+    Parameters
+    ----------
+    bookings : list
+        The booking attempts to make
+    num_showtimes : int
+        The number of showtimes the bookings are spread over
+    num_workers : int
+        The number of booking attempts in flight at once
+    layout : tuple
+        The number of rows, seats per row and space between reservations of
+        each theater
+
+    Returns
+    -------
+    summary : dict
+        The throughput and latency of the run
+    """
+    box_office = AsyncBoxOffice()
+    for i in range(num_showtimes):
+        box_office.add_showtime("S%d" % i, MovieTheaterSeating(*layout))
+    latencies = []
+    semaphore = asyncio.Semaphore(num_workers)
+
+    async def book(booking):
+        async with semaphore:
+            booking_start = time.perf_counter()
+            try:
+                await box_office.reserve(*booking)
+            except Exception:
+                pass
+            latencies.append(time.perf_counter() - booking_start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(book(booking) for booking in bookings))
+    seconds = time.perf_counter() - start
+    await box_office.close()
+    return summarize("asyncio", latencies, seconds)
+
+def main():
+    """ Main function to run the load benchmark
+
+    Parameters
+    ----------
+    None
+
+    Raises
+    ------
+    Exception
+        If the wrong number of arguments is provided in the terminal
+
+    Returns
+    -------
+    None
+    """
+    if len(sys.argv) != 3:
+        raise Exception("Usage: python3 box_office.py <num_requests> " + \
+            "<num_workers>")
+    num_requests = int(sys.argv[1])
+    num_workers = int(sys.argv[2])
+    num_showtimes = 10
+    # Large theaters so most attempts find seats
+    layout = (100, 100, 3)
+    bookings = generate_bookings(num_requests, num_showtimes)
+    summaries = [run_thread_benchmark(bookings, num_showtimes, num_workers,
+        layout), asyncio.run(run_async_benchmark(bookings, num_showtimes,
+        num_workers, layout))]
+    for summary in summaries:
+        print("%s: %d bookings, %.0f bookings/s, p50 %.3fms, p99 %.3fms, " \
+            "max %.3fms" % (summary["mode"], summary["bookings"],
+            summary["bookings_per_second"], summary["p50_ms"],
+            summary["p99_ms"], summary["max_ms"]))
+
+if __name__ == "__main__":
+    main()
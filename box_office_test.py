@@ -0,0 +1,122 @@
+'''
+Description: This script contains unit tests for the box_office.py script.
+python3 box_office_test.py
+'''
+
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from box_office import BoxOffice, AsyncBoxOffice, generate_bookings, \
+    run_thread_benchmark, run_async_benchmark
+from movie_theater_seating import MovieTheaterSeating
+
+class TestBoxOffice(unittest.TestCase):
+    """
+    Tests the functions in box_office.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.box_office = BoxOffice()
+        self.box_office.add_showtime("S1")
+
+    def test_reserve(self):
+        """
+        Tests the reserve function.
+        """
+        self.assertEqual(self.box_office.reserve("S1", "R001", 2), "J1 J2")
+        self.assertEqual(self.box_office.get_reservation("S1", "R001"),
+            "J1 J2")
+        with self.assertRaises(Exception):
+            self.box_office.reserve("S1", "R001", 2)
+        with self.assertRaises(Exception):
+            self.box_office.reserve("S1", "R002", 0)
+        with self.assertRaises(Exception):
+            self.box_office.reserve("S2", "R003", 2)
+        with self.assertRaisesRegex(Exception, "Showtime does not exist"):
+            self.box_office.get_reservation("S2", "R001")
+        with self.assertRaises(Exception):
+            self.box_office.add_showtime("S1")
+
+    def test_reserve_failures(self):
+        """
+        Tests that a booking that cannot be seated raises and frees its
+        reservation ID.
+        """
+        with self.assertRaisesRegex(Exception, "too many seats"):
+            self.box_office.reserve("S1", "R001", 201)
+        self.assertEqual(self.box_office.reserve("S1", "R001", 18),
+            " ".join("J%d" % i for i in range(1, 19)))
+        for i in range(9):
+            self.box_office.reserve("S1", "F%d" % i, 18)
+        # 20 seats are left, but no row has 3 together
+        with self.assertRaisesRegex(Exception, "not enough seats"):
+            self.box_office.reserve("S1", "R002", 3)
+        movie_theater = self.box_office.theaters["S1"]
+        self.assertNotIn("R002", movie_theater.reservation_ids)
+        self.assertIsNone(self.box_office.get_reservation("S1", "R002"))
+        movie_theater.cancel_reservation("R001")
+        self.assertEqual(self.box_office.reserve("S1", "R002", 3),
+            "J1 J2 J3")
+        # A duplicate ID keeps the reservation it belongs to
+        with self.assertRaisesRegex(Exception, "already made"):
+            self.box_office.reserve("S1", "R002", 1)
+        self.assertEqual(self.box_office.get_reservation("S1", "R002"),
+            "J1 J2 J3")
+
+    def test_reserve_threads(self):
+        """
+        Tests the reserve function from many threads at once.
+        """
+        self.box_office.add_showtime("S2", MovieTheaterSeating(100, 100, 3))
+        bookings = [("S2", "R%d" % i, 2) for i in range(2000)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda booking:
+                self.box_office.reserve(*booking), bookings))
+        # Every seat is handed out exactly once
+        seats = [seat for result in results for seat in result.split(' ')]
+        self.assertEqual(len(seats), 4000)
+        self.assertEqual(len(set(seats)), 4000)
+        self.assertEqual(self.box_office.theaters["S2"].available_seats, 6000)
+
+    def test_async_reserve(self):
+        """
+        Tests the reserve function of AsyncBoxOffice.
+        """
+        async def book():
+            box_office = AsyncBoxOffice(self.box_office)
+            results = await asyncio.gather(
+                box_office.reserve("S1", "R001", 2),
+                box_office.reserve("S1", "R002", 4),
+                box_office.reserve("S1", "R001", 1),
+                box_office.reserve("S2", "R003", 1),
+                return_exceptions=True)
+            showtime_ids = sorted(box_office.queues)
+            await box_office.close()
+            return results, showtime_ids
+        results, showtime_ids = asyncio.run(book())
+        # Bookings are made in the order they were requested
+        self.assertEqual(results[0], "J1 J2")
+        self.assertEqual(results[1], "J6 J7 J8 J9")
+        self.assertIsInstance(results[2], Exception)
+        self.assertEqual(str(results[3]), "Showtime does not exist")
+        # No queue is left behind for the unknown showtime
+        self.assertEqual(showtime_ids, ["S1"])
+
+    def test_benchmark(self):
+        """
+        Tests the run_thread_benchmark and run_async_benchmark functions.
+        """
+        bookings = generate_bookings(200, 2)
+        summary = run_thread_benchmark(bookings, 2, 4, (10, 20, 3))
+        self.assertEqual(summary["bookings"], 200)
+        self.assertGreater(summary["bookings_per_second"], 0)
+        self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+        summary = asyncio.run(run_async_benchmark(bookings, 2, 4,
+            (10, 20, 3)))
+        self.assertEqual(summary["bookings"], 200)
+        self.assertLessEqual(summary["p99_ms"], summary["max_ms"])
+
+if __name__ == '__main__':
+    unittest.main()
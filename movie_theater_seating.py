@@ -4,11 +4,1085 @@ Date: 5/13/2022
 Description: This script generates movie theater seat assignments given
 an input file with movie theater reservation requests.
 @input_file     filepath to the txt file with the reservation requests
-python3 movie_theater_seating.py <input_file>
+@output_file    (optional) filepath to write the seat assignments to, as
+                CSV if it ends in .csv or as binary records if it ends in
+                .bin
+@reject_report  (optional) filepath to write the invalid lines to instead of
+                stopping at the first one
+python3 movie_theater_seating.py <input_file> [output_file] [reject_report]
 '''
 
 import sys
 import os
+import re
+import json
+import struct
+import warnings
+from bisect import bisect_left, insort
+
+# Occupancy codes for the seats in a row
+FREE = 0
+RESERVED = 1
+BUFFER = 2
+
+# Matches each run of free seats in an occupancy vector
+FREE_RUN = re.compile(bytes([FREE]) + b'+')
+
+# The strategies for choosing the seats of a group within a row
+PLACEMENTS = ("first", "best_fit", "center")
+
+# The number of characters of the input file parsed at a time
+READ_CHUNK_SIZE = 1 << 20
+# The number of seats of each common request by its text, which is faster to
+# look up than to convert with int()
+SEAT_COUNTS = {str(i): i for i in range(1, 1000)}
+
+# The first bytes and the version of a binary output file
+OUTPUT_MAGIC = b"MTSO"
+OUTPUT_VERSION = 1
+# The header of a binary output file: magic and version
+OUTPUT_HEADER = struct.Struct("<4sH")
+# The fixed part of a binary output record: reservation ID length, row ID
+# length, first seat number and number of seats. A reservation that was not
+# seated has an empty row ID, the position of its message in OUTPUT_MESSAGES
+# as its first seat, and no seats. A message that is not in OUTPUT_MESSAGES
+# has position 0 and follows the reservation ID, with its length as the
+# number of seats
+OUTPUT_RECORD = struct.Struct("<HBHH")
+# The common messages of reservations that were not seated
+OUTPUT_MESSAGES = (None,
+    "Reservation cannot be made, not enough seats available",
+    "Reservation cannot be made, too many seats requested")
+# The position of each common message in OUTPUT_MESSAGES
+OUTPUT_MESSAGE_CODES = {message: code for code, message in
+    enumerate(OUTPUT_MESSAGES) if code > 0}
+
+class SeatRow():
+    """
+    A class used to represent the occupancy of one row in the theater.
+
+    Each seat is stored as one byte in an occupancy vector, so a row costs
+    about one byte per seat instead of one list slot per seat. The free
+    seats are also kept as sorted runs of consecutive seats, so seats that
+    are released can be merged with their neighbors with a binary search.
+
+    A run that ends before the end of the row is followed by an occupied
+    seat, so a group seated in it must leave the buffer seats empty after
+    it. The capacity of a run is the largest group it can seat: its length
+    if it reaches the end of the row, otherwise its length minus the space
+    between reservations.
+
+    Attributes
+    ----------
+    occupancy : bytearray
+        The occupancy code (FREE, RESERVED or BUFFER) of each seat in the row
+    free : int
+        The number of free seats in the row
+    space_between_res : int
+        The amount of space (seats) needed between 2 reservations
+    run_starts : list
+        The index of the first seat of each free run, in ascending order
+    run_ends : list
+        The index after the last seat of each free run, in the order of
+        run_starts
+    capacities : list
+        The (capacity, first seat) of each free run, in ascending order
+
+    Methods
+    -------
+    get_capacity(start, end)
+        Gets the largest group that can be seated in a free run
+    find_run(num_seats_reserved)
+        Finds the first free run that can seat a group
+    find_best_fit_run(num_seats_reserved)
+        Finds the smallest free run that can seat a group
+    find_center_seats(num_seats_reserved)
+        Finds the seats closest to the center of the row that can seat a
+        group
+    occupy(first_seat, num_seats_reserved, num_buffer_seats)
+        Marks specific seats in the row as reserved, followed by buffer seats
+    reserve(num_seats_reserved, placement="first")
+        Seats a group in the free run chosen by a placement strategy
+    release(first_seat, num_seats)
+        Marks seats as free again and merges them with the neighboring runs
+    from_occupancy(occupancy, space_between_res=0)
+        Creates a row from the occupancy code of each of its seats
+    copy()
+        Creates an independent copy of the row
+    """
+
+    __slots__ = ('occupancy', 'free', 'space_between_res', 'run_starts',
+        'run_ends', 'capacities')
+
+    def __init__(self, num_seats, space_between_res=0):
+        """
+        Parameters
+        ----------
+        num_seats : int
+            The number of seats in the row
+        space_between_res : int
+            The amount of space (seats) needed between 2 reservations
+        """
+        self.occupancy = bytearray(num_seats)
+        self.free = num_seats
+        self.space_between_res = space_between_res
+        self.run_starts = [0]
+        self.run_ends = [num_seats]
+        self.capacities = [(num_seats, 0)]
+
+    @classmethod
+    def from_occupancy(cls, occupancy, space_between_res=0):
+        """ Creates a row from the occupancy code of each of its seats
+
+        Parameters
+        ----------
+        occupancy : bytes
+            The occupancy code (FREE, RESERVED or BUFFER) of each seat
+        space_between_res : int
+            The amount of space (seats) needed between 2 reservations
+
+        Returns
+        -------
+        row : SeatRow
+            The row with its free runs rebuilt from the occupancy
+        """
+        row = cls(0, space_between_res)
+        row.occupancy = bytearray(occupancy)
+        row.run_starts = []
+        row.run_ends = []
+        row.capacities = []
+        row.free = 0
+        for run in FREE_RUN.finditer(row.occupancy):
+            row.run_starts.append(run.start())
+            row.run_ends.append(run.end())
+            row.capacities.append((row.get_capacity(run.start(), run.end()),
+                run.start()))
+            row.free += run.end() - run.start()
+        row.capacities.sort()
+        return row
+
+    def copy(self):
+        """ Creates an independent copy of the row
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        row : SeatRow
+            A row with the same seats that can be changed without changing
+            this one
+        """
+        row = SeatRow.__new__(SeatRow)
+        row.occupancy = bytearray(self.occupancy)
+        row.free = self.free
+        row.space_between_res = self.space_between_res
+        row.run_starts = self.run_starts[:]
+        row.run_ends = self.run_ends[:]
+        row.capacities = self.capacities[:]
+        return row
+
+    def __len__(self):
+        """ Returns the largest group that can be seated in the row """
+        return self.capacities[-1][0] if self.capacities else 0
+
+    def __getitem__(self, i):
+        """ Returns the seat number of the i-th free seat in the row """
+        if i < 0:
+            i += self.free
+        if i < 0 or i >= self.free:
+            raise IndexError("Seat index out of range")
+        for start, end in zip(self.run_starts, self.run_ends):
+            if i < end - start:
+                return start + i + 1
+            i -= end - start
+
+    def __iter__(self):
+        """ Iterates over the seat numbers of the free seats in the row """
+        for start, end in zip(self.run_starts, self.run_ends):
+            yield from range(start + 1, end + 1)
+
+    def get_capacity(self, start, end):
+        """ Gets the largest group that can be seated in a free run
+
+        Parameters
+        ----------
+        start : int
+            The index of the first seat of the run
+        end : int
+            The index after the last seat of the run
+
+        Returns
+        -------
+        capacity : int
+            The number of seats of the largest group the run can seat
+        """
+        if end == len(self.occupancy):
+            return end - start
+        return max(0, end - start - self.space_between_res)
+
+    def add_run(self, start, end):
+        """ Adds a free run to the sorted runs """
+        i = bisect_left(self.run_starts, start)
+        self.run_starts.insert(i, start)
+        self.run_ends.insert(i, end)
+        insort(self.capacities, (self.get_capacity(start, end), start))
+
+    def remove_run(self, i):
+        """ Removes the i-th free run from the sorted runs """
+        start = self.run_starts.pop(i)
+        end = self.run_ends.pop(i)
+        del self.capacities[bisect_left(self.capacities,
+            (self.get_capacity(start, end), start))]
+
+    def find_run(self, num_seats_reserved):
+        """ Finds the first free run that can seat a group
+
+        Parameters
+        ----------
+        num_seats_reserved : int
+            The number of seats in the reservation
+
+        Returns
+        -------
+        i : int
+            The position of the run in run_starts, or None if no run can
+            seat the group
+        """
+        for i in range(0, len(self.run_starts)):
+            if self.get_capacity(self.run_starts[i], self.run_ends[i]) >= \
+                num_seats_reserved:
+                return i
+        return None
+
+    def find_best_fit_run(self, num_seats_reserved):
+        """ Finds the smallest free run that can seat a group
+
+        Parameters
+        ----------
+        num_seats_reserved : int
+            The number of seats in the reservation
+
+        Returns
+        -------
+        i : int
+            The position of the run in run_starts, or None if no run can
+            seat the group
+        """
+        # The capacities are sorted, so the first one that fits is the
+        # smallest run, with ties going to the run closest to the first seat
+        j = bisect_left(self.capacities, (num_seats_reserved,))
+        if j == len(self.capacities):
+            return None
+        return bisect_left(self.run_starts, self.capacities[j][1])
+
+    def find_center_seats(self, num_seats_reserved):
+        """ Finds the seats closest to the center of the row that can seat
+        a group
+
+        The runs are searched outward from the run holding the center of the
+        row, and the search stops in each direction as soon as no run
+        farther out can be closer to the center than the best seats found.
+
+        Parameters
+        ----------
+        num_seats_reserved : int
+            The number of seats in the reservation
+
+        Returns
+        -------
+        seats : tuple
+            The index of the first seat and the number of buffer seats, or
+            None if no run can seat the group
+        """
+        num_seats = len(self.occupancy)
+        # Distances are measured between doubled positions, so the center
+        # of the row and of the group are always whole numbers
+        ideal_seat = (num_seats - num_seats_reserved) // 2
+        best = None
+        best_distance = None
+        center = bisect_left(self.run_starts, ideal_seat + 1) - 1
+        # Search the runs to the left of the center and then to the right
+        for runs, bound in ((range(center, -1, -1), lambda start, end:
+            num_seats - 2 * end + num_seats_reserved), (range(center + 1,
+            len(self.run_starts)), lambda start, end: 2 * start + \
+            num_seats_reserved - num_seats)):
+            for i in runs:
+                start = self.run_starts[i]
+                end = self.run_ends[i]
+                if best is not None and bound(start, end) > best_distance:
+                    break
+                if self.get_capacity(start, end) < num_seats_reserved:
+                    continue
+                last_seat = end - num_seats_reserved
+                if end < num_seats:
+                    last_seat -= self.space_between_res
+                first_seat = min(max(ideal_seat, start), last_seat)
+                distance = abs(2 * first_seat + num_seats_reserved - \
+                    num_seats)
+                if best is None or (distance, first_seat) < (best_distance,
+                    best):
+                    best = first_seat
+                    best_distance = distance
+        if best is None:
+            return None
+        # Any seats between the group and the end of the row that are too
+        # few to keep a full buffer are left empty as well
+        i = bisect_left(self.run_starts, best + 1) - 1
+        return best, min(self.space_between_res, self.run_ends[i] - best - \
+            num_seats_reserved)
+
+    def occupy(self, first_seat, num_seats_reserved, num_buffer_seats):
+        """ Marks specific seats in the row as reserved, followed by buffer
+        seats
+
+        Parameters
+        ----------
+        first_seat : int
+            The index of the first seat to reserve
+        num_seats_reserved : int
+            The number of seats in the reservation
+        num_buffer_seats : int
+            The number of seats to leave empty after the reservation
+
+        Raises
+        ------
+        Exception
+            If any of the seats is not free
+
+        Returns
+        -------
+        None
+        """
+        end = first_seat + num_seats_reserved + num_buffer_seats
+        # Find the free run holding the first seat
+        i = bisect_left(self.run_starts, first_seat + 1) - 1
+        if i < 0 or self.run_ends[i] < end:
+            raise Exception("Seats are not available")
+        run_start = self.run_starts[i]
+        run_end = self.run_ends[i]
+        if run_start == first_seat and end < run_end:
+            # Seats taken from the front of the run only shorten it
+            del self.capacities[bisect_left(self.capacities,
+                (self.get_capacity(run_start, run_end), run_start))]
+            self.run_starts[i] = end
+            insort(self.capacities, (self.get_capacity(end, run_end), end))
+        else:
+            # Split the run around the seats that are taken
+            self.remove_run(i)
+            if run_start < first_seat:
+                self.add_run(run_start, first_seat)
+            if end < run_end:
+                self.add_run(end, run_end)
+        reserved_end = first_seat + num_seats_reserved
+        self.occupancy[first_seat:reserved_end] = bytes([RESERVED]) * \
+            num_seats_reserved
+        self.occupancy[reserved_end:end] = bytes([BUFFER]) * num_buffer_seats
+        self.free -= num_seats_reserved + num_buffer_seats
+
+    def reserve(self, num_seats_reserved, placement="first"):
+        """ Seats a group in the free run chosen by a placement strategy
+
+        With the "first" and "best_fit" placements the group takes the front
+        of the run. The buffer seats after it are left empty unless the group
+        fills the end of the row.
+
+        Parameters
+        ----------
+        num_seats_reserved : int
+            The number of seats in the reservation
+        placement : str
+            "first" for the first run that can seat the group, "best_fit"
+            for the smallest one, or "center" for the seats closest to the
+            center of the row
+
+        Returns
+        -------
+        seats : tuple
+            The index of the first reserved seat and the number of buffer
+            seats, or None if no run can seat the group
+        """
+        if placement == "center":
+            seats = self.find_center_seats(num_seats_reserved)
+            if seats is not None:
+                self.occupy(seats[0], num_seats_reserved, seats[1])
+            return seats
+        if placement == "best_fit":
+            i = self.find_best_fit_run(num_seats_reserved)
+        else:
+            i = self.find_run(num_seats_reserved)
+        if i is None:
+            return None
+        first_seat = self.run_starts[i]
+        if self.run_ends[i] - first_seat >= num_seats_reserved + \
+            self.space_between_res:
+            num_buffer_seats = self.space_between_res
+        else:
+            num_buffer_seats = 0
+        self.occupy(first_seat, num_seats_reserved, num_buffer_seats)
+        return first_seat, num_buffer_seats
+
+    def release(self, first_seat, num_seats):
+        """ Marks seats as free again and merges them with the neighboring
+        runs
+
+        Parameters
+        ----------
+        first_seat : int
+            The index of the first seat to release
+        num_seats : int
+            The number of seats to release, including buffer seats
+
+        Returns
+        -------
+        None
+        """
+        start = first_seat
+        end = first_seat + num_seats
+        self.occupancy[start:end] = bytes([FREE]) * num_seats
+        self.free += num_seats
+        # Merge with the run starting right after the released seats
+        i = bisect_left(self.run_starts, end)
+        if i < len(self.run_starts) and self.run_starts[i] == end:
+            end = self.run_ends[i]
+            self.remove_run(i)
+        # Merge with the run ending right before the released seats
+        if i > 0 and self.run_ends[i - 1] == start:
+            start = self.run_starts[i - 1]
+            self.remove_run(i - 1)
+        self.add_run(start, end)
+
+class EmptySeatRow(SeatRow):
+    """
+    A class used to represent a row with every seat free that is shared by
+    every theater with a row of its length.
+
+    Most rows of most theaters never seat anyone, so a theater starts with
+    shared empty rows and only copies a row into a SeatRow of its own the
+    first time a group is seated in it. A shared row must never change, so
+    the methods that change seats raise instead.
+
+    Methods
+    -------
+    occupy(first_seat, num_seats_reserved, num_buffer_seats)
+        Raises, since a shared row cannot change
+    release(first_seat, num_seats)
+        Raises, since a shared row cannot change
+    """
+
+    __slots__ = ()
+
+    def occupy(self, first_seat, num_seats_reserved, num_buffer_seats):
+        """ Raises, since a shared row cannot change """
+        raise Exception("Shared empty row cannot be changed")
+
+    def release(self, first_seat, num_seats):
+        """ Raises, since a shared row cannot change """
+        raise Exception("Shared empty row cannot be changed")
+
+# The shared empty row of each (number of seats, space between reservations)
+EMPTY_ROWS = {}
+# The seating map, row positions and row index of an empty theater of each
+# (seats per row, space between reservations), built once and shared
+EMPTY_THEATERS = {}
+
+def get_empty_row(num_seats, space_between_res=0):
+    """ Gets the shared empty row of a length
+
+    Parameters
+    ----------
+    num_seats : int
+        The number of seats in the row
+    space_between_res : int
+        The amount of space (seats) needed between 2 reservations
+
+    Returns
+    -------
+    row : EmptySeatRow
+        The row with every seat free, which must be copied before it changes
+    """
+    key = (num_seats, space_between_res)
+    row = EMPTY_ROWS.get(key)
+    if row is None:
+        row = EMPTY_ROWS[key] = EmptySeatRow(num_seats, space_between_res)
+    return row
+
+def get_empty_theater(layout):
+    """ Gets the seating map, row positions and row index of an empty
+    theater
+
+    They are built the first time a layout is seen and shared by every
+    theater with the same geometry afterwards, so creating a theater only
+    copies a dict and a list.
+
+    Parameters
+    ----------
+    layout : TheaterLayout
+        The geometry of the theater
+
+    Returns
+    -------
+    empty_theater : tuple
+        The seating map of shared empty rows from the back of the theater to
+        the front, the position of each row from the back and the row index,
+        none of which may be changed
+    """
+    key = (tuple(layout.seats_per_row), layout.space_between_res)
+    empty_theater = EMPTY_THEATERS.get(key)
+    if empty_theater is None:
+        seating_map = {}
+        for i in range(layout.num_rows - 1, -1, -1):
+            seating_map[get_row_label(i)] = get_empty_row(
+                layout.seats_per_row[i], layout.space_between_res)
+        row_order = {}
+        row_index = []
+        for position, (id, row_seats) in enumerate(seating_map.items()):
+            row_order[id] = position
+            row_index.append((len(row_seats), position, id))
+        row_index.sort()
+        empty_theater = EMPTY_THEATERS[key] = (seating_map, row_order,
+            row_index)
+    return empty_theater
+
+def get_row_label(index):
+    """ Gets the spreadsheet-style label of a row (A-Z, then AA, AB, ...)
+
+    Parameters
+    ----------
+    index : int
+        The position of the row counted from the screen, starting at 0
+
+    Returns
+    -------
+    label : str
+        The label of the row
+    """
+    label = ""
+    index += 1
+    while index > 0:
+        index, letter = divmod(index - 1, 26)
+        label = chr(ord('A') + letter) + label
+    return label
+
+class TheaterLayout():
+    """
+    A class used to represent the geometry of a theater.
+
+    Attributes
+    ----------
+    seats_per_row : list
+        The number of seats in each row, starting from the row closest to
+        the screen
+    space_between_res : int
+        The amount of space (seats) needed between 2 reservations
+    num_rows : int
+        The number of rows in the theater
+
+    Methods
+    -------
+    uniform(num_rows, seats_per_row, space_between_res)
+        Creates a layout where every row has the same number of seats
+    from_file(file_path)
+        Loads a layout from a JSON layout file
+    """
+
+    def __init__(self, seats_per_row, space_between_res=3):
+        """
+        Parameters
+        ----------
+        seats_per_row : list
+            The number of seats in each row, starting from the row closest
+            to the screen
+        space_between_res : int
+            The amount of space (seats) needed between 2 reservations
+
+        Raises
+        ------
+        Exception
+            If the theater has no rows
+            If a row has no seats
+            If the space between reservations is negative
+        """
+        if len(seats_per_row) == 0:
+            raise Exception("Theater has no rows")
+        for num_seats in seats_per_row:
+            if not isinstance(num_seats, int) or num_seats <= 0:
+                raise Exception("Number of seats in a row is invalid")
+        if not isinstance(space_between_res, int) or space_between_res < 0:
+            raise Exception("Space between reservations is invalid")
+        self.seats_per_row = list(seats_per_row)
+        self.space_between_res = space_between_res
+        self.num_rows = len(self.seats_per_row)
+
+    @classmethod
+    def uniform(cls, num_rows, seats_per_row, space_between_res=3):
+        """ Creates a layout where every row has the same number of seats
+
+        Parameters
+        ----------
+        num_rows : int
+            The number of rows in the theater
+        seats_per_row : int
+            The number of seats in every row
+        space_between_res : int
+            The amount of space (seats) needed between 2 reservations
+
+        Returns
+        -------
+        layout : TheaterLayout
+            The layout of the theater
+        """
+        return cls([seats_per_row] * num_rows, space_between_res)
+
+    @classmethod
+    def from_file(cls, file_path):
+        """ Loads a layout from a JSON layout file
+
+        The file holds an object with "seats_per_row", either a list with
+        the number of seats in each row starting from the row closest to the
+        screen, or a number of seats shared by "num_rows" rows, and an
+        optional "space_between_res" (3 by default). For example:
+        {"num_rows": 30, "seats_per_row": 24, "space_between_res": 2}
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the JSON layout file
+
+        Raises
+        ------
+        Exception
+            If the layout file is not a JSON object
+            If the number of seats per row is missing
+            If the number of rows is missing for a uniform layout
+
+        Returns
+        -------
+        layout : TheaterLayout
+            The layout of the theater
+        """
+        with open(file_path, 'r') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise Exception("Layout file is not a JSON object")
+        if "seats_per_row" not in config:
+            raise Exception("Layout file has no seats_per_row")
+        seats_per_row = config["seats_per_row"]
+        space_between_res = config.get("space_between_res", 3)
+        if isinstance(seats_per_row, list):
+            return cls(seats_per_row, space_between_res)
+        if "num_rows" not in config:
+            raise Exception("Layout file has no num_rows")
+        return cls.uniform(config["num_rows"], seats_per_row,
+            space_between_res)
+
+class ReservationWriter():
+    """
+    A class used to write reservation details to an output file.
+
+    Lines are collected in a buffer and written in batches, so a long run
+    emits its output while requests are still being read without paying for
+    one write call per reservation.
+
+    Writers for other output formats subclass this one and are registered
+    in OUTPUT_FORMATS. A writer whose needs_details is False writes seated
+    reservations from their row, first seat and number of seats with
+    write_seats(), so the theater never builds their reservation details.
+
+    Attributes
+    ----------
+    f : file object
+        The file the reservation details are written to
+    path : str
+        The absolute path to the output file, or None if the file object
+        has no path
+    batch_size : int
+        The number of lines buffered before they are written to the file
+    buffer : list
+        The lines waiting to be written to the file
+    owns_file : bool
+        Whether the file was opened by the writer and is closed with it
+    mode : str
+        The mode the writer opens its output file in
+    needs_details : bool
+        Whether seated reservations are written from their reservation
+        details instead of with write_seats()
+
+    Methods
+    -------
+    write(res_id, res_details)
+        Adds the reservation details for a reservation ID to the output
+    write_seats(res_id, row_id, first_seat, num_seats)
+        Adds a reservation seated in consecutive seats to the output
+    flush()
+        Writes the buffered lines to the output file
+    close()
+        Flushes the buffered lines and closes the output file if the writer
+        opened it
+    """
+
+    mode = 'w'
+    needs_details = True
+
+    def __init__(self, output, batch_size=1024):
+        """
+        Parameters
+        ----------
+        output : str or file object
+            The path to the output file, or a file object opened for writing
+        batch_size : int
+            The number of lines buffered before they are written to the file
+        """
+        if hasattr(output, 'write'):
+            self.f = output
+            self.owns_file = False
+            name = getattr(output, 'name', None)
+            self.path = os.path.abspath(name) if isinstance(name, str) \
+                else None
+        else:
+            self.f = open(output, self.mode)
+            self.owns_file = True
+            self.path = os.path.abspath(output)
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, res_id, res_details):
+        """ Adds the reservation details for a reservation ID to the output
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID
+        res_details : str
+            The reservation details for this reservation ID
+
+        Returns
+        -------
+        None
+        """
+        self.buffer.append(f"{res_id} {res_details}\n")
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def write_seats(self, res_id, row_id, first_seat, num_seats):
+        """ Adds a reservation seated in consecutive seats to the output
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID
+        row_id : str
+            The ID of the row of the seats
+        first_seat : int
+            The seat number of the first seat, starting at 1
+        num_seats : int
+            The number of seats
+
+        Returns
+        -------
+        None
+        """
+        self.write(res_id, " ".join(row_id + str(seat) for seat in
+            range(first_seat, first_seat + num_seats)))
+
+    def flush(self):
+        """ Writes the buffered lines to the output file
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        if self.buffer:
+            self.f.write("".join(self.buffer))
+            self.buffer.clear()
+        self.f.flush()
+
+    def close(self):
+        """ Flushes the buffered lines and closes the output file if the
+        writer opened it
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self.flush()
+        if self.owns_file:
+            self.f.close()
+
+class CsvReservationWriter(ReservationWriter):
+    """
+    A class used to write reservations to a CSV file with one line of
+    reservation, row, first_seat, count and message per reservation.
+
+    A seated reservation is written as the range of its seats, with an empty
+    message. A reservation that was not seated has an empty row and first
+    seat, no seats, and the reason as its message.
+
+    Methods
+    -------
+    quote(value)
+        Quotes a field that holds a comma or a quote
+    """
+
+    needs_details = False
+
+    def __init__(self, output, batch_size=1024):
+        """
+        Parameters
+        ----------
+        output : str or file object
+            The path to the output file, or a file object opened for writing
+        batch_size : int
+            The number of lines buffered before they are written to the file
+        """
+        super().__init__(output, batch_size)
+        self.buffer.append("reservation,row,first_seat,count,message\n")
+
+    def write(self, res_id, res_details):
+        """ Adds a reservation that was not seated to the output
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID
+        res_details : str
+            The reason the reservation was not seated
+
+        Returns
+        -------
+        None
+        """
+        # Messages may hold commas, so they are always quoted
+        self.buffer.append('%s,,,0,"%s"\n' % (self.quote(res_id),
+            res_details.replace('"', '""')))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def write_seats(self, res_id, row_id, first_seat, num_seats):
+        """ Adds a reservation seated in consecutive seats to the output
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID
+        row_id : str
+            The ID of the row of the seats
+        first_seat : int
+            The seat number of the first seat, starting at 1
+        num_seats : int
+            The number of seats
+
+        Returns
+        -------
+        None
+        """
+        if ',' in res_id or '"' in res_id:
+            res_id = self.quote(res_id)
+        self.buffer.append(f"{res_id},{row_id},{first_seat},{num_seats},\n")
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def quote(self, value):
+        """ Quotes a field that holds a comma or a quote
+
+        Parameters
+        ----------
+        value : str
+            The field
+
+        Returns
+        -------
+        value : str
+            The field, quoted with its quotes doubled if it needs to be
+        """
+        if ',' in value or '"' in value:
+            return '"%s"' % value.replace('"', '""')
+        return value
+
+class BinaryReservationWriter(ReservationWriter):
+    """
+    A class used to write reservations to a compact binary file.
+
+    The file starts with OUTPUT_HEADER and holds one OUTPUT_RECORD per
+    reservation, followed by the UTF-8 reservation ID and either the row ID
+    or, for a reservation that was not seated with an uncommon message, the
+    message. Use read_binary_output() to read it back.
+    """
+
+    mode = 'wb'
+    needs_details = False
+
+    def __init__(self, output, batch_size=1024):
+        """
+        Parameters
+        ----------
+        output : str or file object
+            The path to the output file, or a file object opened for writing
+            in binary mode
+        batch_size : int
+            The number of records buffered before they are written to the
+            file
+        """
+        super().__init__(output, batch_size)
+        self.buffer.append(OUTPUT_HEADER.pack(OUTPUT_MAGIC, OUTPUT_VERSION))
+
+    def write(self, res_id, res_details):
+        """ Adds a reservation that was not seated to the output
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID
+        res_details : str
+            The reason the reservation was not seated
+
+        Raises
+        ------
+        Exception
+            If the reservation ID or the message is too long for a record
+
+        Returns
+        -------
+        None
+        """
+        res_id = res_id.encode()
+        code = OUTPUT_MESSAGE_CODES.get(res_details, 0)
+        message = b"" if code else res_details.encode()
+        try:
+            record = OUTPUT_RECORD.pack(len(res_id), 0, code, len(message))
+        except struct.error:
+            raise Exception("Reservation cannot be written in the binary " + \
+                "format")
+        self.buffer.append(record + res_id + message)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def write_seats(self, res_id, row_id, first_seat, num_seats):
+        """ Adds a reservation seated in consecutive seats to the output
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID
+        row_id : str
+            The ID of the row of the seats
+        first_seat : int
+            The seat number of the first seat, starting at 1
+        num_seats : int
+            The number of seats
+
+        Raises
+        ------
+        Exception
+            If the reservation ID, the row ID or the seats are too long for
+            a record
+
+        Returns
+        -------
+        None
+        """
+        res_id = res_id.encode()
+        row_id = row_id.encode()
+        try:
+            record = OUTPUT_RECORD.pack(len(res_id), len(row_id), first_seat,
+                num_seats)
+        except struct.error:
+            raise Exception("Reservation cannot be written in the binary " + \
+                "format")
+        self.buffer.append(record + res_id + row_id)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Writes the buffered records to the output file
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        if self.buffer:
+            self.f.write(b"".join(self.buffer))
+            self.buffer.clear()
+        self.f.flush()
+
+def read_binary_output(file_path):
+    """ Reads the reservations of a binary output file
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the binary output file
+
+    Raises
+    ------
+    Exception
+        If the file is not a binary output file
+        If the file was written in an unsupported version
+
+    Returns
+    -------
+    reservations : list
+        The reservation ID, row ID, first seat number, number of seats and
+        message of each reservation. The row ID and first seat are None and
+        the number of seats is 0 for a reservation that was not seated, and
+        the message is None for one that was
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    if len(data) < OUTPUT_HEADER.size or data[:4] != OUTPUT_MAGIC:
+        raise Exception("Not a binary output file: " + str(file_path))
+    version = OUTPUT_HEADER.unpack_from(data)[1]
+    if version != OUTPUT_VERSION:
+        raise Exception("Unsupported output version %d" % version)
+    reservations = []
+    offset = OUTPUT_HEADER.size
+    while offset < len(data):
+        id_length, row_length, first_seat, num_seats = \
+            OUTPUT_RECORD.unpack_from(data, offset)
+        offset += OUTPUT_RECORD.size
+        res_id = data[offset:offset + id_length].decode()
+        offset += id_length
+        if row_length == 0:
+            # The first seat of a reservation that was not seated is the
+            # code of a common message, or 0 if its message follows
+            message = OUTPUT_MESSAGES[first_seat] or \
+                data[offset:offset + num_seats].decode()
+            offset += num_seats
+            reservations.append((res_id, None, None, 0, message))
+        else:
+            row_id = data[offset:offset + row_length].decode()
+            offset += row_length
+            reservations.append((res_id, row_id, first_seat, num_seats,
+                None))
+    return reservations
+
+# The writer of each output format
+OUTPUT_FORMATS = {
+    "text": ReservationWriter,
+    "csv": CsvReservationWriter,
+    "binary": BinaryReservationWriter
+}
+# The output format of each output file extension, text for any other
+OUTPUT_EXTENSIONS = {".csv": "csv", ".bin": "binary"}
 
 class MovieTheaterSeating():
     """
@@ -16,29 +1090,60 @@ class MovieTheaterSeating():
     
     Attributes
     ----------
+    layout : TheaterLayout
+        The geometry of the theater
     num_rows : int
         The number of rows in the theater
     seats_per_row : int
-        The number of seats per row in the theater
+        The number of seats in the longest row of the theater
     space_between_res : int
         The amount of space (seats) needed between
         2 reservations
     available_seats : int
-        The number of available seats in the theater
+        The number of seats in the theater that were not sold, which still
+        counts the buffer seats left empty next to each group (see
+        seating_query.py for the free seats)
     seating_map : dict
         The layout of the theater
     reservation_details : dict
         The assigned seats for each reservation
     reservation_ids : set
         The unique ids of the reservations received
+    bookings : dict
+        The row ID, first seat index, number of seats and number of buffer
+        seats of each seated reservation
+    row_order : dict
+        The position of each row counted from the back of the theater
+    row_index : list
+        The rows sorted by (free seats, position from the back, row ID)
+    retain_details : bool
+        Whether the reservation details are kept in memory after they are
+        written to the output file
+    placement : str
+        The strategy for choosing the seats of a group within a row, one of
+        PLACEMENTS
+    output_format : str
+        The format of the output file, one of OUTPUT_FORMATS
+    format_details : bool
+        Whether the reservation details of seated reservations are built,
+        which is only needed when they are retained or written as text
 
     Methods
     -------
-    generate_rows()
+    set_output_format(output_format)
+        Sets the format of the output file
+    generate_rows(num_seats=None)
         Generates a blank seating chart for each row in the theater
     generate_theater_map()
         Generates a blank theater seating chart with the names of the rows and
         the seat numbers
+    generate_row_index()
+        Generates the index of rows sorted by the number of free seats
+    get_row_for_update(row_id)
+        Gets a row that can be changed, copying it first if it is a shared
+        empty row
+    update_row_index(row_id, old_free_seats)
+        Moves a row to its new position in the row index
     find_closest_row(num_seats_reserved)
         Finds the closest row to the back of the theater where a reservation
         can be seated
@@ -49,15 +1154,39 @@ class MovieTheaterSeating():
         Generates the reservation details for a reservation request
     find_best_seats(num_seats_reserved, row_id)
         Finds the optimal seats for a reservation
-    parse_input(file_path)
+    cancel_reservation(res_id)
+        Cancels a reservation and returns its seats and buffer seats to the
+        available seats
+    modify_reservation(res_id, num_seats_reserved)
+        Changes the number of seats of a reservation
+    make_reservation(res_id, num_seats_reserved)
+        Books the seats for a new reservation ID
+    validate_request(res)
+        Validates one line of the input file
+    parse_lines(block, first_line_number, rejects=None)
+        Validates a block of lines of the input file
+    read_requests(file_path, rejects=None)
+        Reads and validates the reservation requests one block at a time
+    parse_input(file_path, output=None, reject_report=None)
         Parses the input file with reservation requests
-    write_output()
+    process_requests(file_path, output=None, rejects=None)
+        Books the reservation requests in the input file and writes the
+        reservation details to the output file
+    write_rejects(rejects, file_path)
+        Writes the rejected lines of the input file to a reject report
+    get_output_path()
+        Gets the path to the output file
+    open_writer(output=None)
+        Opens a writer for the reservation details
+    write_output(output=None)
         Prints the filepath to an output file with all the reservation details
     main()
         Main function to generate the reservations
     """
 
-    def __init__(self):
+    def __init__(self, num_rows=10, seats_per_row=20, space_between_res=3,
+        retain_details=True, layout=None, placement="first",
+        output_format="text"):
         """
         Parameters
         ----------
@@ -68,6 +1197,20 @@ class MovieTheaterSeating():
         space_between_res : int
             The amount of space (seats) needed between
             2 reservations
+        retain_details : bool
+            Whether the reservation details are kept in memory after they are
+            written to the output file
+        layout : TheaterLayout
+            The geometry of the theater, which replaces num_rows,
+            seats_per_row and space_between_res when it is given
+        placement : str
+            "first" to seat each group at the front of the first free run
+            that fits it, "best_fit" for the smallest free run that fits it,
+            or "center" for the seats closest to the center of the row
+        output_format : str
+            "text" for a line of seat labels per reservation, "csv" for a
+            line of reservation, row, first seat and number of seats, or
+            "binary" for a compact binary record per reservation
         available_seats : int
             The number of available seats in the theater
         seating_map : dict
@@ -76,30 +1219,87 @@ class MovieTheaterSeating():
             The assigned seats for each reservation
         reservation_ids : set
             The unique ids of the reservations received
+        bookings : dict
+            The row ID, first seat index, number of seats and number of
+            buffer seats of each seated reservation
+        row_order : dict
+            The position of each row counted from the back of the theater
+        row_index : list
+            The rows sorted by (free seats, position from the back, row ID)
+
+        Raises
+        ------
+        Exception
+            If the placement strategy does not exist
+            If the output format does not exist
         """
-        self.num_rows = 10
-        self.seats_per_row = 20
-        self.space_between_res = 3
-        self.available_seats = self.num_rows * self.seats_per_row
+        if placement not in PLACEMENTS:
+            raise Exception("Unknown placement " + str(placement))
+        if layout is None:
+            layout = TheaterLayout.uniform(num_rows, seats_per_row,
+                space_between_res)
+        self.layout = layout
+        self.num_rows = layout.num_rows
+        self.seats_per_row = max(layout.seats_per_row)
+        self.space_between_res = layout.space_between_res
+        self.available_seats = sum(layout.seats_per_row)
         self.seating_map = self.generate_theater_map()
         self.reservation_details = {}
         self.reservation_ids = set()
+        self.bookings = {}
+        self.row_order = None
+        self.row_index = self.generate_row_index()
+        self.retain_details = retain_details
+        self.placement = placement
+        self.set_output_format(output_format)
 
-    def generate_rows(self):
-        """ Generates a blank seating chart for each row in the theater
+    def set_output_format(self, output_format):
+        """ Sets the format of the output file
 
         Parameters
         ----------
+        output_format : str
+            The name of the format in OUTPUT_FORMATS
+
+        Raises
+        ------
+        Exception
+            If the output format does not exist
+
+        Returns
+        -------
         None
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise Exception("Unknown output format " + str(output_format))
+        self.output_format = output_format
+        # Writers that encode seat ranges do not need the seat labels of each
+        # reservation, so they are only built if they are kept
+        self.format_details = self.retain_details or \
+            OUTPUT_FORMATS[output_format].needs_details
+
+    def generate_rows(self, num_seats=None):
+        """ Generates a blank seating chart for each row in the theater
+
+        Deprecated, the rows of a theater are the shared empty rows of
+        get_empty_row until they are booked.
+
+        Parameters
+        ----------
+        num_seats : int
+            The number of seats in the row, the longest row of the theater by
+            default
 
         Returns
         -------
-        seats : list
-            A list of seat numbers for a row
+        seats : SeatRow
+            The occupancy of an empty row
         """
-        seats = []
-        for i in range(0, self.seats_per_row):
-            seats.append(i + 1)
+        warnings.warn("generate_rows is deprecated, use get_empty_row",
+            DeprecationWarning, stacklevel=2)
+        if num_seats is None:
+            num_seats = self.seats_per_row
+        seats = SeatRow(num_seats, self.space_between_res)
         return seats
 
     def generate_theater_map(self):
@@ -113,16 +1313,83 @@ class MovieTheaterSeating():
         Returns
         -------
         theater_map : dict
-            A map of seat numbers by row ID
+            A map of row occupancy by row ID, starting from the row farthest
+            from the screen. Every row is a shared empty row until
+            get_row_for_update() is called for it
+        """
+        return dict(get_empty_theater(self.layout)[0])
+
+    def generate_row_index(self):
+        """ Generates the index of rows sorted by the number of free seats
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        row_index : list
+            A list of (free seats, position from the back, row ID) tuples in
+            ascending order
+        """
+        empty_map, row_order, row_index = get_empty_theater(self.layout)
+        # An empty theater holds the same rows as the shared one, which is
+        # a quick identity check, so its index is copied instead of sorted
+        if self.seating_map == empty_map:
+            self.row_order = row_order
+            return list(row_index)
+        self.row_order = {}
+        row_index = []
+        # The seating map lists the rows from the back of the theater to the
+        # front, so the position of a row in the map breaks ties in favor of
+        # the row farthest from the screen
+        for position, (id, row_seats) in enumerate(self.seating_map.items()):
+            self.row_order[id] = position
+            row_index.append((len(row_seats), position, id))
+        row_index.sort()
+        return row_index
+
+    def get_row_for_update(self, row_id):
+        """ Gets a row that can be changed, copying it first if it is a
+        shared empty row
+
+        Parameters
+        ----------
+        row_id : str
+            The ID of the row
+
+        Returns
+        -------
+        row_seats : SeatRow
+            The row of this theater
+        """
+        row_seats = self.seating_map[row_id]
+        if type(row_seats) is EmptySeatRow:
+            row_seats = self.seating_map[row_id] = row_seats.copy()
+        return row_seats
+
+    def update_row_index(self, row_id, old_free_seats):
+        """ Moves a row to its new position in the row index
+
+        Parameters
+        ----------
+        row_id : str
+            The ID of the row whose free seats changed
+        old_free_seats : int
+            The number of free seats in the row before the change
+
+        Returns
+        -------
+        None
         """
-        theater_map = {}
-        # Get the capital letter ASCII character for the row farthest from the
-        # screen
-        letter = chr(ord('@') + self.num_rows)
-        for i in range(0, self.num_rows):
-            theater_map[letter] = self.generate_rows()
-            letter = chr(ord(letter) - 1)
-        return theater_map
+        position = self.row_order[row_id]
+        new_free_seats = len(self.seating_map[row_id])
+        if new_free_seats == old_free_seats:
+            return
+        # Remove the stale entry for this row and insert the updated one
+        del self.row_index[bisect_left(self.row_index,
+            (old_free_seats, position, row_id))]
+        insort(self.row_index, (new_free_seats, position, row_id))
 
     def find_closest_row(self, num_seats_reserved):
         """ Finds the closest row to the back of the theater where a
@@ -138,30 +1405,48 @@ class MovieTheaterSeating():
         row_id : int
             The ID of the row where the reservation can be seated
         """
-        # Initialize the minimum space needed to seat the reservation to the
-        # max possible value
-        minimum_space = float('Inf')
-        # Initialize the row to be seated in to the capital letter ASCII
-        # character for the farthest row from the screen
-        row_id = chr(ord('@') + self.num_rows)
-        # For each set of row ID and seat numbers in the theater seating map
-        for id, row_seats in self.seating_map.items():
-            # If the number of available seats in the row minus the number
-            # of seats requested is less than the minimum space needed to
-            # seat the reservation
-            # AND
-            # If the number of available seats in the minus the number of seats
-            # requested is equal to 0
-            if (len(row_seats) - num_seats_reserved < minimum_space) and \
-                (len(row_seats) - num_seats_reserved >= 0):
-                # Set the minimum space needed to seat the reservation to the
-                # difference between the number of available seats in the row
-                # minus the number of seats requested
-                minimum_space = len(row_seats) - num_seats_reserved
-                # Set the row ID equal to the this row's ID
-                row_id = id
-        # Return the row ID
-        return row_id
+        # Find the first row with at least the requested number of free seats.
+        # The index is sorted by free seats and then by position from the
+        # back, so this is the row that leaves the least space behind and,
+        # among those, the one farthest from the screen
+        i = bisect_left(self.row_index, (num_seats_reserved,))
+        if i < len(self.row_index):
+            return self.row_index[i][2]
+        # If no row can seat the reservation, default to the row farthest
+        # from the screen
+        return get_row_label(self.num_rows - 1)
+
+    def reserve_seats(self, row_id, num_seats_reserved):
+        """ Seats a group in a row and updates the row index
+
+        Parameters
+        ----------
+        row_id : str
+            The ID of the row to seat the group in
+        num_seats_reserved : int
+            The number of seats in the reservation request
+
+        Returns
+        -------
+        seats : tuple
+            The index of the first reserved seat and the number of buffer
+            seats, or None if the row cannot seat the group
+        """
+        # Get the available seats in this row
+        row_seats = self.seating_map[row_id]
+        # Remember the largest group the row can seat to update the row index
+        old_free_seats = len(row_seats)
+        # If the row does not have enough available seats for the reservation
+        if old_free_seats == 0 or old_free_seats < num_seats_reserved:
+            return None
+        # A row is only copied out of the shared empty row once a group is
+        # seated in it
+        row_seats = self.get_row_for_update(row_id)
+        # Mark the seats as occupied
+        seats = row_seats.reserve(num_seats_reserved, self.placement)
+        # Keep the row index in sync with the seats that were taken
+        self.update_row_index(row_id, old_free_seats)
+        return seats
 
     def update_available_seats(self, row_id, num_seats_reserved):
         """ Makes a reservation for a group and removes those and neighboring
@@ -182,31 +1467,29 @@ class MovieTheaterSeating():
             False if there is not enough space for the reservation to be
             fulfilled
         """
-        # Get the available seats in this row
-        row_seats = self.seating_map[row_id]
-        # Mark the request as not yet fulfilled
-        reserved = False
-        # If there is at least one available seat in the row
-        if len(row_seats) > 0:
-            # If the number of available seats in the row equals the number of
-            # seats requested is less than the number of seats requested plus
-            # the required seats between reservations
-            if len(row_seats) == num_seats_reserved or len(row_seats) < \
-                num_seats_reserved + self.space_between_res:
-                # Mark the seats as occupied
-                for i in range(0, num_seats_reserved):
-                    del row_seats[0]
-            # If the number of available seats in the row is greater than or
-            # equal to the number of seats requested plus the required seats
-            # between reservations
-            elif len(row_seats) >= num_seats_reserved + self.space_between_res:
-                # Mark the seats as occupied
-                for i in range(0, num_seats_reserved + self.space_between_res):
-                    del row_seats[0]
-            # Mark the request as fulfilled
-            reserved = True
-        # Return the status of the request
-        return reserved
+        return self.reserve_seats(row_id, num_seats_reserved) is not None
+
+    def release_seats(self, row_id, first_seat, num_seats):
+        """ Returns seats in a row to the available seats and updates the row
+        index
+
+        Parameters
+        ----------
+        row_id : str
+            The ID of the row of the seats
+        first_seat : int
+            The index of the first seat to release
+        num_seats : int
+            The number of seats to release, including buffer seats
+
+        Returns
+        -------
+        None
+        """
+        row_seats = self.get_row_for_update(row_id)
+        old_free_seats = len(row_seats)
+        row_seats.release(first_seat, num_seats)
+        self.update_row_index(row_id, old_free_seats)
 
     def print_reservation(self, row_seats, num_seats_reserved, row_id):
         """ Generates the reservation details for a reservation request
@@ -255,7 +1538,8 @@ class MovieTheaterSeating():
         Returns
         -------
             res_details : str
-            A string with the reservation details for this reservation ID
+            A string with the reservation details for this reservation ID,
+            or None if the reservation was seated and format_details is False
         """
         # If too many seats are requested
         if num_seats_reserved > self.available_seats or num_seats_reserved > \
@@ -265,30 +1549,308 @@ class MovieTheaterSeating():
         else:
             # Find the optimal row to seat this request
             row_id = self.find_closest_row(num_seats_reserved)
-            # Get the available seats in this row
-            row_seats = self.seating_map[row_id]
             # Make the reservation for this request
-            self.reservation_details[res_id] = \
-                self.print_reservation(row_seats, num_seats_reserved, row_id)
-            # Check whether or not the reservation was successful
-            reservation_made = \
-                self.update_available_seats(row_id, num_seats_reserved)
-            # If the reservation is successful, subtract the seats requested
-            # from the total number of available seats
-            if reservation_made:
+            seats = self.reserve_seats(row_id, num_seats_reserved)
+            reserved_seats = []
+            # If the reservation is successful, remember where it was seated
+            # and subtract the seats requested from the total number of
+            # available seats
+            if seats is not None:
+                first_seat, num_buffer_seats = seats
+                self.bookings[res_id] = (row_id, first_seat,
+                    num_seats_reserved, num_buffer_seats)
                 self.available_seats -= num_seats_reserved
+                # The writer encodes the seats from the booking instead
+                if not self.format_details:
+                    return None
+                reserved_seats = range(first_seat + 1, first_seat + \
+                    num_seats_reserved + 1)
+            self.reservation_details[res_id] = self.print_reservation(
+                reserved_seats, num_seats_reserved, row_id)
             # Get the reservation details for this reservation ID
             res_details = str(self.reservation_details[res_id])
             # Return the reservation details for this reservation ID
             return res_details
 
-    def parse_input(self, file_path):
+    def cancel_reservation(self, res_id):
+        """ Cancels a reservation and returns its seats and buffer seats to
+        the available seats
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID to cancel
+
+        Raises
+        ------
+        Exception
+            If the reservation ID was never received
+
+        Returns
+        -------
+        None
+        """
+        if res_id not in self.reservation_ids:
+            raise Exception("Reservation does not exist")
+        # A reservation that could not be seated has no seats to release
+        if res_id in self.bookings:
+            row_id, first_seat, num_seats_reserved, num_buffer_seats = \
+                self.bookings.pop(res_id)
+            self.release_seats(row_id, first_seat, num_seats_reserved + \
+                num_buffer_seats)
+            self.available_seats += num_seats_reserved
+        self.reservation_details.pop(res_id, None)
+        # The reservation ID can be used again
+        self.reservation_ids.discard(res_id)
+
+    def modify_reservation(self, res_id, num_seats_reserved):
+        """ Changes the number of seats of a reservation
+
+        The reservation is seated again as if it were a new request, so it
+        may move to a better row. If the new number of seats cannot be
+        seated, the reservation keeps its original seats.
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID to change
+        num_seats_reserved : int
+            The new number of seats requested
+
+        Raises
+        ------
+        Exception
+            If the reservation ID was never received
+            If the new number of seats is negative or 0
+            If the new number of seats cannot be seated
+
+        Returns
+        -------
+        res_details : str
+            A string with the new reservation details for this reservation ID
+        """
+        if res_id not in self.reservation_ids:
+            raise Exception("Reservation does not exist")
+        if num_seats_reserved <= 0:
+            raise Exception("Number of seats requested is " + \
+            "less than or equal to 0")
+        booking = self.bookings.get(res_id)
+        old_details = self.reservation_details.get(res_id)
+        self.cancel_reservation(res_id)
+        self.reservation_ids.add(res_id)
+        try:
+            res_details = self.find_best_seats(num_seats_reserved, res_id)
+        except Exception:
+            res_details = None
+        if res_id in self.bookings:
+            return res_details
+        # Put the reservation back in its original seats
+        self.bookings.pop(res_id, None)
+        if booking is not None:
+            row_id, first_seat, old_num_seats, num_buffer_seats = booking
+            old_free_seats = len(self.seating_map[row_id])
+            self.get_row_for_update(row_id).occupy(first_seat, old_num_seats,
+                num_buffer_seats)
+            self.update_row_index(row_id, old_free_seats)
+            self.bookings[res_id] = booking
+            self.available_seats -= old_num_seats
+        if old_details is None:
+            self.reservation_details.pop(res_id, None)
+        else:
+            self.reservation_details[res_id] = old_details
+        raise Exception("Reservation cannot be modified, not enough seats " + \
+            "available")
+
+    def make_reservation(self, res_id, num_seats_reserved):
+        """ Books the seats for a new reservation ID
+
+        Parameters
+        ----------
+        res_id : str
+            The reservation ID associated with this reservation
+        num_seats_reserved : int
+            The number of seats requested
+
+        Raises
+        ------
+        Exception
+            If there is a duplicate reservation ID
+
+        Returns
+        -------
+        res_details : str
+            A string with the reservation details for this reservation ID
+        """
+        if res_id in self.reservation_ids:
+            raise Exception("Reservation already made")
+        # Add ID to set of unique IDs if it is not already there
+        self.reservation_ids.add(res_id)
+        # Find the best seats for this request
+        return self.find_best_seats(num_seats_reserved, res_id)
+
+    def validate_request(self, res):
+        """ Validates one line of the input file
+
+        Parameters
+        ----------
+        res : str
+            A line of the input file without its newline character
+
+        Raises
+        ------
+        Exception
+            If too many parameters are passed in for a reservation
+            If too few parameters are passed in for a reservation
+            If the number of seats requested in a reservation is invalid
+            If the number of seats requested in a reservation is negative or 0
+            If the reservation ID for a reservation is empty or invalid
+
+        Returns
+        -------
+        request : tuple
+            The reservation ID and the number of seats requested
+        """
+        # Split the reservation on the space (separating the reservation ID
+        # from the requested number of seats)
+        res_split = res.split(' ')
+        if len(res_split) > 2:
+            raise Exception("Too many parameters")
+        if len(res_split) < 2:
+            raise Exception("Too few parameters")
+        if res_split[1] == "" or res_split[1] == " " or not \
+            res_split[1].isnumeric():
+            raise Exception("Number of seats requested is invalid")
+        # Get the number of seats in the request
+        num_seats_reserved = int(res_split[1])
+        if num_seats_reserved <= 0:
+            raise Exception("Number of seats requested is " + \
+            "less than or equal to 0")
+        if res_split[0] == "" or res_split[0] == " " or \
+            res_split[0].isnumeric():
+            raise Exception("Reservation ID is empty or invalid")
+        return res_split[0], num_seats_reserved
+
+    def parse_lines(self, block, first_line_number, rejects=None):
+        """ Validates a block of lines of the input file
+
+        The whole block is split and checked with a few string operations
+        that each run over every line in C. Only a block that fails those
+        checks is validated one line at a time with validate_request, which
+        accepts or rejects each line exactly as before.
+
+        Parameters
+        ----------
+        block : str
+            Lines of the input file separated by newline characters, without
+            a newline after the last one
+        first_line_number : int
+            The line number of the first line of the block, counted from 1
+        rejects : list
+            The list the (line number, line, error message) of each invalid
+            line is added to, or None to stop at the first invalid line
+
+        Returns
+        -------
+        requests : list
+            The reservation ID and the number of seats of each valid line
+            before the first invalid one, or of every valid line if rejects
+            is given
+        error : Exception
+            The error of the first invalid line, or None
+        """
+        tokens = block.replace('\n', ' ').split(' ')
+        res_ids = tokens[0::2]
+        num_seats = tokens[1::2]
+        digits = "".join(num_seats)
+        # Every line is valid if it is an ID that is not empty or numeric,
+        # one space and a number written in ASCII digits. Joining the tokens
+        # back into the block checks that each line has exactly one space.
+        if len(res_ids) == len(num_seats) and all(res_ids) and \
+            all(num_seats) and digits.isascii() and digits.isdigit() and \
+            not any(map(str.isnumeric, res_ids)) and \
+            '\n'.join(map(' '.join, zip(res_ids, num_seats))) == block:
+            counts = list(map(SEAT_COUNTS.get, num_seats))
+            if None in counts:
+                counts = list(map(int, num_seats))
+            if min(counts) > 0:
+                return list(zip(res_ids, counts)), None
+        requests = []
+        for i, line in enumerate(block.split('\n')):
+            try:
+                requests.append(self.validate_request(line))
+            except Exception as e:
+                if rejects is None:
+                    return requests, e
+                rejects.append((first_line_number + i, line, str(e)))
+        return requests, None
+
+    def read_requests(self, file_path, rejects=None):
+        """ Reads and validates the reservation requests one block at a time
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the txt file with the reservation requests
+        rejects : list
+            The list the (line number, line, error message) of each invalid
+            line is added to, or None to raise at the first invalid line
+
+        Raises
+        ------
+        Exception
+            If a line of the file is not a valid reservation request and
+            rejects is None
+
+        Yields
+        ------
+        request : tuple
+            The reservation ID and the number of seats requested
+        """
+        remainder = ""
+        line_number = 1
+        # Open the file at the filepath
+        with open(file_path, 'r') as f:
+            # Parse the complete lines of each chunk and carry the last,
+            # possibly partial, line over to the next chunk
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), ""):
+                text = remainder + chunk
+                end = text.rfind('\n')
+                if end < 0:
+                    remainder = text
+                    continue
+                requests, error = self.parse_lines(text[:end], line_number,
+                    rejects)
+                yield from requests
+                if error is not None:
+                    raise error
+                line_number += text.count('\n', 0, end) + 1
+                remainder = text[end + 1:]
+        # The last line has no newline after it. An empty file, or a file
+        # ending with a newline, has an empty last line which is rejected
+        # like any other invalid request
+        requests, error = self.parse_lines(remainder, line_number, rejects)
+        yield from requests
+        if error is not None:
+            raise error
+
+    def parse_input(self, file_path, output=None, reject_report=None):
         """ Parses the input file with reservation requests
 
+        The requests are validated, booked and written to the output file one
+        block at a time, so the input file is never held in memory.
+
         Parameters
         ----------
         file_path : str
             The path to the txt file with the reservation requests
+        output : str or file object
+            The path or file object to write the reservation details to,
+            test_data/output.txt next to this script by default
+        reject_report : str
+            The path to write the invalid lines of the input file to. If it
+            is given, invalid lines are skipped instead of stopping the
+            parse, and requests that cannot be booked are written to the
+            output file with the reason
         
         Raises
         ------
@@ -304,76 +1866,160 @@ class MovieTheaterSeating():
         -------
         None
         """
-        # Map of reservation ID to number of seats requested
-        res_list = {}
-        # Open the file at the filepath
-        with open(file_path, 'r') as f:
-            # Split the file on newlines
-            reservations = f.read().split('\n')
-        # Close the file
-        f.close()
-        # For each reservation (line) in the file
-        for res in reservations:
-            # Split the reservation on the space (separating the reservation ID
-            # from the requested number of seats)
-            res_split = res.split(' ')
-            if len(res_split) > 2:
-                raise Exception("Too many parameters")
-            if len(res_split) < 2:
-                raise Exception("Too few parameters")
-            if res_split[1] == "" or res_split[1] == " " or not \
-                res_split[1].isnumeric():
-                raise Exception("Number of seats requested is invalid")
-            if int(res_split[1]) <= 0:
-                raise Exception("Number of seats requested is " + \
-                "less than or equal to 0")
-            if res_split[0] == "" or res_split[0] == " " or \
-                res_split[0].isnumeric():
-                raise Exception("Reservation ID is empty or invalid")
-            if len(res_split) == 2:
-                res_id = res_split[0]
-                if res_id in self.reservation_ids:
-                    raise Exception("Reservation already made")
-                # Add ID to set of unique IDs if it is not already there
-                self.reservation_ids.add(res_id)
-                # Get the number of seats in the request
-                num_seats_reserved = int(res_split[1])
-                # Add the ID and number of seats requested to a map
-                res_list[res_id] = num_seats_reserved
-                # Find the best seats for this request
-                self.find_best_seats(num_seats_reserved, res_id)
-        # Generate the output file for this input file
-        self.write_output()
-
-    def write_output(self):
+        rejects = None if reject_report is None else []
+        try:
+            output_path = self.process_requests(file_path, output, rejects)
+        finally:
+            if reject_report is not None:
+                self.write_rejects(rejects, reject_report)
+        # Print the absolute path to the output file to the terminal
+        if output_path is not None:
+            print(output_path)
+
+    def process_requests(self, file_path, output=None, rejects=None):
+        """ Books the reservation requests in the input file and writes the
+        reservation details to the output file
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the txt file with the reservation requests
+        output : str or file object
+            The path or file object to write the reservation details to,
+            test_data/output.txt next to this script by default
+        rejects : list
+            The list the (line number, line, error message) of each invalid
+            line is added to. If it is given, invalid lines are skipped and
+            requests that cannot be booked are written to the output file
+            with the reason instead of stopping the parse
+
+        Raises
+        ------
+        Exception
+            If a line of the file is not a valid reservation request and
+            rejects is None
+
+        Returns
+        -------
+        output_path : str
+            The absolute path to the output file, or None if the output is a
+            file object with no path
+        """
+        # Write to the output file as the reservations are made
+        with self.open_writer(output) as writer:
+            needs_details = writer.needs_details
+            for res_id, num_seats_reserved in self.read_requests(file_path,
+                rejects):
+                try:
+                    res_details = self.make_reservation(res_id,
+                        num_seats_reserved)
+                except Exception as e:
+                    if rejects is None:
+                        raise
+                    # A request that cannot be booked is written with the
+                    # reason instead of stopping the parse
+                    writer.write(res_id, str(e))
+                    continue
+                if needs_details or res_id not in self.bookings:
+                    writer.write(res_id, res_details)
+                else:
+                    # Encode the range of seats instead of their labels
+                    row_id, first_seat, num_seats, _ = self.bookings[res_id]
+                    writer.write_seats(res_id, row_id, first_seat + 1,
+                        num_seats)
+                # Drop the reservation details once they are written if they
+                # are not needed afterwards
+                if not self.retain_details:
+                    self.reservation_details.pop(res_id, None)
+        return writer.path
+
+    def write_rejects(self, rejects, file_path):
+        """ Writes the rejected lines of the input file to a reject report
+
+        Parameters
+        ----------
+        rejects : list
+            The (line number, line, error message) of each invalid line
+        file_path : str
+            The path to the reject report, one tab separated line number,
+            error message and line per invalid line
+
+        Returns
+        -------
+        file_path : str
+            The absolute path to the reject report
+        """
+        with open(file_path, 'w') as f:
+            for line_number, line, message in rejects:
+                f.write("%d\t%s\t%s\n" % (line_number, message, line))
+        return os.path.abspath(file_path)
+
+    def get_output_path(self):
+        """ Gets the path to the output file
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        output_path : str
+            The path to the output file with the reservation details
+        """
+        return os.path.join(os.path.dirname(__file__), "test_data/output.txt")
+
+    def open_writer(self, output=None):
+        """ Opens a writer for the reservation details
+
+        Parameters
+        ----------
+        output : str or file object
+            The path or file object to write the reservation details to,
+            test_data/output.txt next to this script by default
+
+        Returns
+        -------
+        writer : ReservationWriter
+            The writer of the output format of the theater for the output
+        """
+        # Initialize the path to output the reservation details to
+        if output is None:
+            output = self.get_output_path()
+        return OUTPUT_FORMATS[self.output_format](output)
+
+    def write_output(self, output=None):
         """ Prints the filepath to an output file with all the reservation
         details
 
         Parameters
         ----------
-        None
+        output : str or file object
+            The path or file object to write the reservation details to,
+            test_data/output.txt next to this script by default
 
         Returns:
         abs_path : str
             The absolute path to the filepath of the output file with
             reservations
         """
-        # Initialize the path to output the reservation details to
-        output_path = os.path.join(os.path.dirname(__file__), 
-        "test_data/output.txt")
         # Write to the file at this path
-        with open(output_path, 'w') as f:
+        with self.open_writer(output) as writer:
             # For each reservation ID and seats reserved
             for res_id, res_seats in self.reservation_details.items():
                 # Add a new line with the reservation ID followed by their
-                # seat information
-                f.write(res_id + " " + res_seats + "\n")
-        # Close the file when done writing
-        f.close()
+                # seat information, or the range of the seats if the writer
+                # encodes ranges
+                if writer.needs_details or res_id not in self.bookings:
+                    writer.write(res_id, res_seats)
+                else:
+                    row_id, first_seat, num_seats, _ = self.bookings[res_id]
+                    writer.write_seats(res_id, row_id, first_seat + 1,
+                        num_seats)
         # Get the absolute path for the output filepath
-        abs_path = os.path.abspath(output_path)
+        abs_path = writer.path
         # Print the absolute path to the terminal
-        print(abs_path)
+        if abs_path is not None:
+            print(abs_path)
         # Return the absolute path
         return abs_path
 
@@ -386,7 +2032,7 @@ class MovieTheaterSeating():
         Raises
         ------
         Exception
-            If more than 2 arguments are provided in the terminal
+            If more than 4 arguments are provided in the terminal
         
         Returns
         -------
@@ -394,11 +2040,22 @@ class MovieTheaterSeating():
         """
         # The input file path is the second argument provided in the terminal
         file_path = sys.argv[1]
-        # If there are more than 2 arguments provided
-        if len(sys.argv) > 2:
+        # If there are more than 4 arguments provided
+        if len(sys.argv) > 4:
             raise Exception("Too many arguments provided")
+        # The output file path is the optional third argument, whose
+        # extension picks the output format
+        output = sys.argv[2] if len(sys.argv) >= 3 else None
+        if output is not None:
+            self.set_output_format(OUTPUT_EXTENSIONS.get(
+                os.path.splitext(output)[1].lower(), "text"))
+        # The optional fourth argument is the path to a reject report, which
+        # skips invalid lines instead of stopping
+        reject_report = sys.argv[3] if len(sys.argv) == 4 else None
         # Parse the input for the input file
-        self.parse_input(file_path)
+        self.parse_input(file_path, output, reject_report)
 
 if __name__ == "__main__":
-    MovieTheaterSeating().main()
+    # The reservation details are written as the requests are booked, so
+    # they are not kept in memory afterwards
+    MovieTheaterSeating(retain_details=False).main()
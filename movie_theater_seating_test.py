@@ -6,9 +6,14 @@ movie_theater_seating.py script.
 python3 movie_theater_seating_test.py
 '''
 
+import io
+import csv
+import tempfile
 import unittest
 from pathlib import Path
-from movie_theater_seating import MovieTheaterSeating
+from movie_theater_seating import MovieTheaterSeating, SeatRow, \
+    EmptySeatRow, ReservationWriter, CsvReservationWriter, TheaterLayout, \
+    get_row_label, read_binary_output, FREE, RESERVED, BUFFER
 
 THIS_DIR = Path(__file__)
 
@@ -30,7 +35,7 @@ class TestMovieTheaterSeating(unittest.TestCase):
         generate_rows_expected = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13,
         14, 15, 16, 17, 18, 19, 20]
         result = self.movie_theater.generate_rows()
-        self.assertEqual(result, generate_rows_expected)
+        self.assertEqual(list(result), generate_rows_expected)
         
     def test_generate_theater_map(self):
         """
@@ -59,8 +64,182 @@ class TestMovieTheaterSeating(unittest.TestCase):
             18, 19, 20]
         }
         result = self.movie_theater.generate_theater_map()
-        self.assertEqual(result, generate_theater_map_expected)
-    
+        self.assertEqual({row_id: list(row_seats) for row_id, row_seats in
+            result.items()}, generate_theater_map_expected)
+
+    def test_get_row_label(self):
+        """
+        Tests the get_row_label function.
+        """
+        self.assertEqual(get_row_label(0), "A")
+        self.assertEqual(get_row_label(25), "Z")
+        self.assertEqual(get_row_label(26), "AA")
+        self.assertEqual(get_row_label(27), "AB")
+        self.assertEqual(get_row_label(701), "ZZ")
+        self.assertEqual(get_row_label(702), "AAA")
+
+    def test_theater_layout(self):
+        """
+        Tests the TheaterLayout class.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / 'layout.json'
+            file_path.write_text('{"num_rows": 30, "seats_per_row": 24}')
+            layout = TheaterLayout.from_file(file_path)
+            self.assertEqual(layout.num_rows, 30)
+            self.assertEqual(layout.space_between_res, 3)
+            file_path.write_text('{"num_rows": 30}')
+            with self.assertRaises(Exception):
+                TheaterLayout.from_file(file_path)
+        with self.assertRaises(Exception):
+            TheaterLayout([10, 0])
+        movie_theater = MovieTheaterSeating(layout=TheaterLayout([4, 6, 8] + \
+            [2] * 26, 1))
+        self.assertEqual(movie_theater.available_seats, 70)
+        self.assertEqual(list(movie_theater.seating_map)[:2], ["AC", "AB"])
+        self.assertEqual(movie_theater.find_best_seats(2, "R001"), "AC1 AC2")
+        self.assertEqual(movie_theater.find_best_seats(7, "R002"),
+            "C1 C2 C3 C4 C5 C6 C7")
+        self.assertEqual(movie_theater.find_best_seats(5, "R003"),
+            "B1 B2 B3 B4 B5")
+        with self.assertRaises(Exception):
+            movie_theater.find_best_seats(9, "R004")
+
+    def test_seat_row(self):
+        """
+        Tests the SeatRow class.
+        """
+        row = SeatRow(10, 3)
+        self.assertEqual(row.reserve(4), (0, 3))
+        self.assertEqual(len(row), 3)
+        self.assertEqual(list(row), [8, 9, 10])
+        self.assertEqual(row[0], 8)
+        self.assertEqual(row[-1], 10)
+        self.assertEqual(bytes(row.occupancy), bytes([RESERVED] * 4 +
+            [BUFFER] * 3 + [FREE] * 3))
+        with self.assertRaises(IndexError):
+            row[3]
+        # The end of the row is filled without buffer seats
+        self.assertEqual(row.reserve(2), (7, 0))
+        self.assertEqual(row.reserve(2), None)
+        self.assertEqual(len(row), 1)
+
+    def test_seat_row_release(self):
+        """
+        Tests the release function of the SeatRow class.
+        """
+        row = SeatRow(20, 3)
+        row.reserve(2)
+        row.reserve(4)
+        row.reserve(4)
+        self.assertEqual(len(row), 1)
+        # Releasing the middle group leaves a hole that is followed by an
+        # occupied seat, so it must keep a buffer after any new group
+        row.release(5, 7)
+        self.assertEqual(row.run_starts, [5, 19])
+        self.assertEqual(row.run_ends, [12, 20])
+        self.assertEqual(len(row), 4)
+        self.assertEqual(row.reserve(4), (5, 3))
+        self.assertEqual(row.run_starts, [19])
+        # Releasing seats next to free runs merges them into one run
+        row.release(12, 7)
+        row.release(5, 7)
+        self.assertEqual(row.run_starts, [5])
+        self.assertEqual(row.run_ends, [20])
+        self.assertEqual(row.free, 15)
+        self.assertEqual(list(row)[:2], [6, 7])
+        with self.assertRaises(Exception):
+            row.occupy(3, 2, 0)
+
+    def test_seat_row_placement(self):
+        """
+        Tests the placement strategies of the SeatRow class.
+        """
+        row = SeatRow(20, 3)
+        row.reserve(2)
+        row.reserve(4)
+        row.reserve(2)
+        row.release(5, 7)
+        # Runs [5, 12) with capacity 4 and [17, 20) with capacity 3
+        self.assertEqual(row.capacities, [(3, 17), (4, 5)])
+        self.assertEqual(row.find_run(3), 0)
+        self.assertEqual(row.find_best_fit_run(3), 1)
+        self.assertEqual(row.find_best_fit_run(5), None)
+        self.assertEqual(row.reserve(3, "best_fit"), (17, 0))
+        self.assertEqual(row.capacities, [(4, 5)])
+        # The seats closest to the center, with a buffer before the
+        # occupied seats that follow them
+        row = SeatRow(20, 3)
+        self.assertEqual(row.reserve(4, "center"), (8, 3))
+        self.assertEqual(row.run_starts, [0, 15])
+        # Ties go to the seats closest to the first seat
+        self.assertEqual(row.reserve(5, "center"), (0, 3))
+        # Seats too few for a full buffer at the end of the row stay empty
+        self.assertEqual(row.reserve(4, "center"), (15, 1))
+        self.assertEqual(row.reserve(1, "center"), None)
+
+    def test_placement(self):
+        """
+        Tests that the theater seats groups with its placement strategy.
+        """
+        movie_theater = MovieTheaterSeating(layout=TheaterLayout([20, 20],
+            3), placement="center")
+        self.assertEqual(movie_theater.find_best_seats(4, "R001"),
+            "B9 B10 B11 B12")
+        self.assertEqual(movie_theater.find_best_seats(2, "R002"),
+            "B4 B5")
+        with self.assertRaises(Exception):
+            MovieTheaterSeating(placement="random")
+
+    def test_generate_row_index(self):
+        """
+        Tests the generate_row_index function.
+        """
+        result = self.movie_theater.generate_row_index()
+        self.assertEqual(result[0], (20, 0, 'J'))
+        self.assertEqual(result[-1], (20, 9, 'A'))
+        self.assertEqual(self.movie_theater.row_order['C'], 7)
+
+    def test_get_row_for_update(self):
+        """
+        Tests that rows are shared until a group is seated in them.
+        """
+        other_theater = MovieTheaterSeating()
+        self.assertIs(self.movie_theater.seating_map['J'],
+            other_theater.seating_map['J'])
+        self.assertIsInstance(self.movie_theater.seating_map['J'],
+            EmptySeatRow)
+        with self.assertRaises(Exception):
+            self.movie_theater.seating_map['J'].occupy(0, 2, 3)
+        # A request that no row can seat does not copy any row
+        self.movie_theater.reserve_seats('J', 21)
+        self.assertIs(self.movie_theater.seating_map['J'],
+            other_theater.seating_map['J'])
+        self.movie_theater.make_reservation("R001", 4)
+        row_seats = self.movie_theater.seating_map['J']
+        self.assertIs(type(row_seats), SeatRow)
+        self.assertEqual(len(row_seats), 13)
+        self.assertEqual(len(other_theater.seating_map['J']), 20)
+        self.assertIs(self.movie_theater.seating_map['I'],
+            other_theater.seating_map['I'])
+        self.movie_theater.cancel_reservation("R001")
+        self.assertIs(self.movie_theater.seating_map['J'], row_seats)
+        self.assertEqual(len(row_seats), 20)
+        # The index of an empty theater is a copy of the shared one
+        self.assertIsNot(other_theater.row_index,
+            MovieTheaterSeating().row_index)
+        self.assertEqual(self.movie_theater.generate_row_index(),
+            other_theater.row_index)
+
+    def test_update_row_index(self):
+        """
+        Tests the update_row_index function.
+        """
+        self.movie_theater.update_available_seats('C', 4)
+        self.assertEqual(self.movie_theater.row_index[0], (13, 7, 'C'))
+        self.assertEqual(self.movie_theater.find_closest_row(13), 'C')
+        self.assertEqual(self.movie_theater.find_closest_row(14), 'J')
+
     def test_find_closest_row(self):
         """
         Tests the find_closest_row function.
@@ -74,6 +253,13 @@ class TestMovieTheaterSeating(unittest.TestCase):
         """
         result = self.movie_theater.update_available_seats('B', 2)
         self.assertEqual(result, True)
+        self.assertEqual(list(self.movie_theater.seating_map['B']),
+            list(range(6, 21)))
+        # A row that is too short for the reservation is left untouched
+        self.movie_theater.update_available_seats('B', 13)
+        result = self.movie_theater.update_available_seats('B', 3)
+        self.assertEqual(result, False)
+        self.assertEqual(list(self.movie_theater.seating_map['B']), [19, 20])
     
     def test_print_reservation(self):
         """
@@ -100,6 +286,160 @@ class TestMovieTheaterSeating(unittest.TestCase):
         with self.assertRaises(Exception):
             self.movie_theater.find_best_seats(21, "R004")
 
+    def test_cancel_reservation(self):
+        """
+        Tests the cancel_reservation function.
+        """
+        self.movie_theater.find_best_seats(2, "R001")
+        self.movie_theater.find_best_seats(4, "R002")
+        self.movie_theater.reservation_ids.update(["R001", "R002"])
+        self.movie_theater.cancel_reservation("R001")
+        self.assertNotIn("R001", self.movie_theater.reservation_details)
+        self.assertEqual(self.movie_theater.available_seats, 196)
+        # The cancelled seats and their buffer form a hole in front of R002,
+        # which can seat a group of 2 with a buffer before R002
+        self.assertEqual(self.movie_theater.seating_map['J'].run_starts,
+            [0, 12])
+        self.assertEqual(len(self.movie_theater.seating_map['J']), 8)
+        self.assertEqual(self.movie_theater.make_reservation("R003", 2),
+            "J1 J2")
+        self.assertEqual(self.movie_theater.make_reservation("R004", 3),
+            "J13 J14 J15")
+        # The ID of a cancelled reservation can be used again
+        self.assertEqual(self.movie_theater.make_reservation("R001", 1),
+            "J19")
+        with self.assertRaises(Exception):
+            self.movie_theater.cancel_reservation("R006")
+
+    def test_modify_reservation(self):
+        """
+        Tests the modify_reservation function.
+        """
+        self.movie_theater.make_reservation("R001", 2)
+        self.movie_theater.make_reservation("R002", 15)
+        self.assertEqual(self.movie_theater.modify_reservation("R001", 1),
+            "J1")
+        self.assertEqual(self.movie_theater.available_seats, 184)
+        # A group too large for any row keeps its original seats
+        with self.assertRaises(Exception):
+            self.movie_theater.modify_reservation("R002", 21)
+        self.assertEqual(self.movie_theater.reservation_details["R002"],
+            "J6 J7 J8 J9 J10 J11 J12 J13 J14 J15 J16 J17 J18 J19 J20")
+        self.assertEqual(self.movie_theater.bookings["R002"], ('J', 5, 15, 0))
+        self.assertEqual(self.movie_theater.available_seats, 184)
+        # The released seats merge with the free seat left after R001
+        self.assertEqual(self.movie_theater.modify_reservation("R002", 16),
+            "J5 J6 J7 J8 J9 J10 J11 J12 J13 J14 J15 J16 J17 J18 J19 J20")
+        with self.assertRaises(Exception):
+            self.movie_theater.modify_reservation("R003", 2)
+
+    def test_make_reservation(self):
+        """
+        Tests the make_reservation function.
+        """
+        result = self.movie_theater.make_reservation("R001", 3)
+        self.assertEqual(result, "J1 J2 J3")
+        self.assertIn("R001", self.movie_theater.reservation_ids)
+        with self.assertRaises(Exception):
+            self.movie_theater.make_reservation("R001", 2)
+
+    def test_validate_request(self):
+        """
+        Tests the validate_request function.
+        """
+        self.assertEqual(self.movie_theater.validate_request("R001 4"),
+            ("R001", 4))
+        for res, message in [("R001 2 3", "Too many parameters"),
+            ("R001", "Too few parameters"),
+            ("R001 ", "Number of seats requested is invalid"),
+            ("R001 0", "Number of seats requested is less than or equal to 0"),
+            (" 2", "Reservation ID is empty or invalid")]:
+            with self.assertRaisesRegex(Exception, message):
+                self.movie_theater.validate_request(res)
+
+    def test_read_requests(self):
+        """
+        Tests the read_requests function.
+        """
+        requests = self.movie_theater.read_requests(self.parse_input_data / \
+            'test_parse_input_7.txt')
+        # Lines are only read and validated as they are consumed
+        self.assertEqual(next(requests), ("ROO1", 3))
+        self.assertEqual(next(requests), ("ROO1", 4))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / 'input.txt'
+            file_path.write_text("R001 2\n")
+            requests = self.movie_theater.read_requests(file_path)
+            self.assertEqual(next(requests), ("R001", 2))
+            # A trailing newline leaves an empty, invalid last line
+            with self.assertRaisesRegex(Exception, "Too few parameters"):
+                next(requests)
+
+    def test_parse_lines(self):
+        """
+        Tests the parse_lines function.
+        """
+        self.assertEqual(self.movie_theater.parse_lines("R001 2\nR002 007",
+            1), ([("R001", 2), ("R002", 7)], None))
+        # Blocks with an invalid line are validated one line at a time
+        requests, error = self.movie_theater.parse_lines(
+            "R001 2\nR002 2 2\nR003 1", 1)
+        self.assertEqual(requests, [("R001", 2)])
+        self.assertEqual(str(error), "Too many parameters")
+        rejects = []
+        requests, error = self.movie_theater.parse_lines(
+            "R001 2\n12 3\nR003 0\n\nR005 \u0663", 10, rejects)
+        self.assertEqual(requests, [("R001", 2), ("R005", 3)])
+        self.assertIsNone(error)
+        self.assertEqual(rejects, [
+            (11, "12 3", "Reservation ID is empty or invalid"),
+            (12, "R003 0", "Number of seats requested is less than or " + \
+                "equal to 0"),
+            (13, "", "Too few parameters")])
+
+    def test_process_requests_lenient(self):
+        """
+        Tests that a reject report skips invalid lines instead of stopping.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = Path(tmp_dir) / 'input.txt'
+            output_path = Path(tmp_dir) / 'output.txt'
+            report_path = Path(tmp_dir) / 'rejects.txt'
+            input_path.write_text("R001 2\nR002\nR003 30\nR001 1\nR004 3")
+            self.movie_theater.parse_input(input_path, output_path,
+                report_path)
+            self.assertEqual(output_path.read_text().splitlines(), [
+                "R001 J1 J2",
+                "R003 Reservation cannot be made, too many seats requested",
+                "R001 Reservation already made",
+                "R004 J6 J7 J8"])
+            self.assertEqual(report_path.read_text(),
+                "2\tToo few parameters\tR002\n")
+
+    def test_process_requests_without_details(self):
+        """
+        Tests that a theater that does not retain details, like the one the
+        command line uses, keeps no reservation details once they are
+        written.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = THIS_DIR.parent / 'test_data/input.txt'
+            expected_path = Path(tmp_dir) / 'expected.txt'
+            output_path = Path(tmp_dir) / 'output.txt'
+            self.movie_theater.process_requests(input_path, expected_path)
+            movie_theater = MovieTheaterSeating(retain_details=False)
+            movie_theater.process_requests(input_path, output_path)
+            self.assertEqual(output_path.read_text(),
+                expected_path.read_text())
+            self.assertEqual(movie_theater.reservation_details, {})
+            self.assertEqual(movie_theater.bookings,
+                self.movie_theater.bookings)
+            # Requests that cannot be booked are not kept either
+            input_path = Path(tmp_dir) / 'lenient.txt'
+            input_path.write_text("R100 2\nR100 1\nR101 30")
+            movie_theater.process_requests(input_path, output_path, [])
+            self.assertEqual(movie_theater.reservation_details, {})
+
     def test_parse_input(self):
         """
         Tests the parse_input function.
@@ -126,6 +466,93 @@ class TestMovieTheaterSeating(unittest.TestCase):
             self.movie_theater.parse_input(self.parse_input_data / \
                 'test_parse_input_7.txt')
 
+    def test_parse_input_output(self):
+        """
+        Tests the parse_input function with a caller-chosen output file.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = Path(tmp_dir) / 'output.txt'
+            self.movie_theater.parse_input(THIS_DIR.parent / \
+                'test_data/input.txt', output_path)
+            lines = output_path.read_text().split('\n')
+        self.assertEqual(lines[0], "R001 J1 J2")
+        self.assertEqual(lines[29], "R0030 Reservation cannot be made, " + \
+            "not enough seats available")
+
+    def test_reservation_writer(self):
+        """
+        Tests the ReservationWriter class.
+        """
+        f = io.StringIO()
+        writer = ReservationWriter(f, batch_size=2)
+        writer.write("R001", "J1 J2")
+        self.assertEqual(f.getvalue(), "")
+        # A full batch is written as soon as it is complete
+        writer.write("R002", "J6 J7")
+        self.assertEqual(f.getvalue(), "R001 J1 J2\nR002 J6 J7\n")
+        writer.write("R003", "I1")
+        writer.close()
+        self.assertEqual(f.getvalue(), "R001 J1 J2\nR002 J6 J7\nR003 I1\n")
+        self.assertEqual(writer.path, None)
+        self.assertFalse(f.closed)
+
+    def test_csv_reservation_writer(self):
+        """
+        Tests the CsvReservationWriter class.
+        """
+        f = io.StringIO()
+        with CsvReservationWriter(f) as writer:
+            writer.write_seats("R001", "J", 1, 3)
+            writer.write_seats('R,"2"', "AB", 12, 1)
+            writer.write("R003", "Reservation cannot be made, not enough " + \
+                "seats available")
+        self.assertEqual(f.getvalue().splitlines(), [
+            "reservation,row,first_seat,count,message",
+            "R001,J,1,3,",
+            '"R,""2""",AB,12,1,',
+            'R003,,,0,"Reservation cannot be made, not enough seats ' + \
+            'available"'])
+
+    def test_output_formats(self):
+        """
+        Tests that every output format holds the same reservations.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = THIS_DIR.parent / 'test_data/input.txt'
+            text_path = Path(tmp_dir) / "output.txt"
+            MovieTheaterSeating().process_requests(input_path, text_path)
+            expected = [line.split(' ', 1) for line in
+                text_path.read_text().splitlines()]
+            # Seats are only written as labels by the text writer, so the
+            # other formats never build the reservation details
+            movie_theater = MovieTheaterSeating(retain_details=False,
+                output_format="csv")
+            self.assertFalse(movie_theater.format_details)
+            csv_path = Path(tmp_dir) / "output.csv"
+            movie_theater.process_requests(input_path, csv_path)
+            with open(csv_path, newline='') as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual([[row["reservation"], row["message"] or
+                " ".join(row["row"] + str(seat) for seat in
+                range(int(row["first_seat"]), int(row["first_seat"]) + \
+                int(row["count"])))] for row in rows], expected)
+            movie_theater = MovieTheaterSeating(output_format="binary")
+            binary_path = Path(tmp_dir) / "output.bin"
+            movie_theater.process_requests(input_path, binary_path)
+            movie_theater.make_reservation("R100", 20)
+            movie_theater.write_output(binary_path)
+            reservations = read_binary_output(binary_path)
+            self.assertEqual([[res_id, message or " ".join(row_id + str(seat)
+                for seat in range(first_seat, first_seat + count))] for res_id,
+                row_id, first_seat, count, message in reservations[:-1]],
+                expected)
+            self.assertEqual(reservations[-1], ("R100", None, None, 0,
+                "Reservation cannot be made, not enough seats available"))
+            with self.assertRaises(Exception):
+                read_binary_output(text_path)
+        with self.assertRaises(Exception):
+            MovieTheaterSeating(output_format="xml")
+
     def test_write_output(self):
         """
         Tests the write_output function.
@@ -0,0 +1,484 @@
+'''
+Description: This script benchmarks the seating engine on synthetic
+reservation requests at several scales and group-size distributions, timing
+the parsing, allocation and output stages separately.
+@results_file   filepath to write the benchmark results to as JSON
+@baseline_file  (optional) filepath to the JSON results of an earlier run to
+                check for regressions against
+python3 seating_benchmark.py <results_file> [baseline_file]
+'''
+
+import sys
+import os
+import gc
+import json
+import time
+import random
+import platform
+import tempfile
+import tracemalloc
+from movie_theater_seating import MovieTheaterSeating, ReservationWriter, \
+    TheaterLayout, OUTPUT_FORMATS
+
+# The seating engines to benchmark
+ENGINES = {"python": MovieTheaterSeating}
+
+# The group sizes of each distribution and how often they are requested
+GROUP_SIZE_DISTRIBUTIONS = {
+    "small": ([1, 2, 3, 4], [3, 5, 2, 2]),
+    "uniform": (list(range(1, 9)), [1] * 8),
+    "large": ([4, 6, 8, 10, 12, 16, 20], [4, 4, 3, 2, 2, 1, 1])
+}
+
+# The number of requests and the theater layout of each benchmark scale
+SCALES = {
+    "small": (1000, (10, 20, 3)),
+    "medium": (10000, (100, 100, 3)),
+    "large": (100000, (500, 200, 3))
+}
+
+# The number of theaters created at once and their layout at each scale of
+# the cold start benchmark, like a service creating every showtime at boot
+COLD_START_SCALES = {
+    "small": (5000, (10, 20, 3)),
+    "medium": (500, (100, 100, 3)),
+    "large": (50, (500, 200, 3))
+}
+
+# The number of requests and the theater layout of each scale of the output
+# format benchmark, large enough to seat most requests so the output is
+# mostly seat assignments
+OUTPUT_FORMAT_SCALES = {
+    "small": (1000, (50, 100, 3)),
+    "medium": (10000, (200, 500, 3)),
+    "large": (100000, (2000, 1000, 3))
+}
+
+def generate_requests(num_requests, distribution, seed=0):
+    """ Generates synthetic reservation request lines
+
+    Parameters
+    ----------
+    num_requests : int
+        The number of requests to generate
+    distribution : str
+        The name of the group-size distribution to draw from
+    seed : int
+        The seed of the random number generator
+
+    Raises
+    ------
+    Exception
+        If the distribution does not exist
+
+    Returns
+    -------
+    lines : list
+        The reservation request lines, without newline characters
+    """
+    if distribution not in GROUP_SIZE_DISTRIBUTIONS:
+        raise Exception("Unknown distribution " + distribution)
+    sizes, weights = GROUP_SIZE_DISTRIBUTIONS[distribution]
+    rng = random.Random(seed)
+    group_sizes = rng.choices(sizes, weights, k=num_requests)
+    return ["R%d %d" % (i + 1, size) for i, size in enumerate(group_sizes)]
+
+def time_stage(function):
+    """ Times one call to a function with the garbage collector paused
+
+    Parameters
+    ----------
+    function : function
+        The function to time
+
+    Returns
+    -------
+    seconds : float
+        The time taken by the call in seconds
+    result : object
+        The value returned by the function
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = function()
+        return time.perf_counter() - start, result
+    finally:
+        gc.enable()
+
+def parse_line_by_line(movie_theater, input_path):
+    """ Parses a request file one line at a time with validate_request,
+    the way read_requests did before it parsed blocks of lines
+
+    Parameters
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater whose validation rules are used
+    input_path : str
+        The path to the txt file with the reservation requests
+
+    Returns
+    -------
+    requests : list
+        The reservation ID and the number of seats of each request
+    """
+    with open(input_path, 'r') as f:
+        return [movie_theater.validate_request(line.rstrip('\n')) for line
+            in f]
+
+def allocate(movie_theater, requests):
+    """ Books every request in a theater, skipping the ones that fail
+
+    Parameters
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater to book the requests in
+    requests : list
+        The (reservation ID, number of seats) of each request
+
+    Returns
+    -------
+    rejected : int
+        The number of requests that raised an exception
+    """
+    rejected = 0
+    for res_id, num_seats_reserved in requests:
+        try:
+            movie_theater.make_reservation(res_id, num_seats_reserved)
+        except Exception:
+            rejected += 1
+    return rejected
+
+def write_details(movie_theater, output_path):
+    """ Writes the reservation details of a theater to an output file
+
+    Parameters
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater whose reservation details are written
+    output_path : str
+        The path to the output file
+
+    Returns
+    -------
+    None
+    """
+    with ReservationWriter(output_path) as writer:
+        for res_id, res_details in movie_theater.reservation_details.items():
+            writer.write(res_id, res_details)
+
+def run_case(scale, distribution, repeats=3, seed=0, engine="python"):
+    """ Benchmarks one scale and group-size distribution with one engine
+
+    Each stage is run `repeats` times on a fresh theater and the fastest run
+    is kept, which filters out most of the noise from other processes.
+
+    Parameters
+    ----------
+    scale : str
+        The name of the benchmark scale
+    distribution : str
+        The name of the group-size distribution
+    repeats : int
+        The number of times each stage is run
+    seed : int
+        The seed of the random number generator
+    engine : str
+        The name of the seating engine in ENGINES
+
+    Returns
+    -------
+    result : dict
+        The case description and the best time of each stage in seconds
+    """
+    num_requests, layout = SCALES[scale]
+    lines = generate_requests(num_requests, distribution, seed)
+    parse_times = []
+    line_parse_times = []
+    allocate_times = []
+    output_times = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "input.txt")
+        output_path = os.path.join(tmp_dir, "output.txt")
+        with open(input_path, 'w') as f:
+            f.write("\n".join(lines))
+        for i in range(repeats):
+            movie_theater = ENGINES[engine](
+                layout=TheaterLayout.uniform(*layout))
+            seconds, requests = time_stage(lambda: list(
+                movie_theater.read_requests(input_path)))
+            parse_times.append(seconds)
+            seconds, _ = time_stage(lambda: parse_line_by_line(movie_theater,
+                input_path))
+            line_parse_times.append(seconds)
+            seconds, rejected = time_stage(lambda: allocate(movie_theater,
+                requests))
+            allocate_times.append(seconds)
+            seconds, _ = time_stage(lambda: write_details(movie_theater,
+                output_path))
+            output_times.append(seconds)
+    return {
+        "engine": engine,
+        "scale": scale,
+        "distribution": distribution,
+        "requests": num_requests,
+        "layout": list(layout),
+        "rejected": rejected,
+        "parse_seconds": min(parse_times),
+        "line_parse_seconds": min(line_parse_times),
+        "allocate_seconds": min(allocate_times),
+        "output_seconds": min(output_times),
+        "requests_per_second": num_requests / (min(parse_times) + \
+            min(allocate_times) + min(output_times))
+    }
+
+def create_theaters(engine, layout, num_theaters, eager=False):
+    """ Creates many empty theaters with the same layout
+
+    Parameters
+    ----------
+    engine : class
+        The seating engine of the theaters
+    layout : TheaterLayout
+        The geometry of the theaters
+    num_theaters : int
+        The number of theaters to create
+    eager : bool
+        Whether every row gets its own SeatRow right away, the way theaters
+        were created before rows were shared until their first booking
+
+    Returns
+    -------
+    theaters : list
+        The theaters
+    """
+    theaters = []
+    for _ in range(num_theaters):
+        movie_theater = engine(layout=layout)
+        if eager:
+            for row_id in movie_theater.seating_map:
+                movie_theater.get_row_for_update(row_id)
+        theaters.append(movie_theater)
+    return theaters
+
+def run_cold_start(scale, engine="python"):
+    """ Benchmarks the time and memory taken to create many empty theaters
+
+    Theaters are created both with shared empty rows and with a row of
+    their own for every row, so the results show what the shared rows save.
+
+    Parameters
+    ----------
+    scale : str
+        The name of the cold start scale
+    engine : str
+        The name of the seating engine in ENGINES
+
+    Returns
+    -------
+    result : dict
+        The case description, the time in seconds to create the theaters
+        and the bytes allocated per theater, with and without shared rows
+    """
+    num_theaters, layout = COLD_START_SCALES[scale]
+    theater_layout = TheaterLayout.uniform(*layout)
+    result = {
+        "engine": engine,
+        "scale": scale,
+        "theaters": num_theaters,
+        "layout": list(layout)
+    }
+    for name, eager in (("lazy", False), ("eager", True)):
+        seconds, theaters = time_stage(lambda: create_theaters(
+            ENGINES[engine], theater_layout, num_theaters, eager))
+        del theaters
+        # Memory is traced in a separate run, since tracing slows down
+        # every allocation
+        gc.collect()
+        tracemalloc.start()
+        try:
+            theaters = create_theaters(ENGINES[engine], theater_layout,
+                num_theaters, eager)
+            allocated = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del theaters
+        result[name + "_seconds"] = seconds
+        result[name + "_bytes_per_theater"] = allocated / num_theaters
+    return result
+
+def run_output_formats(scale, repeats=3, seed=0):
+    """ Benchmarks seating a request file and writing it in each output
+    format
+
+    The reservation details are not retained, so the formats that encode
+    seat ranges never build the seat labels of a reservation.
+
+    Parameters
+    ----------
+    scale : str
+        The name of the output format scale
+    repeats : int
+        The number of times each format is run
+    seed : int
+        The seed of the random number generator
+
+    Returns
+    -------
+    results : list
+        The best time in seconds and the output size in bytes of each format
+    """
+    num_requests, layout = OUTPUT_FORMAT_SCALES[scale]
+    lines = generate_requests(num_requests, "uniform", seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "input.txt")
+        output_path = os.path.join(tmp_dir, "output")
+        with open(input_path, 'w') as f:
+            f.write("\n".join(lines))
+        for output_format in OUTPUT_FORMATS:
+            times = []
+            for i in range(repeats):
+                movie_theater = MovieTheaterSeating(
+                    layout=TheaterLayout.uniform(*layout),
+                    retain_details=False, output_format=output_format)
+                seconds, _ = time_stage(lambda: movie_theater.process_requests(
+                    input_path, output_path))
+                times.append(seconds)
+            results.append({
+                "format": output_format,
+                "scale": scale,
+                "requests": num_requests,
+                "layout": list(layout),
+                "seconds": min(times),
+                "output_bytes": os.path.getsize(output_path)
+            })
+    return results
+
+def run_benchmarks(scales=None, distributions=None, repeats=3, engines=None):
+    """ Benchmarks every combination of engine, scale and group-size
+    distribution
+
+    Parameters
+    ----------
+    scales : list
+        The names of the scales to run, all of them by default
+    distributions : list
+        The names of the distributions to run, all of them by default
+    repeats : int
+        The number of times each stage is run
+    engines : list
+        The names of the engines to run, all of them by default
+
+    Returns
+    -------
+    results : dict
+        The environment the benchmarks ran in, the result of each case, the
+        cold start result of each engine and scale and the output format
+        results of each scale
+    """
+    cases = []
+    cold_start = []
+    output_formats = []
+    for engine in engines or ENGINES:
+        for scale in scales or SCALES:
+            for distribution in distributions or GROUP_SIZE_DISTRIBUTIONS:
+                cases.append(run_case(scale, distribution, repeats,
+                    engine=engine))
+            cold_start.append(run_cold_start(scale, engine))
+    for scale in scales or SCALES:
+        output_formats.extend(run_output_formats(scale, repeats))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "cases": cases,
+        "cold_start": cold_start,
+        "output_formats": output_formats
+    }
+
+def compare_results(baseline, results, threshold=0.2):
+    """ Finds the stages that got slower than in an earlier run
+
+    Parameters
+    ----------
+    baseline : dict
+        The results of the earlier run
+    results : dict
+        The results of the current run
+    threshold : float
+        The relative slowdown above which a stage counts as a regression
+
+    Returns
+    -------
+    regressions : list
+        A (engine, scale, distribution, stage, baseline seconds, current
+        seconds) tuple for each stage that got slower
+    """
+    regressions = []
+    # Results recorded before there was more than one engine are from the
+    # python engine
+    old_cases = {(case.get("engine", "python"), case["scale"],
+        case["distribution"]): case for case in baseline["cases"]}
+    for case in results["cases"]:
+        key = (case.get("engine", "python"), case["scale"],
+            case["distribution"])
+        old_case = old_cases.get(key)
+        if old_case is None:
+            continue
+        for stage in ("parse_seconds", "allocate_seconds", "output_seconds"):
+            if case[stage] > old_case[stage] * (1 + threshold):
+                regressions.append(key + (stage, old_case[stage],
+                    case[stage]))
+    return regressions
+
+def main():
+    """ Main function to run the benchmarks
+
+    Parameters
+    ----------
+    None
+
+    Raises
+    ------
+    Exception
+        If the wrong number of arguments is provided in the terminal
+
+    Returns
+    -------
+    None
+    """
+    if len(sys.argv) < 2 or len(sys.argv) > 3:
+        raise Exception("Usage: python3 seating_benchmark.py " + \
+            "<results_file> [baseline_file]")
+    results = run_benchmarks()
+    with open(sys.argv[1], 'w') as f:
+        json.dump(results, f, indent=2)
+    for case in results["cases"]:
+        print("%-6s %-6s %-7s parse %.4fs (line by line %.4fs) " \
+            "allocate %.4fs output %.4fs (%.0f requests/s)" % (
+            case["engine"], case["scale"], case["distribution"],
+            case["parse_seconds"], case["line_parse_seconds"],
+            case["allocate_seconds"], case["output_seconds"],
+            case["requests_per_second"]))
+    for case in results["cold_start"]:
+        print("%-6s %-6s %d theaters: %.4fs %.0f bytes each (every row " \
+            "built %.4fs %.0f bytes each)" % (case["engine"], case["scale"],
+            case["theaters"], case["lazy_seconds"],
+            case["lazy_bytes_per_theater"], case["eager_seconds"],
+            case["eager_bytes_per_theater"]))
+    for case in results["output_formats"]:
+        print("%-6s %-6s output: %.4fs %d bytes" % (case["format"],
+            case["scale"], case["seconds"], case["output_bytes"]))
+    if len(sys.argv) == 3:
+        with open(sys.argv[2], 'r') as f:
+            baseline = json.load(f)
+        for engine, scale, distribution, stage, old, new in \
+            compare_results(baseline, results):
+            print("REGRESSION %s %s %s %s: %.4fs -> %.4fs" % (engine, scale,
+                distribution, stage, old, new))
+    print(os.path.abspath(sys.argv[1]))
+
+if __name__ == "__main__":
+    main()
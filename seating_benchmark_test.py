@@ -0,0 +1,77 @@
+'''
+Description: This script contains unit tests for the seating_benchmark.py
+script.
+python3 seating_benchmark_test.py
+'''
+
+import unittest
+from seating_benchmark import generate_requests, run_case, \
+    run_cold_start, run_output_formats, run_benchmarks, compare_results
+
+class TestSeatingBenchmark(unittest.TestCase):
+    """
+    Tests the functions in seating_benchmark.py.
+    """
+    def test_generate_requests(self):
+        """
+        Tests the generate_requests function.
+        """
+        lines = generate_requests(100, "small", seed=1)
+        self.assertEqual(lines, generate_requests(100, "small", seed=1))
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(lines[0].split(' ')[0], "R1")
+        self.assertTrue(all(1 <= int(line.split(' ')[1]) <= 4 for line in
+            lines))
+        with self.assertRaises(Exception):
+            generate_requests(10, "huge")
+
+    def test_run_case(self):
+        """
+        Tests the run_case function.
+        """
+        result = run_case("small", "uniform", repeats=1)
+        self.assertEqual(result["requests"], 1000)
+        self.assertEqual(result["layout"], [10, 20, 3])
+        for stage in ("parse_seconds", "line_parse_seconds",
+            "allocate_seconds", "output_seconds"):
+            self.assertGreater(result[stage], 0)
+
+    def test_run_cold_start(self):
+        """
+        Tests the run_cold_start function.
+        """
+        result = run_cold_start("large")
+        self.assertEqual(result["theaters"], 50)
+        self.assertGreater(result["lazy_seconds"], 0)
+        # Shared empty rows take less memory than a row for every row
+        self.assertLess(result["lazy_bytes_per_theater"],
+            result["eager_bytes_per_theater"])
+
+    def test_run_output_formats(self):
+        """
+        Tests the run_output_formats function.
+        """
+        results = {result["format"]: result for result in
+            run_output_formats("small", repeats=1)}
+        self.assertEqual(sorted(results), ["binary", "csv", "text"])
+        # Seat ranges take less space than seat labels
+        self.assertLess(results["csv"]["output_bytes"],
+            results["text"]["output_bytes"])
+        self.assertLess(results["binary"]["output_bytes"],
+            results["text"]["output_bytes"])
+
+    def test_compare_results(self):
+        """
+        Tests the compare_results function.
+        """
+        baseline = run_benchmarks(["small"], ["small"], repeats=1,
+            engines=["python"])
+        results = {"cases": [dict(baseline["cases"][0])]}
+        self.assertEqual(compare_results(baseline, results), [])
+        results["cases"][0]["allocate_seconds"] *= 2
+        regressions = compare_results(baseline, results)
+        self.assertEqual([regression[:4] for regression in regressions],
+            [("python", "small", "small", "allocate_seconds")])
+
+if __name__ == '__main__':
+    unittest.main()
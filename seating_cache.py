@@ -0,0 +1,328 @@
+'''
+Description: This script caches the state of a theater after each block of
+requests in a request file, so a file that starts with the same requests as
+an earlier one resumes from the longest cached prefix instead of seating
+every request again. Cached states share their rows with the theaters
+created from them and a row is only copied when it is about to change.
+'''
+
+import hashlib
+from itertools import islice
+from collections import OrderedDict
+from movie_theater_seating import MovieTheaterSeating, TheaterLayout, \
+    READ_CHUNK_SIZE
+
+def read_lines(file_path, chunk_size=READ_CHUNK_SIZE):
+    """ Reads the lines of a file one chunk at a time
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the txt file
+    chunk_size : int
+        The number of characters read at a time
+
+    Yields
+    ------
+    line : str
+        A line of the file without its newline character. Like
+        read_requests() of MovieTheaterSeating, a file that ends with a
+        newline has an empty last line
+    """
+    remainder = ""
+    with open(file_path, 'r') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            lines = (remainder + chunk).split('\n')
+            remainder = lines.pop()
+            yield from lines
+    yield remainder
+
+class PrefixState():
+    """
+    A class used to represent the state of a theater after a prefix of a
+    request file.
+
+    Attributes
+    ----------
+    rows : dict
+        The seating map of the theater, whose rows must not be changed
+    available_seats : int
+        The number of available seats in the theater
+    log : list
+        The reservation ID, reservation details and booking (None if it was
+        not seated) of each request, shared by the states of one replay
+    length : int
+        The number of requests in the prefix, which are the first entries of
+        the log
+    """
+
+    __slots__ = ('rows', 'available_seats', 'log', 'length')
+
+    def __init__(self, rows, available_seats, log, length):
+        self.rows = rows
+        self.available_seats = available_seats
+        self.log = log
+        self.length = length
+
+class PrefixCache():
+    """
+    A class used to replay request files from the longest cached prefix.
+
+    The cache key of a prefix is a hash of the theater configuration and of
+    every request line in the prefix, so two files share a cached state only
+    if they start with the same lines. States are stored every
+    checkpoint_interval requests and at the end of each file, and the least
+    recently used ones are evicted once there are more than max_entries.
+
+    Attributes
+    ----------
+    engine : class
+        The seating engine of the replayed theaters
+    placement : str
+        The placement strategy of the replayed theaters
+    max_entries : int
+        The largest number of states kept
+    checkpoint_interval : int
+        The number of requests between stored states
+    entries : OrderedDict
+        The stored states by cache key, from the least recently used
+    hits : int
+        The number of replays that resumed from a stored state
+    misses : int
+        The number of replays that started from an empty theater
+    last_prefix : int
+        The number of requests skipped by the last replay
+
+    Methods
+    -------
+    get_key(digest, length)
+        Gets the cache key of a prefix
+    store(key, movie_theater, log, length, shared)
+        Stores the state of a theater after a prefix
+    resume(layout, state)
+        Creates a theater in a stored state
+    make_copy_on_write(movie_theater, shared)
+        Wraps the methods of a theater that change its rows so shared rows
+        are copied first
+    replay(file_path, output=None, layout=None)
+        Books the reservation requests in a file and writes the reservation
+        details to the output file
+    """
+
+    def __init__(self, engine=MovieTheaterSeating, placement="first",
+        max_entries=64, checkpoint_interval=1000):
+        """
+        Parameters
+        ----------
+        engine : class
+            The seating engine of the replayed theaters
+        placement : str
+            The placement strategy of the replayed theaters
+        max_entries : int
+            The largest number of states kept
+        checkpoint_interval : int
+            The number of requests between stored states
+        """
+        self.engine = engine
+        self.placement = placement
+        self.max_entries = max_entries
+        self.checkpoint_interval = checkpoint_interval
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.last_prefix = 0
+
+    def get_key(self, digest, length):
+        """ Gets the cache key of a prefix
+
+        Parameters
+        ----------
+        digest : hashlib object
+            The hash of the configuration and the lines of the prefix
+        length : int
+            The number of requests in the prefix
+
+        Returns
+        -------
+        key : tuple
+            The number of requests and the digest of the prefix
+        """
+        return length, digest.copy().digest()
+
+    def store(self, key, movie_theater, log, length, shared):
+        """ Stores the state of a theater after a prefix
+
+        Parameters
+        ----------
+        key : tuple
+            The cache key of the prefix
+        movie_theater : MovieTheaterSeating
+            The theater after the prefix
+        log : list
+            The log of the requests in the prefix
+        length : int
+            The number of requests in the prefix
+        shared : set
+            The IDs of the rows of the theater that are shared with stored
+            states
+
+        Returns
+        -------
+        None
+        """
+        self.entries[key] = PrefixState(dict(movie_theater.seating_map),
+            movie_theater.available_seats, log, length)
+        self.entries.move_to_end(key)
+        # Every row is now shared with the stored state
+        shared.update(movie_theater.seating_map)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def resume(self, layout, state):
+        """ Creates a theater in a stored state
+
+        Parameters
+        ----------
+        layout : TheaterLayout
+            The geometry of the theater
+        state : PrefixState
+            The stored state
+
+        Returns
+        -------
+        movie_theater : MovieTheaterSeating
+            The theater in the stored state, sharing its rows with it
+        """
+        movie_theater = self.engine(layout=layout, placement=self.placement)
+        movie_theater.seating_map = dict(state.rows)
+        movie_theater.row_index = movie_theater.generate_row_index()
+        movie_theater.available_seats = state.available_seats
+        for res_id, res_details, booking in state.log[:state.length]:
+            movie_theater.reservation_ids.add(res_id)
+            movie_theater.reservation_details[res_id] = res_details
+            if booking is not None:
+                movie_theater.bookings[res_id] = booking
+        return movie_theater
+
+    def make_copy_on_write(self, movie_theater, shared):
+        """ Wraps the methods of a theater that change its rows so shared
+        rows are copied first
+
+        Parameters
+        ----------
+        movie_theater : MovieTheaterSeating
+            The theater to wrap
+        shared : set
+            The IDs of the rows of the theater that are shared with stored
+            states
+
+        Returns
+        -------
+        movie_theater : MovieTheaterSeating
+            The same theater, which no longer changes shared rows
+        """
+        reserve_seats = movie_theater.reserve_seats
+        release_seats = movie_theater.release_seats
+
+        def own_row(row_id):
+            if row_id in shared:
+                shared.discard(row_id)
+                movie_theater.seating_map[row_id] = \
+                    movie_theater.seating_map[row_id].copy()
+
+        def copying_reserve_seats(row_id, num_seats_reserved):
+            own_row(row_id)
+            return reserve_seats(row_id, num_seats_reserved)
+
+        def copying_release_seats(row_id, first_seat, num_seats):
+            own_row(row_id)
+            return release_seats(row_id, first_seat, num_seats)
+
+        movie_theater.reserve_seats = copying_reserve_seats
+        movie_theater.release_seats = copying_release_seats
+        return movie_theater
+
+    def replay(self, file_path, output=None, layout=None):
+        """ Books the reservation requests in a file and writes the
+        reservation details to the output file
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the txt file with the reservation requests
+        output : str or file object
+            The path or file object to write the reservation details to,
+            test_data/output.txt next to this script by default
+        layout : TheaterLayout
+            The geometry of the theater, 10 rows of 20 seats with 3 seats
+            between reservations by default
+
+        Raises
+        ------
+        Exception
+            If a line of the file is not a valid reservation request
+
+        Returns
+        -------
+        movie_theater : MovieTheaterSeating
+            The theater with every request in the file booked
+        """
+        layout = layout or TheaterLayout.uniform(10, 20, 3)
+        digest = hashlib.blake2b(repr((self.engine.__name__, self.placement,
+            layout.seats_per_row, layout.space_between_res)).encode(),
+            digest_size=16)
+        # Hash every prefix that could have been stored and keep the longest
+        # one that is in the cache. The file is streamed twice, once here
+        # and once to seat the requests, so it is never held in memory
+        state = None
+        digests = []
+        length = 0
+        for line in read_lines(file_path):
+            digest.update(line.encode() + b'\n')
+            length += 1
+            if length % self.checkpoint_interval == 0:
+                digests.append(self.get_key(digest, length))
+        # The state after the whole file is stored as well
+        if length % self.checkpoint_interval != 0:
+            digests.append(self.get_key(digest, length))
+        for key in digests:
+            if key in self.entries:
+                state = self.entries[key]
+                self.entries.move_to_end(key)
+        shared = set()
+        if state is None:
+            self.misses += 1
+            self.last_prefix = 0
+            movie_theater = self.engine(layout=layout,
+                placement=self.placement)
+            log = []
+        else:
+            self.hits += 1
+            self.last_prefix = state.length
+            movie_theater = self.resume(layout, state)
+            shared.update(movie_theater.seating_map)
+            # Keep appending to the log of the stored state unless a longer
+            # prefix of a different file was logged after it
+            log = state.log
+            if len(log) > state.length:
+                log = log[:state.length]
+        self.make_copy_on_write(movie_theater, shared)
+        keys = {key[0]: key for key in digests}
+        with movie_theater.open_writer(output) as writer:
+            for res_id, res_details, _ in log:
+                writer.write(res_id, res_details)
+            # The requests of the prefix are skipped, since their results
+            # were written from the log
+            requests = islice(movie_theater.read_requests(file_path),
+                self.last_prefix, None)
+            for i, (res_id, num_seats_reserved) in enumerate(requests,
+                self.last_prefix):
+                res_details = movie_theater.make_reservation(res_id,
+                    num_seats_reserved)
+                writer.write(res_id, res_details)
+                log.append((res_id, res_details,
+                    movie_theater.bookings.get(res_id)))
+                if i + 1 in keys:
+                    self.store(keys[i + 1], movie_theater, log, i + 1,
+                        shared)
+        return movie_theater
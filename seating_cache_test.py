@@ -0,0 +1,145 @@
+'''
+Description: This script contains unit tests for the seating_cache.py
+script.
+python3 seating_cache_test.py
+'''
+
+import tempfile
+import unittest
+from pathlib import Path
+from movie_theater_seating import MovieTheaterSeating, TheaterLayout
+from seating_benchmark import generate_requests
+from seating_cache import PrefixCache, read_lines
+
+class TestPrefixCache(unittest.TestCase):
+    """
+    Tests the PrefixCache class in seating_cache.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.tmp_dir.name)
+        self.layout = TheaterLayout.uniform(20, 30, 3)
+        self.lines = generate_requests(500, "uniform", seed=3)
+        self.cache = PrefixCache(max_entries=8, checkpoint_interval=100)
+
+    def tearDown(self):
+        """
+        Removes the files written by each test
+        """
+        self.tmp_dir.cleanup()
+
+    def write_input(self, name, lines):
+        """
+        Writes a request file and returns its path
+        """
+        input_path = self.output_dir / name
+        input_path.write_text("\n".join(lines))
+        return input_path
+
+    def assertSameOutput(self, input_path, movie_theater):
+        """
+        Checks that a replayed theater wrote the same output as seating the
+        file from scratch
+        """
+        expected = MovieTheaterSeating(layout=self.layout)
+        expected.process_requests(input_path, self.output_dir / "expected.txt")
+        self.assertEqual((self.output_dir / "output.txt").read_text(),
+            (self.output_dir / "expected.txt").read_text())
+        self.assertEqual(movie_theater.bookings, expected.bookings)
+        self.assertEqual(movie_theater.available_seats,
+            expected.available_seats)
+        self.assertEqual(movie_theater.row_index, expected.row_index)
+
+    def test_replay(self):
+        """
+        Tests that replays resume from the longest cached prefix.
+        """
+        base_path = self.write_input("base.txt", self.lines)
+        movie_theater = self.cache.replay(base_path, self.output_dir /
+            "output.txt", self.layout)
+        self.assertEqual(self.cache.last_prefix, 0)
+        self.assertSameOutput(base_path, movie_theater)
+        # Only the last requests differ, so the replay resumes after the
+        # last checkpoint before them
+        tail_path = self.write_input("tail.txt", self.lines[:450] + \
+            ["X%d %d" % (i, i % 5 + 1) for i in range(80)])
+        movie_theater = self.cache.replay(tail_path, self.output_dir /
+            "output.txt", self.layout)
+        self.assertEqual(self.cache.last_prefix, 400)
+        self.assertSameOutput(tail_path, movie_theater)
+        # The same file again resumes from its end
+        self.cache.replay(base_path, self.output_dir / "output.txt",
+            self.layout)
+        self.assertEqual(self.cache.last_prefix, 500)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+        # A different layout does not share the cached states
+        self.cache.replay(base_path, self.output_dir / "output.txt",
+            TheaterLayout.uniform(20, 30, 2))
+        self.assertEqual(self.cache.last_prefix, 0)
+
+    def test_copy_on_write(self):
+        """
+        Tests that changing a replayed theater does not change the cache.
+        """
+        base_path = self.write_input("base.txt", self.lines)
+        self.cache.replay(base_path, self.output_dir / "output.txt",
+            self.layout)
+        movie_theater = self.cache.replay(base_path, self.output_dir /
+            "output.txt", self.layout)
+        # The rows are shared with the cached state until they change
+        state = next(reversed(self.cache.entries.values()))
+        self.assertIs(movie_theater.seating_map["A"], state.rows["A"])
+        row_id = movie_theater.bookings["R1"][0]
+        occupancy = bytes(state.rows[row_id].occupancy)
+        movie_theater.cancel_reservation("R1")
+        self.assertIsNot(movie_theater.seating_map[row_id],
+            state.rows[row_id])
+        self.assertEqual(bytes(state.rows[row_id].occupancy), occupancy)
+        movie_theater = self.cache.replay(base_path, self.output_dir /
+            "output.txt", self.layout)
+        self.assertSameOutput(base_path, movie_theater)
+
+    def test_eviction(self):
+        """
+        Tests that the least recently used states are evicted.
+        """
+        cache = PrefixCache(max_entries=3, checkpoint_interval=100)
+        base_path = self.write_input("base.txt", self.lines)
+        cache.replay(base_path, self.output_dir / "output.txt", self.layout)
+        self.assertEqual([key[0] for key in cache.entries], [300, 400, 500])
+        tail_path = self.write_input("tail.txt", self.lines[:250])
+        cache.replay(tail_path, self.output_dir / "output.txt", self.layout)
+        self.assertEqual(cache.last_prefix, 0)
+        self.assertEqual([key[0] for key in cache.entries], [100, 200, 250])
+
+    def test_read_lines(self):
+        """
+        Tests that read_lines splits a file the same way at any chunk size.
+        """
+        input_path = self.output_dir / "lines.txt"
+        for text in ["", "\n", "R001 2", "R001 2\nR002 3\n",
+            "\n".join(self.lines)]:
+            input_path.write_text(text)
+            for chunk_size in (1, 3, 1 << 20):
+                self.assertEqual(list(read_lines(input_path, chunk_size)),
+                    text.split('\n'))
+
+    def test_invalid_request(self):
+        """
+        Tests that invalid requests raise like process_requests.
+        """
+        input_path = self.write_input("invalid.txt", self.lines[:150] + \
+            ["R1 2"])
+        with self.assertRaises(Exception):
+            self.cache.replay(input_path, self.output_dir / "output.txt",
+                self.layout)
+        with self.assertRaises(Exception):
+            self.cache.replay(input_path, self.output_dir / "output.txt",
+                self.layout)
+        self.assertEqual(self.cache.last_prefix, 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,450 @@
+'''
+Description: This script provides opt-in instrumentation for the seating
+engine: per-stage timing histograms, counters for rows compared, rejected
+requests and seats reserved, theater utilization, and sinks that publish
+them to a log, a JSON file or a Prometheus text file.
+'''
+
+import json
+import time
+import logging
+from bisect import bisect_left
+
+# The upper bounds in seconds of the buckets of each timing histogram
+BUCKET_BOUNDS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 1e-2, 1e-1, 1.0, float('Inf'))
+
+# The message of a reservation that could not be seated
+NOT_ENOUGH_SEATS = "Reservation cannot be made, not enough seats available"
+
+def count_comparisons(size, position):
+    """ Counts the comparisons bisect_left() makes in a sorted list
+
+    Parameters
+    ----------
+    size : int
+        The length of the list
+    position : int
+        The position bisect_left() returns
+
+    Returns
+    -------
+    comparisons : int
+        The number of list items bisect_left() compares with the value
+    """
+    comparisons = 0
+    low = 0
+    high = size
+    # Every item before the position is less than the value and every item
+    # from it on is not, which decides each step of the search
+    while low < high:
+        middle = (low + high) // 2
+        comparisons += 1
+        if middle < position:
+            low = middle + 1
+        else:
+            high = middle
+    return comparisons
+
+class Histogram():
+    """
+    A class used to represent the distribution of the durations of a stage.
+
+    Attributes
+    ----------
+    counts : list
+        The number of durations that fell in each bucket of BUCKET_BOUNDS
+    total : float
+        The sum of the durations in seconds
+    count : int
+        The number of durations observed
+
+    Methods
+    -------
+    observe(seconds)
+        Adds a duration to the histogram
+    """
+
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKET_BOUNDS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        """ Adds a duration to the histogram
+
+        Parameters
+        ----------
+        seconds : float
+            The duration in seconds
+
+        Returns
+        -------
+        None
+        """
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+class SeatingMetrics():
+    """
+    A class used to collect metrics from instrumented theaters.
+
+    Nothing is measured until a theater is passed to instrument(), which
+    wraps the hot-path methods of that one theater, so theaters that are not
+    instrumented run exactly the same code as before.
+
+    Attributes
+    ----------
+    venue : str
+        The name of the venue the metrics are labeled with
+    histograms : dict
+        The timing histogram of each stage
+    counters : dict
+        The value of each counter
+    theaters : list
+        The instrumented theaters, used to compute utilization
+    sinks : list
+        The sinks the metrics are published to by emit()
+
+    Methods
+    -------
+    instrument(movie_theater)
+        Wraps the hot-path methods of a theater to collect metrics
+    timed(stage, method)
+        Wraps a method to record its duration in the histogram of a stage
+    increment(counter, amount=1)
+        Adds to the value of a counter
+    utilization()
+        Gets the fraction of seats reserved in the instrumented theaters
+    snapshot()
+        Gets the current value of every metric
+    emit()
+        Publishes the current metrics to every sink
+    """
+
+    def __init__(self, venue="default", sinks=None):
+        """
+        Parameters
+        ----------
+        venue : str
+            The name of the venue the metrics are labeled with
+        sinks : list
+            The sinks the metrics are published to by emit()
+        """
+        self.venue = venue
+        self.histograms = {}
+        self.counters = {
+            "requests_parsed": 0,
+            "requests_invalid": 0,
+            "reservations_requested": 0,
+            "reservations_rejected": 0,
+            "seats_reserved": 0,
+            "row_lookups": 0,
+            "rows_compared": 0
+        }
+        self.theaters = []
+        self.sinks = sinks or []
+
+    def increment(self, counter, amount=1):
+        """ Adds to the value of a counter
+
+        Parameters
+        ----------
+        counter : str
+            The name of the counter
+        amount : int
+            The amount to add
+
+        Returns
+        -------
+        None
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def timed(self, stage, method):
+        """ Wraps a method to record its duration in the histogram of a stage
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage
+        method : function
+            The method to wrap
+
+        Returns
+        -------
+        wrapper : function
+            The method with its duration recorded on every call
+        """
+        histogram = self.histograms.setdefault(stage, Histogram())
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start)
+        return wrapper
+
+    def instrument(self, movie_theater):
+        """ Wraps the hot-path methods of a theater to collect metrics
+
+        Parameters
+        ----------
+        movie_theater : MovieTheaterSeating
+            The theater to instrument
+
+        Returns
+        -------
+        movie_theater : MovieTheaterSeating
+            The same theater, now reporting to these metrics
+        """
+        self.theaters.append(movie_theater)
+        parse_lines = self.timed("parse", movie_theater.parse_lines)
+        validate_request = movie_theater.validate_request
+        find_best_seats = self.timed("allocate",
+            movie_theater.find_best_seats)
+        find_closest_row = self.timed("find_row",
+            movie_theater.find_closest_row)
+        open_writer = movie_theater.open_writer
+
+        def counted_parse_lines(block, first_line_number, rejects=None):
+            requests, error = parse_lines(block, first_line_number, rejects)
+            self.counters["requests_parsed"] += len(requests)
+            return requests, error
+
+        def counted_validate_request(res):
+            try:
+                return validate_request(res)
+            except Exception:
+                self.counters["requests_invalid"] += 1
+                raise
+
+        def counted_find_best_seats(num_seats_reserved, res_id):
+            self.counters["reservations_requested"] += 1
+            available_seats = movie_theater.available_seats
+            try:
+                res_details = find_best_seats(num_seats_reserved, res_id)
+            except Exception:
+                self.counters["reservations_rejected"] += 1
+                raise
+            if res_details == NOT_ENOUGH_SEATS:
+                self.counters["reservations_rejected"] += 1
+            self.counters["seats_reserved"] += available_seats - \
+                movie_theater.available_seats
+            return res_details
+
+        def counted_find_closest_row(num_seats_reserved):
+            self.counters["row_lookups"] += 1
+            # Replay the path of the binary search over the row index to
+            # count the index entries it compares
+            row_index = movie_theater.row_index
+            self.counters["rows_compared"] += count_comparisons(
+                len(row_index), bisect_left(row_index,
+                (num_seats_reserved,)))
+            return find_closest_row(num_seats_reserved)
+
+        def timed_open_writer(output=None):
+            writer = open_writer(output)
+            writer.flush = self.timed("output", writer.flush)
+            return writer
+
+        movie_theater.parse_lines = counted_parse_lines
+        movie_theater.validate_request = counted_validate_request
+        movie_theater.find_best_seats = counted_find_best_seats
+        movie_theater.find_closest_row = counted_find_closest_row
+        movie_theater.reserve_seats = self.timed("update_seats",
+            movie_theater.reserve_seats)
+        movie_theater.print_reservation = self.timed("print_reservation",
+            movie_theater.print_reservation)
+        movie_theater.open_writer = timed_open_writer
+        return movie_theater
+
+    def utilization(self):
+        """ Gets the fraction of seats reserved in the instrumented theaters
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        utilization : float
+            The number of seats reserved over the number of seats
+        """
+        total_seats = 0
+        reserved_seats = 0
+        for movie_theater in self.theaters:
+            theater_seats = sum(movie_theater.layout.seats_per_row)
+            total_seats += theater_seats
+            reserved_seats += theater_seats - movie_theater.available_seats
+        return reserved_seats / total_seats if total_seats else 0.0
+
+    def snapshot(self):
+        """ Gets the current value of every metric
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        snapshot : dict
+            The venue, the counters, the utilization and, for each stage,
+            the number of calls, the total and mean seconds and the
+            cumulative count of calls in each histogram bucket
+        """
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            buckets = []
+            cumulative = 0
+            for bound, count in zip(BUCKET_BOUNDS, histogram.counts):
+                cumulative += count
+                buckets.append([bound, cumulative])
+            stages[stage] = {
+                "count": histogram.count,
+                "total_seconds": histogram.total,
+                "mean_seconds": histogram.total / histogram.count if \
+                    histogram.count else 0.0,
+                "buckets": buckets
+            }
+        return {
+            "venue": self.venue,
+            "counters": dict(self.counters),
+            "utilization": self.utilization(),
+            "stages": stages
+        }
+
+    def emit(self):
+        """ Publishes the current metrics to every sink
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.emit(snapshot)
+
+class LogSink():
+    """
+    A class used to publish metrics as log lines.
+
+    Attributes
+    ----------
+    logger : logging.Logger
+        The logger to write to
+    level : int
+        The level of the log lines
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("seating_metrics")
+        self.level = level
+
+    def emit(self, snapshot):
+        """ Writes one log line for the counters and one for each stage
+
+        Parameters
+        ----------
+        snapshot : dict
+            The metrics returned by SeatingMetrics.snapshot
+
+        Returns
+        -------
+        None
+        """
+        counters = " ".join("%s=%d" % item for item in
+            snapshot["counters"].items())
+        self.logger.log(self.level, "venue=%s %s utilization=%.4f",
+            snapshot["venue"], counters, snapshot["utilization"])
+        for stage, summary in snapshot["stages"].items():
+            self.logger.log(self.level,
+                "venue=%s stage=%s count=%d total=%.6fs mean=%.9fs",
+                snapshot["venue"], stage, summary["count"],
+                summary["total_seconds"], summary["mean_seconds"])
+
+class JsonSink():
+    """
+    A class used to publish metrics to a JSON file.
+
+    Attributes
+    ----------
+    file_path : str
+        The path to the JSON file, which is overwritten on every emit
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def emit(self, snapshot):
+        """ Writes the metrics to the JSON file
+
+        Parameters
+        ----------
+        snapshot : dict
+            The metrics returned by SeatingMetrics.snapshot
+
+        Returns
+        -------
+        None
+        """
+        with open(self.file_path, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+
+class PrometheusSink():
+    """
+    A class used to publish metrics to a file in the Prometheus text
+    exposition format, for the node exporter textfile collector.
+
+    Attributes
+    ----------
+    file_path : str
+        The path to the text file, which is overwritten on every emit
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def emit(self, snapshot):
+        """ Writes the metrics to the text file
+
+        Parameters
+        ----------
+        snapshot : dict
+            The metrics returned by SeatingMetrics.snapshot
+
+        Returns
+        -------
+        None
+        """
+        venue = snapshot["venue"].replace('\\', '\\\\').replace('"', '\\"')
+        lines = []
+        for counter, value in snapshot["counters"].items():
+            lines.append("# TYPE seating_%s_total counter" % counter)
+            lines.append('seating_%s_total{venue="%s"} %d' % (counter, venue,
+                value))
+        lines.append("# TYPE seating_utilization gauge")
+        lines.append('seating_utilization{venue="%s"} %r' % (venue,
+            snapshot["utilization"]))
+        lines.append("# TYPE seating_stage_seconds histogram")
+        for stage, summary in snapshot["stages"].items():
+            labels = 'venue="%s",stage="%s"' % (venue, stage)
+            for bound, count in summary["buckets"]:
+                le = "+Inf" if bound == float('Inf') else repr(bound)
+                lines.append('seating_stage_seconds_bucket{%s,le="%s"} %d' % \
+                    (labels, le, count))
+            lines.append("seating_stage_seconds_sum{%s} %r" % (labels,
+                summary["total_seconds"]))
+            lines.append("seating_stage_seconds_count{%s} %d" % (labels,
+                summary["count"]))
+        with open(self.file_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
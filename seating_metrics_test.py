@@ -0,0 +1,121 @@
+'''
+Description: This script contains unit tests for the seating_metrics.py
+script.
+python3 seating_metrics_test.py
+'''
+
+import io
+import json
+import logging
+import tempfile
+import unittest
+from bisect import bisect_left
+from pathlib import Path
+from movie_theater_seating import MovieTheaterSeating
+from seating_metrics import Histogram, SeatingMetrics, LogSink, JsonSink, \
+    PrometheusSink, count_comparisons
+
+THIS_DIR = Path(__file__)
+
+class TestSeatingMetrics(unittest.TestCase):
+    """
+    Tests the functions in seating_metrics.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.tmp_dir.name)
+        self.metrics = SeatingMetrics(venue="Hall 1")
+        self.movie_theater = self.metrics.instrument(MovieTheaterSeating())
+        self.movie_theater.process_requests(THIS_DIR.parent / \
+            'test_data/input.txt', self.output_dir / 'output.txt')
+
+    def tearDown(self):
+        """
+        Removes the files written by each test
+        """
+        self.tmp_dir.cleanup()
+
+    def test_histogram(self):
+        """
+        Tests the Histogram class.
+        """
+        histogram = Histogram()
+        histogram.observe(3e-6)
+        histogram.observe(2.0)
+        self.assertEqual(histogram.count, 2)
+        self.assertEqual(histogram.counts[2], 1)
+        self.assertEqual(histogram.counts[-1], 1)
+
+    def test_count_comparisons(self):
+        """
+        Tests that count_comparisons counts the comparisons of bisect_left.
+        """
+        class Counted(int):
+            comparisons = 0
+
+            def __lt__(self, other):
+                Counted.comparisons += 1
+                return int(self) < int(other)
+
+        for size in range(12):
+            values = [Counted(2 * i) for i in range(size)]
+            for value in range(-1, 2 * size + 1):
+                Counted.comparisons = 0
+                position = bisect_left(values, value)
+                self.assertEqual(count_comparisons(size, position),
+                    Counted.comparisons)
+
+    def test_instrument(self):
+        """
+        Tests the instrument function.
+        """
+        # The instrumented theater seats requests exactly as before
+        lines = (self.output_dir / 'output.txt').read_text().split('\n')
+        self.assertEqual(lines[0], "R001 J1 J2")
+        self.assertEqual(lines[30], "R0031 F20")
+        counters = self.metrics.counters
+        self.assertEqual(counters["requests_parsed"], 31)
+        self.assertEqual(counters["reservations_requested"], 31)
+        self.assertEqual(counters["reservations_rejected"], 1)
+        self.assertEqual(counters["seats_reserved"], 145)
+        self.assertEqual(counters["row_lookups"], 31)
+        # Each lookup compares 3 or 4 of the 10 entries of the row index
+        self.assertEqual(counters["rows_compared"], 110)
+        stages = self.metrics.snapshot()["stages"]
+        # The sample file is parsed as one block and its last line
+        self.assertEqual(stages["parse"]["count"], 2)
+        self.assertEqual(stages["allocate"]["count"], 31)
+        self.assertEqual(stages["output"]["count"], 1)
+        self.assertEqual(stages["allocate"]["buckets"][-1][1], 31)
+        self.assertAlmostEqual(self.metrics.utilization(), 145 / 200)
+        with self.assertRaises(Exception):
+            self.movie_theater.validate_request("R001")
+        self.assertEqual(counters["requests_invalid"], 1)
+
+    def test_sinks(self):
+        """
+        Tests the LogSink, JsonSink and PrometheusSink classes.
+        """
+        stream = io.StringIO()
+        logger = logging.getLogger("seating_metrics_test")
+        logger.addHandler(logging.StreamHandler(stream))
+        logger.setLevel(logging.INFO)
+        self.metrics.sinks = [LogSink(logger), JsonSink(self.output_dir / \
+            'metrics.json'), PrometheusSink(self.output_dir / 'metrics.prom')]
+        self.metrics.emit()
+        self.assertIn("venue=Hall 1 stage=allocate count=31", stream.getvalue())
+        snapshot = json.loads((self.output_dir / 'metrics.json').read_text())
+        self.assertEqual(snapshot["counters"]["reservations_rejected"], 1)
+        prometheus = (self.output_dir / 'metrics.prom').read_text()
+        self.assertIn('seating_reservations_rejected_total{venue="Hall 1"} 1',
+            prometheus)
+        self.assertIn('seating_stage_seconds_bucket{venue="Hall 1",' + \
+            'stage="allocate",le="+Inf"} 31', prometheus)
+        self.assertIn('seating_stage_seconds_count{venue="Hall 1",' + \
+            'stage="parse"} 2', prometheus)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,301 @@
+'''
+Description: This script seats a whole batch of reservation requests at once
+to maximize the number of occupied seats, for presale batches where every
+request is known before any seat is published. Each row is packed with a
+knapsack over the group sizes that are left, and the result is compared with
+seating the requests one at a time in arrival order.
+@input_file     filepath to the txt file with the reservation requests
+@output_file    (optional) filepath to write the seat assignments to
+@time_budget    (optional) seconds the optimizer may run before it falls back
+                to seating the requests in arrival order, 1 by default
+python3 seating_optimizer.py <input_file> [output_file] [time_budget]
+'''
+
+import sys
+import time
+from movie_theater_seating import MovieTheaterSeating, TheaterLayout, \
+    get_row_label
+
+# The message of a reservation that could not be seated
+NOT_ENOUGH_SEATS = "Reservation cannot be made, not enough seats available"
+# The message of a reservation larger than every row of the theater
+TOO_MANY_SEATS = "Reservation cannot be made, too many seats requested"
+
+def read_batch(movie_theater, file_path):
+    """ Reads and validates every reservation request in a file
+
+    Parameters
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater whose validation rules are used
+    file_path : str
+        The path to the txt file with the reservation requests
+
+    Raises
+    ------
+    Exception
+        If a line of the file is not a valid reservation request
+        If there is a duplicate reservation ID
+
+    Returns
+    -------
+    requests : list
+        The reservation ID and the number of seats of each request, in
+        arrival order
+    """
+    requests = []
+    res_ids = set()
+    for res_id, num_seats_reserved in movie_theater.read_requests(file_path):
+        if res_id in res_ids:
+            raise Exception("Reservation already made")
+        res_ids.add(res_id)
+        requests.append((res_id, num_seats_reserved))
+    return requests
+
+def seat_greedy(layout, requests):
+    """ Seats the requests one at a time in arrival order
+
+    Unlike process_requests, a request that cannot be seated does not stop
+    the batch, so every request has reservation details.
+
+    Parameters
+    ----------
+    layout : TheaterLayout
+        The geometry of the theater
+    requests : list
+        The reservation ID and the number of seats of each request
+
+    Returns
+    -------
+    movie_theater : MovieTheaterSeating
+        The theater with the requests seated
+    """
+    movie_theater = MovieTheaterSeating(layout=layout)
+    for res_id, num_seats_reserved in requests:
+        try:
+            movie_theater.make_reservation(res_id, num_seats_reserved)
+        except Exception as e:
+            movie_theater.reservation_details[res_id] = str(e)
+    return movie_theater
+
+def pack_row(capacity, space_between_res, counts):
+    """ Finds the group sizes that fill one row with the most seats
+
+    A row of L seats can seat a set of groups if the groups and a buffer
+    after each of them fit in L seats plus one buffer, since the last group
+    of the row does not need its buffer. That makes each row a bounded
+    knapsack where a group of g seats weighs g plus the buffer. Groups of the
+    same size are split into 1, 2, 4, ... copies so the knapsack only has a
+    logarithmic number of items per size.
+
+    Parameters
+    ----------
+    capacity : int
+        The number of seats in the row
+    space_between_res : int
+        The amount of space (seats) needed between 2 reservations
+    counts : dict
+        The number of requests left of each group size
+
+    Returns
+    -------
+    packing : dict
+        The number of groups of each size to seat in the row
+    """
+    capacity += space_between_res
+    best = [0] * (capacity + 1)
+    items = []
+    taken = []
+    for size, count in counts.items():
+        weight = size + space_between_res
+        count = min(count, capacity // weight)
+        copies = 1
+        while count > 0:
+            copies = min(copies, count)
+            items.append((size, copies))
+            taken.append(bytearray(capacity + 1))
+            item_weight = weight * copies
+            item_value = size * copies
+            choices = taken[-1]
+            for c in range(capacity, item_weight - 1, -1):
+                value = best[c - item_weight] + item_value
+                if value > best[c]:
+                    best[c] = value
+                    choices[c] = 1
+            count -= copies
+            copies *= 2
+    # Walk the choices back from the full row to recover the groups
+    packing = {}
+    c = capacity
+    for (size, copies), choices in zip(reversed(items), reversed(taken)):
+        if choices[c]:
+            packing[size] = packing.get(size, 0) + copies
+            c -= (size + space_between_res) * copies
+    return packing
+
+def seat_optimized(layout, requests, deadline=None):
+    """ Seats the requests to maximize the number of occupied seats
+
+    The rows are packed one at a time from the back of the theater, each with
+    the groups that fill it best among the requests that are left. A packing
+    is reused for the following rows of the same length while enough
+    requests of each size are left, so the knapsack only runs a few times for
+    large theaters. Among requests of the same size, the earliest ones are
+    seated first.
+
+    Parameters
+    ----------
+    layout : TheaterLayout
+        The geometry of the theater
+    requests : list
+        The reservation ID and the number of seats of each request
+    deadline : float
+        The time.perf_counter() value after which the optimizer gives up
+
+    Returns
+    -------
+    movie_theater : MovieTheaterSeating
+        The theater with the requests seated, or None if the deadline passed
+    """
+    movie_theater = MovieTheaterSeating(layout=layout)
+    space_between_res = layout.space_between_res
+    # The requests left of each group size, in arrival order
+    queues = {}
+    for position, (res_id, num_seats_reserved) in enumerate(requests):
+        if num_seats_reserved <= movie_theater.seats_per_row:
+            queues.setdefault(num_seats_reserved, []).append((position,
+                res_id))
+    queues = {size: queue[::-1] for size, queue in queues.items()}
+    packing = {}
+    packing_capacity = None
+    for i in range(layout.num_rows - 1, -1, -1):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        counts = {size: len(queue) for size, queue in queues.items() if queue}
+        if not counts:
+            break
+        capacity = layout.seats_per_row[i]
+        if capacity != packing_capacity or any(counts.get(size, 0) < number
+            for size, number in packing.items()):
+            packing = pack_row(capacity, space_between_res, counts)
+            packing_capacity = capacity
+        # Seat the groups from the front of the row in arrival order
+        row_id = get_row_label(i)
+        old_free_seats = len(movie_theater.seating_map[row_id])
+        groups = []
+        for size, number in packing.items():
+            for _ in range(number):
+                groups.append(queues[size].pop() + (size,))
+        if not groups:
+            continue
+        groups.sort()
+        row_seats = movie_theater.get_row_for_update(row_id)
+        first_seat = 0
+        for _, res_id, size in groups:
+            num_buffer_seats = min(space_between_res, capacity - first_seat - \
+                size)
+            row_seats.occupy(first_seat, size, num_buffer_seats)
+            movie_theater.bookings[res_id] = (row_id, first_seat, size,
+                num_buffer_seats)
+            movie_theater.available_seats -= size
+            first_seat += size + num_buffer_seats
+        movie_theater.update_row_index(row_id, old_free_seats)
+    # Write the reservation details in arrival order
+    for res_id, num_seats_reserved in requests:
+        movie_theater.reservation_ids.add(res_id)
+        if res_id in movie_theater.bookings:
+            row_id, first_seat, size, _ = movie_theater.bookings[res_id]
+            movie_theater.reservation_details[res_id] = \
+                movie_theater.print_reservation(range(first_seat + 1,
+                first_seat + size + 1), size, row_id)
+        elif num_seats_reserved > movie_theater.seats_per_row:
+            movie_theater.reservation_details[res_id] = TOO_MANY_SEATS
+        else:
+            movie_theater.reservation_details[res_id] = NOT_ENOUGH_SEATS
+    return movie_theater
+
+def optimize(file_path, layout=None, time_budget=1.0):
+    """ Seats a batch of requests with the optimizer and reports the gain
+    over seating them in arrival order
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the txt file with the reservation requests
+    layout : TheaterLayout
+        The geometry of the theater, 10 rows of 20 seats with 3 seats
+        between reservations by default
+    time_budget : float
+        The seconds the optimizer may run before it falls back to seating
+        the requests in arrival order
+
+    Raises
+    ------
+    Exception
+        If a line of the file is not a valid reservation request
+        If there is a duplicate reservation ID
+
+    Returns
+    -------
+    movie_theater : MovieTheaterSeating
+        The theater seated by whichever method occupied more seats
+    report : dict
+        The number of requests and seats, the seats occupied by each method,
+        the gain of the optimizer, the method used and the seconds taken
+    """
+    start = time.perf_counter()
+    layout = layout or TheaterLayout.uniform(10, 20, 3)
+    requests = read_batch(MovieTheaterSeating(layout=layout), file_path)
+    greedy = seat_greedy(layout, requests)
+    total_seats = sum(layout.seats_per_row)
+    greedy_seats = total_seats - greedy.available_seats
+    optimized = seat_optimized(layout, requests, start + time_budget)
+    if optimized is None:
+        optimized_seats = None
+        gain = 0
+    else:
+        optimized_seats = total_seats - optimized.available_seats
+        gain = optimized_seats - greedy_seats
+    # Keep the arrival order result unless the optimizer seats more people
+    movie_theater = optimized if gain > 0 else greedy
+    return movie_theater, {
+        "requests": len(requests),
+        "seats": total_seats,
+        "greedy_seats": greedy_seats,
+        "optimized_seats": optimized_seats,
+        "gain": gain,
+        "method": "optimized" if gain > 0 else "greedy",
+        "timed_out": optimized is None,
+        "seconds": time.perf_counter() - start
+    }
+
+def main():
+    """ Main function to seat a batch of requests with the optimizer
+
+    Parameters
+    ----------
+    None
+
+    Raises
+    ------
+    Exception
+        If the wrong number of arguments is provided in the terminal
+
+    Returns
+    -------
+    None
+    """
+    if len(sys.argv) < 2 or len(sys.argv) > 4:
+        raise Exception("Usage: python3 seating_optimizer.py <input_file> " + \
+            "[output_file] [time_budget]")
+    time_budget = float(sys.argv[3]) if len(sys.argv) == 4 else 1.0
+    movie_theater, report = optimize(sys.argv[1], time_budget=time_budget)
+    if report["timed_out"]:
+        print("Optimizer ran out of time, seated in arrival order")
+    print("Seated %d of %d seats (%d in arrival order, gain %d) in %.3fs" % \
+        (report["seats"] - movie_theater.available_seats, report["seats"],
+        report["greedy_seats"], report["gain"], report["seconds"]))
+    movie_theater.write_output(sys.argv[2] if len(sys.argv) >= 3 else None)
+
+if __name__ == "__main__":
+    main()
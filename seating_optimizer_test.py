@@ -0,0 +1,93 @@
+'''
+Description: This script contains unit tests for the seating_optimizer.py
+script.
+python3 seating_optimizer_test.py
+'''
+
+import tempfile
+import unittest
+from pathlib import Path
+from movie_theater_seating import TheaterLayout
+from seating_optimizer import pack_row, seat_greedy, seat_optimized, \
+    optimize, NOT_ENOUGH_SEATS, TOO_MANY_SEATS
+
+THIS_DIR = Path(__file__)
+
+class TestSeatingOptimizer(unittest.TestCase):
+    """
+    Tests the functions in seating_optimizer.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = Path(self.tmp_dir.name) / "input.txt"
+
+    def tearDown(self):
+        """
+        Removes the files written by each test
+        """
+        self.tmp_dir.cleanup()
+
+    def test_pack_row(self):
+        """
+        Tests the pack_row function.
+        """
+        # A group of 7 fills more seats than two groups of 3 with a buffer
+        # between them
+        self.assertEqual(pack_row(10, 3, {3: 2, 7: 1}), {7: 1})
+        # 4 + 3 + 4 + 3 + 4 seats fill a row of 18
+        self.assertEqual(pack_row(18, 3, {4: 10, 2: 10}), {4: 3})
+        self.assertEqual(pack_row(20, 0, {6: 1, 7: 2}), {6: 1, 7: 2})
+        self.assertEqual(pack_row(5, 3, {6: 1}), {})
+
+    def test_seat_optimized(self):
+        """
+        Tests the seat_optimized function.
+        """
+        layout = TheaterLayout([10], 3)
+        requests = [("R001", 3), ("R002", 3), ("R003", 7), ("R004", 11)]
+        greedy = seat_greedy(layout, requests)
+        self.assertEqual(greedy.available_seats, 4)
+        movie_theater = seat_optimized(layout, requests)
+        self.assertEqual(movie_theater.available_seats, 3)
+        self.assertEqual(list(movie_theater.reservation_details.items()), [
+            ("R001", NOT_ENOUGH_SEATS), ("R002", NOT_ENOUGH_SEATS),
+            ("R003", "A1 A2 A3 A4 A5 A6 A7"), ("R004", TOO_MANY_SEATS)])
+        self.assertEqual(movie_theater.bookings["R003"], ("A", 0, 7, 3))
+        self.assertEqual(len(movie_theater.seating_map["A"]), 0)
+        # Groups of the same size are seated in arrival order
+        movie_theater = seat_optimized(TheaterLayout([8, 8], 3),
+            [("R001", 2), ("R002", 2), ("R003", 2), ("R004", 2),
+            ("R005", 2)])
+        self.assertEqual([movie_theater.reservation_details[res_id] for
+            res_id in ("R001", "R002", "R005")], ["B1 B2", "B6 B7",
+            NOT_ENOUGH_SEATS])
+        self.assertIsNone(seat_optimized(layout, requests, deadline=0))
+
+    def test_optimize(self):
+        """
+        Tests the optimize function.
+        """
+        movie_theater, report = optimize(THIS_DIR.parent /
+            'test_data/input.txt')
+        self.assertEqual(report["requests"], 31)
+        self.assertEqual(report["greedy_seats"], 145)
+        self.assertEqual(report["optimized_seats"], 146)
+        self.assertEqual(report["method"], "optimized")
+        self.assertEqual(200 - movie_theater.available_seats, 146)
+        self.assertEqual(len(movie_theater.reservation_details), 31)
+        # Without time to optimize, the requests are seated in arrival order
+        movie_theater, report = optimize(THIS_DIR.parent /
+            'test_data/input.txt', time_budget=0)
+        self.assertTrue(report["timed_out"])
+        self.assertEqual(report["method"], "greedy")
+        self.assertEqual(movie_theater.reservation_details["R001"],
+            "J1 J2")
+        self.input_path.write_text("R001 2\nR001 3")
+        with self.assertRaises(Exception):
+            optimize(self.input_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,461 @@
+'''
+Description: This script provides a read-side query API for seat
+availability. The free seats and the largest group of every row are kept in
+summaries that are updated as groups are seated and cancelled, so questions
+like "how many seats are left" or "can a party of 6 still sit in rows H-J"
+are answered in O(1) or O(log rows) without scanning the seating map or
+calling the allocator.
+'''
+
+class FenwickTree():
+    """
+    A class used to keep prefix sums of a list of numbers that change.
+
+    Attributes
+    ----------
+    size : int
+        The number of values
+    tree : list
+        The partial sums of the values, 1-indexed
+
+    Methods
+    -------
+    add(i, delta)
+        Adds a number to the i-th value
+    get_prefix_sum(i)
+        Gets the sum of the first i values
+    get_range_sum(start, end)
+        Gets the sum of the values from start up to but not including end
+    """
+
+    __slots__ = ('size', 'tree')
+
+    def __init__(self, values):
+        """
+        Parameters
+        ----------
+        values : list
+            The initial values
+        """
+        self.size = len(values)
+        self.tree = [0] + list(values)
+        # Push each partial sum up to its parent, which builds the tree in
+        # linear time
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, i, delta):
+        """ Adds a number to the i-th value
+
+        Parameters
+        ----------
+        i : int
+            The position of the value, starting at 0
+        delta : int
+            The number to add
+
+        Returns
+        -------
+        None
+        """
+        i += 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def get_prefix_sum(self, i):
+        """ Gets the sum of the first i values
+
+        Parameters
+        ----------
+        i : int
+            The number of values to add up
+
+        Returns
+        -------
+        total : int
+            The sum of the values
+        """
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def get_range_sum(self, start, end):
+        """ Gets the sum of the values from start up to but not including end
+
+        Parameters
+        ----------
+        start : int
+            The position of the first value
+        end : int
+            The position after the last value
+
+        Returns
+        -------
+        total : int
+            The sum of the values
+        """
+        return self.get_prefix_sum(end) - self.get_prefix_sum(start)
+
+class MaxTree():
+    """
+    A class used to keep the maximum of any range of a list of numbers that
+    change.
+
+    Attributes
+    ----------
+    size : int
+        The number of values
+    tree : list
+        The values in the second half and the maximum of each pair of
+        children in the first half
+
+    Methods
+    -------
+    get(i)
+        Gets the i-th value
+    set(i, value)
+        Changes the i-th value
+    get_range_max(start, end)
+        Gets the largest value from start up to but not including end
+    """
+
+    __slots__ = ('size', 'tree')
+
+    def __init__(self, values):
+        """
+        Parameters
+        ----------
+        values : list
+            The initial values
+        """
+        self.size = len(values)
+        self.tree = [0] * self.size + list(values)
+        for i in range(self.size - 1, 0, -1):
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def get(self, i):
+        """ Gets the i-th value
+
+        Parameters
+        ----------
+        i : int
+            The position of the value, starting at 0
+
+        Returns
+        -------
+        value : int
+            The value
+        """
+        return self.tree[self.size + i]
+
+    def set(self, i, value):
+        """ Changes the i-th value
+
+        Parameters
+        ----------
+        i : int
+            The position of the value, starting at 0
+        value : int
+            The new value
+
+        Returns
+        -------
+        None
+        """
+        i += self.size
+        self.tree[i] = value
+        i //= 2
+        while i > 0:
+            largest = max(self.tree[2 * i], self.tree[2 * i + 1])
+            # The parents above are unchanged once a maximum stays the same
+            if self.tree[i] == largest:
+                break
+            self.tree[i] = largest
+            i //= 2
+
+    def get_range_max(self, start, end):
+        """ Gets the largest value from start up to but not including end
+
+        Parameters
+        ----------
+        start : int
+            The position of the first value
+        end : int
+            The position after the last value
+
+        Returns
+        -------
+        largest : int
+            The largest value, or 0 if the range is empty
+        """
+        largest = 0
+        start += self.size
+        end += self.size
+        while start < end:
+            if start & 1:
+                largest = max(largest, self.tree[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                largest = max(largest, self.tree[end])
+            start //= 2
+            end //= 2
+        return largest
+
+class SeatAvailability():
+    """
+    A class used to answer seat availability queries for a theater.
+
+    Rows are summarized in the order of the seating map, from the back of
+    the theater to the front, so a band of consecutive rows is a range of
+    the summaries. The summaries are updated through update_row_index(),
+    which the theater calls whenever the seats of a row change, so queries
+    never read the rows themselves. Free seats do not include the buffer
+    seats left empty next to a group, unlike the available_seats of the
+    theater, which only subtracts the seats that were sold.
+
+    Attributes
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater the summaries describe
+    row_ids : list
+        The ID of each row, from the back of the theater to the front
+    positions : dict
+        The position of each row ID in row_ids
+    row_free : list
+        The number of free seats of each row
+    seats : FenwickTree
+        The number of seats of each row
+    free : FenwickTree
+        The number of free seats of each row
+    largest_groups : MaxTree
+        The largest group each row can seat
+    free_seats : int
+        The number of free seats in the theater
+
+    Methods
+    -------
+    refresh()
+        Rebuilds the summaries from the rows of the theater
+    update_row(row_id)
+        Updates the summaries of a row whose seats changed
+    get_band(first_row=None, last_row=None)
+        Gets the range of the summaries of a band of rows
+    get_free_seats(first_row=None, last_row=None)
+        Gets the number of free seats in a band of rows
+    get_largest_group(first_row=None, last_row=None)
+        Gets the largest group that can be seated in a band of rows
+    can_seat(num_seats, first_row=None, last_row=None)
+        Checks whether a group can be seated in a band of rows
+    get_occupancy(first_row=None, last_row=None)
+        Gets the share of the seats of a band of rows that are not free
+    get_row_summary(row_id)
+        Gets the free seats and the largest group of one row
+    """
+
+    def __init__(self, movie_theater):
+        """
+        Parameters
+        ----------
+        movie_theater : MovieTheaterSeating
+            The theater to answer queries for, whose update_row_index() is
+            wrapped to keep the summaries up to date
+        """
+        self.movie_theater = movie_theater
+        self.refresh()
+        update_row_index = movie_theater.update_row_index
+
+        def summarized_update_row_index(row_id, old_free_seats):
+            update_row_index(row_id, old_free_seats)
+            self.update_row(row_id)
+
+        movie_theater.update_row_index = summarized_update_row_index
+
+    def refresh(self):
+        """ Rebuilds the summaries from the rows of the theater
+
+        Call it if the seating map of the theater is replaced after the
+        summaries were built.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        seating_map = self.movie_theater.seating_map
+        self.row_ids = list(seating_map)
+        self.positions = {row_id: i for i, row_id in enumerate(self.row_ids)}
+        rows = list(seating_map.values())
+        self.row_free = [row_seats.free for row_seats in rows]
+        self.seats = FenwickTree([len(row_seats.occupancy) for row_seats in
+            rows])
+        self.free = FenwickTree(self.row_free)
+        self.largest_groups = MaxTree([len(row_seats) for row_seats in rows])
+        self.free_seats = sum(self.row_free)
+
+    def update_row(self, row_id):
+        """ Updates the summaries of a row whose seats changed
+
+        Parameters
+        ----------
+        row_id : str
+            The ID of the row
+
+        Returns
+        -------
+        None
+        """
+        row_seats = self.movie_theater.seating_map[row_id]
+        i = self.positions[row_id]
+        delta = row_seats.free - self.row_free[i]
+        if delta:
+            self.row_free[i] = row_seats.free
+            self.free.add(i, delta)
+            self.free_seats += delta
+        self.largest_groups.set(i, len(row_seats))
+
+    def get_band(self, first_row=None, last_row=None):
+        """ Gets the range of the summaries of a band of rows
+
+        Parameters
+        ----------
+        first_row : str
+            The ID of a row at one end of the band, the front row by default
+        last_row : str
+            The ID of the row at the other end of the band, the back row by
+            default
+
+        Raises
+        ------
+        Exception
+            If a row does not exist
+
+        Returns
+        -------
+        band : tuple
+            The position of the first row of the band from the back and the
+            position after its last row
+        """
+        ends = []
+        for row_id, default in ((first_row, len(self.row_ids) - 1),
+            (last_row, 0)):
+            if row_id is None:
+                ends.append(default)
+            elif row_id in self.positions:
+                ends.append(self.positions[row_id])
+            else:
+                raise Exception("Row does not exist")
+        return min(ends), max(ends) + 1
+
+    def get_free_seats(self, first_row=None, last_row=None):
+        """ Gets the number of free seats in a band of rows
+
+        Parameters
+        ----------
+        first_row : str
+            The ID of a row at one end of the band, the front row by default
+        last_row : str
+            The ID of the row at the other end of the band, the back row by
+            default
+
+        Returns
+        -------
+        free_seats : int
+            The number of seats that are neither reserved nor buffer seats
+        """
+        if first_row is None and last_row is None:
+            return self.free_seats
+        return self.free.get_range_sum(*self.get_band(first_row, last_row))
+
+    def get_largest_group(self, first_row=None, last_row=None):
+        """ Gets the largest group that can be seated in a band of rows
+
+        Parameters
+        ----------
+        first_row : str
+            The ID of a row at one end of the band, the front row by default
+        last_row : str
+            The ID of the row at the other end of the band, the back row by
+            default
+
+        Returns
+        -------
+        num_seats : int
+            The number of seats of the largest group
+        """
+        if first_row is None and last_row is None:
+            # The root of the tree holds the largest value of every row
+            return self.largest_groups.tree[1]
+        return self.largest_groups.get_range_max(*self.get_band(first_row,
+            last_row))
+
+    def can_seat(self, num_seats, first_row=None, last_row=None):
+        """ Checks whether a group can be seated in a band of rows
+
+        Parameters
+        ----------
+        num_seats : int
+            The number of seats of the group
+        first_row : str
+            The ID of a row at one end of the band, the front row by default
+        last_row : str
+            The ID of the row at the other end of the band, the back row by
+            default
+
+        Returns
+        -------
+        fits : bool
+            True if a row of the band can seat the group together
+        """
+        return self.get_largest_group(first_row, last_row) >= num_seats
+
+    def get_occupancy(self, first_row=None, last_row=None):
+        """ Gets the share of the seats of a band of rows that are not free
+
+        Parameters
+        ----------
+        first_row : str
+            The ID of a row at one end of the band, the front row by default
+        last_row : str
+            The ID of the row at the other end of the band, the back row by
+            default
+
+        Returns
+        -------
+        occupancy : float
+            The reserved and buffer seats divided by the seats of the band
+        """
+        start, end = self.get_band(first_row, last_row)
+        seats = self.seats.get_range_sum(start, end)
+        return 1 - self.free.get_range_sum(start, end) / seats
+
+    def get_row_summary(self, row_id):
+        """ Gets the free seats and the largest group of one row
+
+        Parameters
+        ----------
+        row_id : str
+            The ID of the row
+
+        Raises
+        ------
+        Exception
+            If the row does not exist
+
+        Returns
+        -------
+        summary : tuple
+            The number of free seats and the largest group of the row
+        """
+        if row_id not in self.positions:
+            raise Exception("Row does not exist")
+        i = self.positions[row_id]
+        return self.row_free[i], self.largest_groups.get(i)
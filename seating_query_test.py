@@ -0,0 +1,112 @@
+'''
+Description: This script contains unit tests for the seating_query.py
+script.
+python3 seating_query_test.py
+'''
+
+import random
+import unittest
+from movie_theater_seating import MovieTheaterSeating, TheaterLayout
+from seating_query import FenwickTree, MaxTree, SeatAvailability
+
+class TestSeatingQuery(unittest.TestCase):
+    """
+    Tests the classes in seating_query.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.movie_theater = MovieTheaterSeating()
+        self.availability = SeatAvailability(self.movie_theater)
+
+    def test_trees(self):
+        """
+        Tests the FenwickTree and MaxTree classes.
+        """
+        rng = random.Random(0)
+        values = [rng.randint(0, 50) for _ in range(13)]
+        sums = FenwickTree(values)
+        maxima = MaxTree(values)
+        for _ in range(200):
+            i = rng.randrange(len(values))
+            value = rng.randint(0, 50)
+            sums.add(i, value - values[i])
+            maxima.set(i, value)
+            values[i] = value
+            start = rng.randrange(len(values))
+            end = rng.randrange(start, len(values)) + 1
+            self.assertEqual(sums.get_range_sum(start, end),
+                sum(values[start:end]))
+            self.assertEqual(maxima.get_range_max(start, end),
+                max(values[start:end]))
+            self.assertEqual(maxima.get(i), value)
+        self.assertEqual(maxima.get_range_max(3, 3), 0)
+
+    def test_queries(self):
+        """
+        Tests the queries of SeatAvailability.
+        """
+        self.assertEqual(self.availability.get_free_seats(), 200)
+        self.assertEqual(self.availability.get_largest_group(), 20)
+        self.movie_theater.make_reservation("R001", 4)
+        self.movie_theater.make_reservation("R002", 15)
+        # The buffer seats after R001 and R002 are not free, though they are
+        # still counted in the available seats of the theater
+        self.assertEqual(self.movie_theater.available_seats, 181)
+        self.assertEqual(self.availability.get_free_seats(), 175)
+        self.assertEqual(self.availability.get_row_summary('J'), (13, 13))
+        self.assertEqual(self.availability.get_row_summary('I'), (2, 2))
+        self.assertEqual(self.availability.get_free_seats('H', 'J'), 35)
+        self.assertEqual(self.availability.get_free_seats('J', 'H'), 35)
+        self.assertEqual(self.availability.get_largest_group('I', 'J'), 13)
+        self.assertTrue(self.availability.can_seat(20, 'H', 'J'))
+        self.assertFalse(self.availability.can_seat(14, 'I', 'J'))
+        self.assertAlmostEqual(self.availability.get_occupancy('I', 'J'),
+            25 / 40)
+        self.assertAlmostEqual(self.availability.get_occupancy('A', 'A'), 0)
+        self.movie_theater.cancel_reservation("R002")
+        self.assertEqual(self.availability.get_row_summary('I'), (20, 20))
+        self.assertEqual(self.availability.get_free_seats(), 193)
+        with self.assertRaises(Exception):
+            self.availability.get_free_seats('K', 'J')
+        with self.assertRaises(Exception):
+            self.availability.get_row_summary('K')
+
+    def test_random_bookings(self):
+        """
+        Tests that the summaries match the rows after random bookings,
+        cancellations and changes.
+        """
+        rng = random.Random(1)
+        movie_theater = MovieTheaterSeating(layout=TheaterLayout([12, 20,
+            25, 30, 30, 18], 2), placement="center")
+        availability = SeatAvailability(movie_theater)
+        res_ids = []
+        for i in range(300):
+            if res_ids and rng.random() < 0.3:
+                res_id = res_ids.pop(rng.randrange(len(res_ids)))
+                movie_theater.cancel_reservation(res_id)
+                continue
+            res_id = "R%d" % i
+            try:
+                movie_theater.make_reservation(res_id, rng.randint(1, 8))
+            except Exception:
+                continue
+            res_ids.append(res_id)
+            if rng.random() < 0.2:
+                try:
+                    movie_theater.modify_reservation(res_id,
+                        rng.randint(1, 8))
+                except Exception:
+                    pass
+            rows = list(movie_theater.seating_map.values())
+            self.assertEqual(availability.get_free_seats(),
+                sum(row_seats.free for row_seats in rows))
+            self.assertEqual(availability.get_largest_group(),
+                max(len(row_seats) for row_seats in rows))
+            self.assertEqual(availability.get_free_seats('B', 'D'),
+                sum(row_seats.free for row_seats in rows[2:5]))
+
+if __name__ == '__main__':
+    unittest.main()
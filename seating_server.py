@@ -0,0 +1,466 @@
+'''
+Description: This script runs a long-running reservation server that keeps
+the theater of every showtime in memory and takes commands over a line
+protocol on a local socket, so bookings do not pay for a new process and a
+new seating map each time. Every command is one line and gets one response
+line, in the order the commands were sent on the connection:
+    BOOK <showtime> <res_id> <num_seats>    OK <seats> or ERR <message>
+    QUERY <showtime> <res_id>               OK <seats> or ERR <message>
+    CANCEL <showtime> <res_id>              OK or ERR <message>
+    STATS                                   OK <counters and latencies>
+@address    (optional) port on 127.0.0.1 or path of a unix socket to listen
+            on, port 8765 by default
+python3 seating_server.py [address]
+'''
+
+import sys
+import time
+import asyncio
+from collections import deque
+from box_office import percentile
+from movie_theater_seating import MovieTheaterSeating, TheaterLayout
+
+# The port the server listens on by default
+DEFAULT_PORT = 8765
+# The number of most recent commands whose latency is reported
+LATENCY_WINDOW = 100000
+
+class SeatingServer():
+    """
+    A class used to serve bookings for many showtimes over a line protocol.
+
+    Every showtime has a queue drained by a single task, which runs all the
+    commands waiting in its queue in one batch, so the commands of one
+    showtime run one at a time in arrival order while different showtimes
+    never wait for each other. A showtime is added with the server layout the
+    first time a booking is made for it.
+
+    Attributes
+    ----------
+    layout : TheaterLayout
+        The geometry of the theater of each new showtime
+    engine : class
+        The seating engine of each new showtime
+    placement : str
+        The placement strategy of each new showtime
+    theaters : dict
+        The MovieTheaterSeating of each showtime ID
+    queues : dict
+        The queue of pending commands of each showtime ID
+    workers : dict
+        The task running the commands of each showtime ID
+    latencies : deque
+        The time in seconds from receiving a command to answering it, for
+        the most recent commands
+    counters : dict
+        The number of commands, errors and batches run since the server
+        started
+    server : asyncio.Server
+        The listening server, None until start() is called
+
+    Methods
+    -------
+    add_showtime(showtime_id, movie_theater=None)
+        Adds a showtime to the server
+    run_command(movie_theater, command, args)
+        Runs one command on the theater of a showtime
+    run_batches(showtime_id, queue)
+        Runs the pending commands of a showtime in arrival order
+    submit(line)
+        Parses one line of the protocol and queues it for its showtime
+    get_stats()
+        Gets the counters and latency percentiles of the server
+    handle_client(reader, writer)
+        Answers the commands of one connection in the order they were sent
+    start(host="127.0.0.1", port=DEFAULT_PORT, path=None)
+        Starts listening on a local TCP port or unix socket
+    close()
+        Stops listening and stops the showtime tasks
+    """
+
+    def __init__(self, layout=None, engine=MovieTheaterSeating,
+        placement="first"):
+        """
+        Parameters
+        ----------
+        layout : TheaterLayout
+            The geometry of the theater of each new showtime, 10 rows of 20
+            seats with 3 seats between reservations by default
+        engine : class
+            The seating engine of each new showtime
+        placement : str
+            The placement strategy of each new showtime
+        """
+        self.layout = layout or TheaterLayout.uniform(10, 20, 3)
+        self.engine = engine
+        self.placement = placement
+        self.theaters = {}
+        self.queues = {}
+        self.workers = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {"commands": 0, "errors": 0, "batches": 0}
+        self.server = None
+
+    def add_showtime(self, showtime_id, movie_theater=None):
+        """ Adds a showtime to the server
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        movie_theater : MovieTheaterSeating
+            The theater to seat the showtime in, an empty theater with the
+            server layout by default
+
+        Raises
+        ------
+        Exception
+            If the showtime ID was already added
+
+        Returns
+        -------
+        None
+        """
+        if showtime_id in self.theaters:
+            raise Exception("Showtime already added")
+        self.theaters[showtime_id] = movie_theater or self.engine(
+            layout=self.layout, placement=self.placement)
+
+    def run_command(self, movie_theater, command, args):
+        """ Runs one command on the theater of a showtime
+
+        Parameters
+        ----------
+        movie_theater : MovieTheaterSeating
+            The theater of the showtime
+        command : str
+            BOOK, QUERY or CANCEL
+        args : list
+            The reservation ID, followed by the number of seats for BOOK
+
+        Raises
+        ------
+        Exception
+            If the command fails for any of the reasons in make_reservation
+            or cancel_reservation
+            If a booking cannot be seated
+            If a queried reservation was never made
+
+        Returns
+        -------
+        response : str
+            The response line without its newline
+        """
+        res_id = args[0]
+        if command == "BOOK":
+            new_res_id = res_id not in movie_theater.reservation_ids
+            try:
+                res_details = movie_theater.make_reservation(res_id,
+                    int(args[1]))
+                if res_id not in movie_theater.bookings:
+                    raise Exception(res_details)
+            except Exception:
+                # Free the reservation ID of a booking that was not seated so
+                # the client can try again with fewer seats
+                if new_res_id:
+                    movie_theater.cancel_reservation(res_id)
+                raise
+            return "OK " + res_details
+        if command == "CANCEL":
+            movie_theater.cancel_reservation(res_id)
+            return "OK"
+        if res_id not in movie_theater.reservation_ids:
+            raise Exception("Reservation does not exist")
+        return "OK " + str(movie_theater.reservation_details.get(res_id, ""))
+
+    async def run_batches(self, showtime_id, queue):
+        """ Runs the pending commands of a showtime in arrival order
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+        queue : asyncio.Queue
+            The queue of pending commands of the showtime
+
+        Returns
+        -------
+        None
+        """
+        movie_theater = self.theaters[showtime_id]
+        while True:
+            # Wait for a command, then take every other command already
+            # waiting so they are all run in one batch
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            self.counters["batches"] += 1
+            for command, args, future in batch:
+                try:
+                    response = self.run_command(movie_theater, command, args)
+                except Exception as e:
+                    response = "ERR " + str(e)
+                if not future.cancelled():
+                    future.set_result(response)
+
+    def submit(self, line):
+        """ Parses one line of the protocol and queues it for its showtime
+
+        Parameters
+        ----------
+        line : str
+            The command line without its newline
+
+        Returns
+        -------
+        future : asyncio.Future
+            A future set to the response line without its newline, or None
+            for STATS, which is answered once the commands sent before it
+            have been answered
+        """
+        words = line.split()
+        command = words[0].upper() if words else ""
+        if command == "STATS" and len(words) == 1:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        if command not in ("BOOK", "QUERY", "CANCEL"):
+            future.set_result("ERR Unknown command")
+            return future
+        if len(words) != (4 if command == "BOOK" else 3):
+            future.set_result("ERR Wrong number of parameters")
+            return future
+        # Only ASCII digits, since int() rejects other digits like '³'
+        if command == "BOOK" and not (words[3].isascii() and
+            words[3].isdigit()):
+            future.set_result("ERR Number of seats is not a number")
+            return future
+        if command == "BOOK" and int(words[3]) <= 0:
+            future.set_result("ERR Number of seats requested is " + \
+                "less than or equal to 0")
+            return future
+        showtime_id = words[1]
+        if showtime_id not in self.theaters:
+            # Only a booking adds a showtime, so a typo in a query or a
+            # cancel does not create an empty theater
+            if command != "BOOK":
+                future.set_result("ERR Showtime does not exist")
+                return future
+            self.add_showtime(showtime_id)
+        queue = self.queues.get(showtime_id)
+        if queue is None:
+            queue = self.queues[showtime_id] = asyncio.Queue()
+            self.workers[showtime_id] = asyncio.create_task(
+                self.run_batches(showtime_id, queue))
+        queue.put_nowait((command, words[2:], future))
+        return future
+
+    def get_stats(self):
+        """ Gets the counters and latency percentiles of the server
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        stats : dict
+            The number of showtimes, commands, errors and batches, and the
+            p50, p99 and max latency in milliseconds of the recent commands
+        """
+        latencies = sorted(self.latencies)
+        stats = {"showtimes": len(self.theaters)}
+        stats.update(self.counters)
+        stats["p50_ms"] = "%.3f" % (percentile(latencies, 50) * 1000)
+        stats["p99_ms"] = "%.3f" % (percentile(latencies, 99) * 1000)
+        stats["max_ms"] = "%.3f" % (latencies[-1] * 1000 if latencies else 0)
+        return stats
+
+    async def handle_client(self, reader, writer):
+        """ Answers the commands of one connection in the order they were
+        sent
+
+        Commands are queued as soon as they are read, so a client that sends
+        many commands without waiting for the responses gets them run in
+        batches, and the responses are written as each one is ready.
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            The stream the commands are read from
+        writer : asyncio.StreamWriter
+            The stream the responses are written to
+
+        Returns
+        -------
+        None
+        """
+        pending = asyncio.Queue()
+
+        async def respond():
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                start, future = item
+                if future is None:
+                    response = "OK " + " ".join("%s=%s" % stat for stat in
+                        self.get_stats().items())
+                else:
+                    response = await future
+                self.latencies.append(time.perf_counter() - start)
+                self.counters["commands"] += 1
+                if response.startswith("ERR"):
+                    self.counters["errors"] += 1
+                writer.write(response.encode() + b'\n')
+                # Only wait for the client to read once nothing else is ready
+                if pending.empty():
+                    await writer.drain()
+
+        responder = asyncio.create_task(respond())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors="replace").strip()
+                if line:
+                    pending.put_nowait((time.perf_counter(),
+                        self.submit(line)))
+        finally:
+            pending.put_nowait(None)
+            try:
+                await responder
+            except ConnectionError:
+                # The client went away before reading every response
+                pass
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        """ Starts listening on a local TCP port or unix socket
+
+        Parameters
+        ----------
+        host : str
+            The address to listen on, the loopback address by default
+        port : int
+            The TCP port to listen on, 0 for any free port
+        path : str
+            The path of a unix socket to listen on instead of a TCP port
+
+        Returns
+        -------
+        server : asyncio.Server
+            The listening server
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_client,
+                path)
+        else:
+            self.server = await asyncio.start_server(self.handle_client,
+                host, port)
+        return self.server
+
+    async def close(self):
+        """ Stops listening and stops the showtime tasks
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.queues.clear()
+        self.workers.clear()
+
+async def send_commands(lines, host="127.0.0.1", port=DEFAULT_PORT,
+    path=None):
+    """ Sends commands to a server on one connection and reads the responses
+
+    Parameters
+    ----------
+    lines : list
+        The command lines without their newlines
+    host : str
+        The address of the server
+    port : int
+        The TCP port of the server
+    path : str
+        The path of the unix socket of the server instead of a TCP port
+
+    Returns
+    -------
+    responses : list
+        The response line of each command without its newline
+    """
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write("".join(line + "\n" for line in lines).encode())
+    await writer.drain()
+    responses = []
+    for _ in lines:
+        responses.append((await reader.readline()).decode().rstrip("\n"))
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+async def serve(address):
+    """ Runs the server until it is interrupted
+
+    Parameters
+    ----------
+    address : str
+        The port on 127.0.0.1 or the path of a unix socket to listen on
+
+    Returns
+    -------
+    None
+    """
+    seating_server = SeatingServer()
+    if address.isdigit():
+        server = await seating_server.start(port=int(address))
+    else:
+        server = await seating_server.start(path=address)
+    print("Listening on " + ", ".join(str(sock.getsockname()) for sock in
+        server.sockets))
+    try:
+        await server.serve_forever()
+    finally:
+        await seating_server.close()
+
+def main():
+    """ Main function to run the reservation server
+
+    Parameters
+    ----------
+    None
+
+    Raises
+    ------
+    Exception
+        If the wrong number of arguments is provided in the terminal
+
+    Returns
+    -------
+    None
+    """
+    if len(sys.argv) > 2:
+        raise Exception("Usage: python3 seating_server.py [address]")
+    address = sys.argv[1] if len(sys.argv) == 2 else str(DEFAULT_PORT)
+    try:
+        asyncio.run(serve(address))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+'''
+Description: This script contains unit tests for the seating_server.py
+script.
+python3 seating_server_test.py
+'''
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from movie_theater_seating import TheaterLayout
+from seating_server import SeatingServer, send_commands
+
+class TestSeatingServer(unittest.TestCase):
+    """
+    Tests the SeatingServer class in seating_server.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.seating_server = SeatingServer(TheaterLayout.uniform(10, 20, 3))
+
+    def run_session(self, *sessions, path=None):
+        """
+        Starts the server, sends each list of commands on its own connection
+        and returns the responses of each connection
+        """
+        async def session():
+            server = await self.seating_server.start(port=0, path=path)
+            port = None if path else server.sockets[0].getsockname()[1]
+            try:
+                return await asyncio.gather(*(send_commands(lines, port=port,
+                    path=path) for lines in sessions))
+            finally:
+                await self.seating_server.close()
+        return asyncio.run(session())
+
+    def test_commands(self):
+        """
+        Tests the BOOK, QUERY and CANCEL commands.
+        """
+        responses, = self.run_session([
+            "BOOK S1 R001 2",
+            "BOOK S1 R002 4",
+            "BOOK S2 R001 3",
+            "QUERY S1 R002",
+            "CANCEL S1 R001",
+            "QUERY S1 R001",
+            "BOOK S1 R003 2",
+            "BOOK S1 R002 1",
+            "BOOK S1 R004 21",
+            "BOOK S1 R004 1",
+            "BOOK S1 R005 0",
+            "BOOK S1 R006 two",
+            "BOOK S1 R006 \u00b3",
+            "BOOK S1 R007",
+            "QUERY S3 R001",
+            "RESERVE S1 R001 2"])
+        self.assertEqual(responses, [
+            "OK J1 J2",
+            "OK J6 J7 J8 J9",
+            "OK J1 J2 J3",
+            "OK J6 J7 J8 J9",
+            "OK",
+            "ERR Reservation does not exist",
+            "OK J1 J2",
+            "ERR Reservation already made",
+            "ERR Reservation cannot be made, too many seats requested",
+            "OK J13",
+            "ERR Number of seats requested is less than or equal to 0",
+            "ERR Number of seats is not a number",
+            "ERR Number of seats is not a number",
+            "ERR Wrong number of parameters",
+            "ERR Showtime does not exist",
+            "ERR Unknown command"])
+        self.assertEqual(sorted(self.seating_server.theaters), ["S1", "S2"])
+        self.assertEqual(self.seating_server.theaters["S1"].available_seats,
+            193)
+
+    def test_batches(self):
+        """
+        Tests that commands from many connections are run in batches and
+        every seat is handed out once.
+        """
+        sessions = [["BOOK S1 C%dR%d 2" % (c, i) for i in range(20)] for c in
+            range(5)]
+        results = self.run_session(*sessions)
+        booked = [response.split()[1:] for responses in results for response
+            in responses if response.startswith("OK")]
+        seats = [seat for seat_ids in booked for seat in seat_ids]
+        # Each row seats 4 groups of 2 with 3 buffer seats between them
+        self.assertEqual(len(booked), 40)
+        self.assertEqual(len(set(seats)), 80)
+        counters = self.seating_server.counters
+        self.assertEqual(counters["commands"], 100)
+        self.assertLess(counters["batches"], 100)
+
+    def test_stats(self):
+        """
+        Tests the STATS command.
+        """
+        responses, = self.run_session(["BOOK S1 R001 2", "STATS"])
+        stats = dict(item.split("=") for item in responses[1].split()[1:])
+        self.assertEqual(stats["showtimes"], "1")
+        self.assertEqual(stats["commands"], "1")
+        self.assertLessEqual(float(stats["p50_ms"]), float(stats["p99_ms"]))
+        self.assertLessEqual(float(stats["p99_ms"]), float(stats["max_ms"]))
+
+    def test_unix_socket(self):
+        """
+        Tests serving on a unix socket.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            responses, = self.run_session(["BOOK S1 R001 3"],
+                path=str(Path(tmp_dir) / "seating.sock"))
+        self.assertEqual(responses, ["OK J1 J2 J3"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,590 @@
+'''
+Description: This script spreads the showtimes of a venue across a fixed
+number of shards, each a worker process that keeps the theater of every
+showtime it owns in memory. Every showtime ID is mapped to its shard with a
+deterministic hash, so the same showtime always lands on the same shard, in
+any process and on any machine that uses the same number of shards.
+Requests are routed to the owning shard over a pipe, and the results are
+written back in the order of the input file.
+@input_file     filepath to a txt file with one request per line in the
+                format <showtime_id> <reservation_id> <num_seats>
+@output_file    filepath to write the reservation details to
+@num_shards     (optional) number of shards, one per CPU by default
+python3 seating_shards.py <input_file> <output_file> [num_shards]
+'''
+
+import sys
+import os
+import time
+import hashlib
+import multiprocessing
+from collections import deque
+from movie_theater_seating import MovieTheaterSeating, ReservationWriter, \
+    PLACEMENTS
+from seating_metrics import SeatingMetrics, BUCKET_BOUNDS
+
+# The multiplier of the linear congruential generator of the jump
+# consistent hash
+JUMP_MULTIPLIER = 2862933555777941757
+
+def get_shard(showtime_id, num_shards):
+    """ Gets the shard that owns a showtime
+
+    Uses the jump consistent hash of the showtime ID, so the mapping does
+    not depend on the process (unlike hash(), which is salted per process),
+    and growing from n to n + 1 shards only moves about 1 / (n + 1) of the
+    showtimes, all of them to the new shard.
+
+    Parameters
+    ----------
+    showtime_id : str
+        The unique ID of the showtime
+    num_shards : int
+        The number of shards
+
+    Raises
+    ------
+    Exception
+        If the number of shards is less than 1
+
+    Returns
+    -------
+    shard : int
+        The index of the shard, from 0 to num_shards - 1
+    """
+    if num_shards < 1:
+        raise Exception("Number of shards is less than 1")
+    key = int.from_bytes(hashlib.blake2b(showtime_id.encode(),
+        digest_size=8).digest(), 'little')
+    shard = -1
+    jump = 0
+    while jump < num_shards:
+        shard = jump
+        key = (key * JUMP_MULTIPLIER + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((shard + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return shard
+
+def run_shard(conn, shard, layout, placement, collect_metrics, venue):
+    """ Serves the requests routed to one shard until it is closed
+
+    Runs in a worker process. Each message is a (command, payload) tuple:
+    SEAT with a list of (showtime ID, request line) to seat, which is
+    answered with the (reservation ID, details, failed) of each request,
+    STATS, which is answered with the stats of the shard, or CLOSE.
+
+    Parameters
+    ----------
+    conn : multiprocessing.connection.Connection
+        The end of the pipe of the shard
+    shard : int
+        The index of the shard
+    layout : TheaterLayout
+        The geometry of the theater of every showtime
+    placement : str
+        The strategy for choosing the seats of a group within a row
+    collect_metrics : bool
+        Whether the theaters of the shard are instrumented
+    venue : str
+        The name of the venue the metrics are labeled with
+
+    Returns
+    -------
+    None
+    """
+    theaters = {}
+    metrics = SeatingMetrics("%s/%d" % (venue, shard)) if collect_metrics \
+        else None
+    # Lines are validated before the theater of their showtime is looked
+    # up, so an invalid line never creates a showtime
+    parser = MovieTheaterSeating(layout=layout)
+    while True:
+        command, payload = conn.recv()
+        if command == "SEAT":
+            results = []
+            for showtime_id, res in payload:
+                try:
+                    res_id, num_seats_reserved = parser.validate_request(res)
+                except Exception as e:
+                    if metrics is not None:
+                        metrics.increment("requests_invalid")
+                    # An invalid line has no reservation ID
+                    results.append((None, str(e), True))
+                    continue
+                if metrics is not None:
+                    metrics.increment("requests_parsed")
+                movie_theater = theaters.get(showtime_id)
+                if movie_theater is None:
+                    # The theater of a showtime is created by its first
+                    # valid request and lives as long as the shard
+                    movie_theater = MovieTheaterSeating(layout=layout,
+                        retain_details=False, placement=placement)
+                    if metrics is not None:
+                        metrics.instrument(movie_theater)
+                    theaters[showtime_id] = movie_theater
+                try:
+                    res_details = movie_theater.make_reservation(res_id,
+                        num_seats_reserved)
+                except Exception as e:
+                    results.append((res_id, str(e), True))
+                    continue
+                # The details are sent back instead of being kept
+                movie_theater.reservation_details.pop(res_id, None)
+                results.append((res_id, res_details, False))
+            conn.send(results)
+        elif command == "STATS":
+            total_seats = 0
+            reserved_seats = 0
+            for movie_theater in theaters.values():
+                theater_seats = sum(movie_theater.layout.seats_per_row)
+                total_seats += theater_seats
+                reserved_seats += theater_seats - \
+                    movie_theater.available_seats
+            conn.send({
+                "shard": shard,
+                "showtimes": len(theaters),
+                "reservations": sum(len(movie_theater.reservation_ids) for
+                    movie_theater in theaters.values()),
+                "total_seats": total_seats,
+                "reserved_seats": reserved_seats,
+                "snapshot": metrics.snapshot() if metrics is not None else
+                    None
+            })
+        else:
+            break
+    conn.close()
+
+def read_requests(file_path):
+    """ Reads the requests of an input file with a showtime on every line
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the txt file with the reservation requests
+
+    Yields
+    ------
+    request : tuple
+        The showtime ID and the rest of the line, which is validated by the
+        shard that owns the showtime. Like read_requests() of
+        MovieTheaterSeating, a file that ends with a newline has an empty
+        last line, which is rejected like any other invalid request
+    """
+    line = "\n"
+    with open(file_path, 'r') as f:
+        for line in f:
+            showtime_id, _, res = line.rstrip('\n').partition(' ')
+            yield showtime_id, res
+    if line.endswith('\n'):
+        yield "", ""
+
+class SeatingShards():
+    """
+    A class used to seat the requests of many showtimes across a fixed
+    number of shards.
+
+    Each shard is a worker process connected by a pipe. Requests are sent
+    to the shard that owns their showtime in batches, with at most one
+    batch per shard waiting for its results, so every shard seats its
+    showtimes while the others seat theirs.
+
+    Attributes
+    ----------
+    num_shards : int
+        The number of shards
+    layout : TheaterLayout
+        The geometry of the theater of every showtime
+    placement : str
+        The strategy for choosing the seats of a group within a row
+    collect_metrics : bool
+        Whether the theaters of every shard are instrumented
+    venue : str
+        The name of the venue the metrics are labeled with
+    sinks : list
+        The sinks the merged metrics are published to by emit()
+    batch_size : int
+        The number of requests sent to a shard at once
+    owners : dict
+        The shard of each showtime seen so far
+    connections : list
+        The end of the pipe of each shard
+    workers : list
+        The worker process of each shard
+
+    Methods
+    -------
+    get_owner(showtime_id)
+        Gets the shard that owns a showtime
+    seat_requests(requests)
+        Seats requests on the shards that own their showtimes
+    process_requests(file_path, output, rejects=None)
+        Seats the requests of an input file and writes the reservation
+        details to the output file
+    get_shard_stats()
+        Gets the showtimes, reservations and metrics of every shard
+    get_metrics()
+        Gets the metrics of every shard merged into one snapshot
+    emit()
+        Publishes the merged metrics to every sink
+    close()
+        Stops the worker process of every shard
+    """
+
+    def __init__(self, num_shards=None, layout=None, placement="first",
+        collect_metrics=False, venue="default", sinks=None,
+        batch_size=1024):
+        """
+        Parameters
+        ----------
+        num_shards : int
+            The number of shards, one per CPU by default
+        layout : TheaterLayout
+            The geometry of the theater of every showtime, 10 rows of 20
+            seats with 3 seats between reservations by default
+        placement : str
+            The strategy for choosing the seats of a group within a row, one
+            of PLACEMENTS
+        collect_metrics : bool
+            Whether the theaters of every shard are instrumented
+        venue : str
+            The name of the venue the metrics are labeled with
+        sinks : list
+            The sinks the merged metrics are published to by emit()
+        batch_size : int
+            The number of requests sent to a shard at once
+
+        Raises
+        ------
+        Exception
+            If the number of shards is less than 1
+            If the placement strategy does not exist
+        """
+        if num_shards is None:
+            num_shards = os.cpu_count() or 1
+        self.num_shards = num_shards
+        if self.num_shards < 1:
+            raise Exception("Number of shards is less than 1")
+        if placement not in PLACEMENTS:
+            raise Exception("Unknown placement strategy " + str(placement))
+        self.layout = layout
+        self.placement = placement
+        self.collect_metrics = collect_metrics
+        self.venue = venue
+        self.sinks = sinks or []
+        self.batch_size = batch_size
+        self.owners = {}
+        self.connections = []
+        self.workers = []
+        for shard in range(self.num_shards):
+            conn, worker_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=run_shard, args=(
+                worker_conn, shard, layout, placement, collect_metrics,
+                venue), daemon=True)
+            worker.start()
+            # The worker holds its own copy of its end of the pipe
+            worker_conn.close()
+            self.connections.append(conn)
+            self.workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_owner(self, showtime_id):
+        """ Gets the shard that owns a showtime
+
+        Parameters
+        ----------
+        showtime_id : str
+            The unique ID of the showtime
+
+        Returns
+        -------
+        shard : int
+            The index of the shard
+        """
+        shard = self.owners.get(showtime_id)
+        if shard is None:
+            shard = get_shard(showtime_id, self.num_shards)
+            self.owners[showtime_id] = shard
+        return shard
+
+    def seat_requests(self, requests):
+        """ Seats requests on the shards that own their showtimes
+
+        If the results are not all read, the requests that were not sent
+        to a shard yet are dropped, while the ones that were are seated.
+
+        Parameters
+        ----------
+        requests : iterable
+            The showtime ID and the request line, made of the reservation ID
+            and the number of seats, of each request
+
+        Yields
+        ------
+        result : tuple
+            The showtime ID, the request line, the reservation ID (None for
+            an invalid line), the reservation details or the error message,
+            and whether the request failed, in the order of the requests
+        """
+        connections = self.connections
+        batches = [[] for _ in range(self.num_shards)]
+        # The position in the requests of each request of the batch of each
+        # shard that is being built, and of the batch that was sent
+        positions = [[] for _ in range(self.num_shards)]
+        in_flight = [None] * self.num_shards
+        # The showtime ID, the request line and the shard of each request
+        # that is not yielded
+        pending = deque()
+        results = {}
+        # Results of other shards wait for the oldest request, so its batch
+        # is sent early once too many of them are waiting
+        max_waiting = self.batch_size * self.num_shards * 2
+        next_position = 0
+
+        def receive(shard):
+            replies = connections[shard].recv()
+            results.update(zip(in_flight[shard], replies))
+            in_flight[shard] = None
+
+        def send(shard):
+            if in_flight[shard] is not None:
+                receive(shard)
+            connections[shard].send(("SEAT", batches[shard]))
+            in_flight[shard] = positions[shard]
+            batches[shard] = []
+            positions[shard] = []
+
+        try:
+            for position, (showtime_id, res) in enumerate(requests):
+                shard = self.get_owner(showtime_id)
+                batches[shard].append((showtime_id, res))
+                positions[shard].append(position)
+                pending.append((showtime_id, res, shard))
+                if len(batches[shard]) >= self.batch_size:
+                    send(shard)
+                elif len(results) >= max_waiting:
+                    oldest = pending[0][2]
+                    if in_flight[oldest] is None:
+                        send(oldest)
+                    receive(oldest)
+                while next_position in results:
+                    yield pending.popleft()[:2] + results.pop(next_position)
+                    next_position += 1
+            for shard in range(self.num_shards):
+                if batches[shard]:
+                    send(shard)
+            for shard in range(self.num_shards):
+                if in_flight[shard] is not None:
+                    receive(shard)
+            while pending:
+                yield pending.popleft()[:2] + results.pop(next_position)
+                next_position += 1
+        finally:
+            # Read the results of the batches that were already sent, so
+            # they are not taken for the results of the next call
+            for shard in range(self.num_shards):
+                if in_flight[shard] is not None:
+                    receive(shard)
+
+    def process_requests(self, file_path, output, rejects=None):
+        """ Seats the requests of an input file and writes the reservation
+        details to the output file
+
+        Each line of the output is the showtime ID followed by the line
+        write_output() of its theater writes for the reservation.
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the txt file with one request per line in the format
+            <showtime_id> <reservation_id> <num_seats>
+        output : str or file object
+            The path or file object to write the reservation details to
+        rejects : list
+            The list the (line number, line, error message) of each invalid
+            line is added to. If it is given, invalid lines are skipped and
+            requests that cannot be booked are written to the output file
+            with the reason instead of stopping the parse
+
+        Raises
+        ------
+        Exception
+            If a line of the file is not a valid reservation request or
+            cannot be booked and rejects is None. The requests after it may
+            already be seated on other shards
+
+        Returns
+        -------
+        output_path : str
+            The absolute path to the output file, or None if the output is a
+            file object with no path
+        """
+        with ReservationWriter(output) as writer:
+            line_number = 0
+            for showtime_id, res, res_id, res_details, failed in \
+                self.seat_requests(read_requests(file_path)):
+                line_number += 1
+                if failed and rejects is None:
+                    raise Exception(res_details)
+                if res_id is None:
+                    # The shard could not read the request line
+                    line = showtime_id + " " + res if res else showtime_id
+                    rejects.append((line_number, line, res_details))
+                    continue
+                writer.write(showtime_id + " " + res_id, res_details)
+        return writer.path
+
+    def get_shard_stats(self):
+        """ Gets the showtimes, reservations and metrics of every shard
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        stats : list
+            For each shard, its index, the number of showtimes and
+            reservations, the number of seats and reserved seats of its
+            theaters and its metrics snapshot (None if metrics are not
+            collected)
+        """
+        for conn in self.connections:
+            conn.send(("STATS", None))
+        return [conn.recv() for conn in self.connections]
+
+    def get_metrics(self):
+        """ Gets the metrics of every shard merged into one snapshot
+
+        The counters, stage counts, totals and buckets of the shards are
+        added up, and the utilization is over the seats of every theater.
+
+        Parameters
+        ----------
+        None
+
+        Raises
+        ------
+        Exception
+            If metrics are not collected
+
+        Returns
+        -------
+        snapshot : dict
+            The venue, the counters, the utilization and the stages, in the
+            format of SeatingMetrics.snapshot, and the stats of each shard
+        """
+        if not self.collect_metrics:
+            raise Exception("Metrics are not collected")
+        stats = self.get_shard_stats()
+        counters = {}
+        stages = {}
+        for shard_stats in stats:
+            snapshot = shard_stats["snapshot"]
+            for counter, value in snapshot["counters"].items():
+                counters[counter] = counters.get(counter, 0) + value
+            for stage, summary in snapshot["stages"].items():
+                merged = stages.setdefault(stage, {
+                    "count": 0,
+                    "total_seconds": 0.0,
+                    "mean_seconds": 0.0,
+                    "buckets": [[bound, 0] for bound in BUCKET_BOUNDS]
+                })
+                merged["count"] += summary["count"]
+                merged["total_seconds"] += summary["total_seconds"]
+                # The buckets are cumulative counts, which add up
+                for bucket, (_, count) in zip(merged["buckets"],
+                    summary["buckets"]):
+                    bucket[1] += count
+        for merged in stages.values():
+            if merged["count"]:
+                merged["mean_seconds"] = merged["total_seconds"] / \
+                    merged["count"]
+        total_seats = sum(shard_stats["total_seats"] for shard_stats in
+            stats)
+        reserved_seats = sum(shard_stats["reserved_seats"] for shard_stats in
+            stats)
+        return {
+            "venue": self.venue,
+            "counters": counters,
+            "utilization": reserved_seats / total_seats if total_seats else
+                0.0,
+            "stages": stages,
+            "shards": stats
+        }
+
+    def emit(self):
+        """ Publishes the merged metrics to every sink
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        snapshot = self.get_metrics()
+        for sink in self.sinks:
+            sink.emit(snapshot)
+
+    def close(self):
+        """ Stops the worker process of every shard
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        for conn in self.connections:
+            try:
+                conn.send(("CLOSE", None))
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for worker in self.workers:
+            worker.join()
+        self.connections = []
+        self.workers = []
+
+def main():
+    """ Main function to seat the requests of many showtimes across shards
+
+    Parameters
+    ----------
+    None
+
+    Raises
+    ------
+    Exception
+        If the wrong number of arguments is provided in the terminal
+
+    Returns
+    -------
+    None
+    """
+    if len(sys.argv) < 3 or len(sys.argv) > 4:
+        raise Exception("Usage: python3 seating_shards.py <input_file> " + \
+            "<output_file> [num_shards]")
+    num_shards = int(sys.argv[3]) if len(sys.argv) == 4 else None
+    with SeatingShards(num_shards) as seating_shards:
+        start = time.perf_counter()
+        output_path = seating_shards.process_requests(sys.argv[1],
+            sys.argv[2])
+        total = time.perf_counter() - start
+        # Report how the showtimes were spread across the shards
+        for shard_stats in seating_shards.get_shard_stats():
+            print("shard %d %d showtimes %d reservations" % (
+                shard_stats["shard"], shard_stats["showtimes"],
+                shard_stats["reservations"]))
+    print("%d shards in %.4fs" % (seating_shards.num_shards, total))
+    print(output_path)
+
+if __name__ == "__main__":
+    main()
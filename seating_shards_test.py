@@ -0,0 +1,149 @@
+'''
+Description: This script contains unit tests for the seating_shards.py
+script.
+python3 seating_shards_test.py
+'''
+
+import tempfile
+import unittest
+from pathlib import Path
+from movie_theater_seating import MovieTheaterSeating, TheaterLayout
+from seating_shards import SeatingShards, get_shard
+
+THIS_DIR = Path(__file__)
+
+class TestSeatingShards(unittest.TestCase):
+    """
+    Tests the functions and classes in seating_shards.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.tmp_dir.name)
+        self.input_path = THIS_DIR.parent / 'test_data/input.txt'
+
+    def tearDown(self):
+        """
+        Removes the output files written by each test
+        """
+        self.tmp_dir.cleanup()
+
+    def test_get_shard(self):
+        """
+        Tests that showtimes are spread evenly across shards and that
+        adding a shard only moves showtimes to the new shard.
+        """
+        showtime_ids = ["S%d" % i for i in range(2000)]
+        shards = [get_shard(showtime_id, 4) for showtime_id in showtime_ids]
+        self.assertEqual(shards, [get_shard(showtime_id, 4) for showtime_id
+            in showtime_ids])
+        for shard in range(4):
+            self.assertGreater(shards.count(shard), 400)
+        for showtime_id, shard in zip(showtime_ids, shards):
+            self.assertIn(get_shard(showtime_id, 5), (shard, 4))
+        self.assertEqual(get_shard("S1", 1), 0)
+        with self.assertRaises(Exception):
+            get_shard("S1", 0)
+
+    def test_process_requests(self):
+        """
+        Tests that each showtime is seated the same as in its own theater
+        and that the output is in the order of the input file.
+        """
+        lines = self.input_path.read_text().split('\n')
+        showtime_ids = ["S%d" % i for i in range(12)]
+        input_path = self.output_dir / "requests.txt"
+        input_path.write_text('\n'.join(showtime_id + " " + line for line in
+            lines for showtime_id in showtime_ids))
+        output_path = self.output_dir / "output.txt"
+        with SeatingShards(3, batch_size=7) as seating_shards:
+            seating_shards.process_requests(input_path, output_path)
+            stats = seating_shards.get_shard_stats()
+        self.assertEqual(sum(shard_stats["showtimes"] for shard_stats in
+            stats), 12)
+        self.assertEqual(sum(shard_stats["reservations"] for shard_stats in
+            stats), 12 * len(lines))
+        movie_theater = MovieTheaterSeating()
+        expected = [movie_theater.make_reservation(*
+            movie_theater.validate_request(line)) for line in lines]
+        output_lines = output_path.read_text().split('\n')[:-1]
+        self.assertEqual(len(output_lines), 12 * len(lines))
+        for i, output_line in enumerate(output_lines):
+            showtime_id, res_id, res_details = output_line.split(' ', 2)
+            self.assertEqual(showtime_id, showtime_ids[i % 12])
+            self.assertEqual(res_id + " " + res_details,
+                lines[i // 12].split(' ')[0] + " " + expected[i // 12])
+
+    def test_rejects(self):
+        """
+        Tests invalid lines and requests that cannot be booked.
+        """
+        input_path = self.output_dir / "requests.txt"
+        input_path.write_text("S1 R001 2\nS1 R001 3\nS2 R002 x\nS3\n" + \
+            "S2 R003 25\nS2 R004 4\n")
+        output_path = self.output_dir / "output.txt"
+        with SeatingShards(2, layout=TheaterLayout.uniform(10, 20, 3)) as \
+            seating_shards:
+            rejects = []
+            seating_shards.process_requests(input_path, output_path, rejects)
+            self.assertEqual(rejects, [
+                (3, "S2 R002 x", "Number of seats requested is invalid"),
+                (4, "S3", "Too few parameters"),
+                (7, "", "Too few parameters")])
+            self.assertEqual(output_path.read_text().split('\n'), [
+                "S1 R001 J1 J2",
+                "S1 R001 Reservation already made",
+                "S2 R003 Reservation cannot be made, too many seats " + \
+                    "requested",
+                "S2 R004 J1 J2 J3 J4",
+                ""])
+            with self.assertRaises(Exception):
+                seating_shards.process_requests(input_path, output_path)
+            # The showtimes keep their theaters between calls
+            input_path.write_text("S4 R001 2\nS1 R005 2")
+            seating_shards.process_requests(input_path, output_path)
+            self.assertEqual(output_path.read_text().split('\n'), [
+                "S4 R001 J1 J2", "S1 R005 J6 J7", ""])
+
+    def test_metrics(self):
+        """
+        Tests that the metrics of the shards are merged.
+        """
+        input_path = self.output_dir / "requests.txt"
+        # The empty last line after the final newline is not a showtime
+        input_path.write_text(''.join("S%d R%d 5\n" % (i % 10, i) for i in
+            range(100)) + "S1\n")
+        with SeatingShards(4, collect_metrics=True, venue="Hall") as \
+            seating_shards:
+            seating_shards.process_requests(input_path,
+                self.output_dir / "output.txt", [])
+            snapshot = seating_shards.get_metrics()
+        self.assertEqual(snapshot["venue"], "Hall")
+        self.assertEqual(len(snapshot["shards"]), 4)
+        self.assertEqual(sum(shard_stats["showtimes"] for shard_stats in
+            snapshot["shards"]), 10)
+        self.assertEqual(snapshot["counters"]["requests_parsed"], 100)
+        self.assertEqual(snapshot["counters"]["requests_invalid"], 2)
+        self.assertEqual(snapshot["counters"]["seats_reserved"], 500)
+        self.assertEqual(snapshot["stages"]["allocate"]["count"], 100)
+        self.assertEqual(snapshot["stages"]["allocate"]["buckets"][-1][1],
+            100)
+        self.assertAlmostEqual(snapshot["utilization"], 500 / 2000)
+        input_path.write_text("S1 R1 5\n")
+        with SeatingShards(2, collect_metrics=True) as seating_shards:
+            seating_shards.process_requests(input_path,
+                self.output_dir / "output.txt", [])
+            snapshot = seating_shards.get_metrics()
+        self.assertEqual(sum(shard_stats["showtimes"] for shard_stats in
+            snapshot["shards"]), 1)
+        self.assertAlmostEqual(snapshot["utilization"], 5 / 200)
+        with SeatingShards(2) as seating_shards:
+            with self.assertRaises(Exception):
+                seating_shards.get_metrics()
+        with self.assertRaisesRegex(Exception, "less than 1"):
+            SeatingShards(0)
+
+if __name__ == '__main__':
+    unittest.main()
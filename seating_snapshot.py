@@ -0,0 +1,598 @@
+'''
+Description: This script saves the state of a theater to a compact binary
+snapshot that can be memory-mapped on restore, and keeps an append-only
+journal of the bookings, cancellations and changes made after the snapshot
+so a theater can be recovered after a restart without replaying every
+request since the showtime opened.
+@snapshot_file  filepath to the binary snapshot of the theater
+@journal_file   filepath to the journal of the requests made after the
+                snapshot
+@output_file    (optional) filepath to write the seat assignments of the
+                recovered theater to
+python3 seating_snapshot.py <snapshot_file> <journal_file> [output_file]
+'''
+
+import os
+import sys
+import mmap
+import struct
+from movie_theater_seating import MovieTheaterSeating, SeatRow, FREE_RUN, \
+    TheaterLayout, PLACEMENTS, get_row_label
+
+# The first bytes of every snapshot file
+MAGIC = b"MTSS"
+# The version of the snapshot format written by save_snapshot
+VERSION = 3
+# magic, version, flags, space between reservations, number of rows,
+# available seats, number of reservation IDs, number of reservation details,
+# number of bookings, length of the ID block, length of the details block,
+# position of the placement strategy in PLACEMENTS, generation of the
+# journal the snapshot holds every request of
+HEADER = struct.Struct("<4sHHIIqIIIQQHQ")
+# The header of version 2 snapshots, which were written before snapshots
+# recorded the generation of their journal and hold none of it
+HEADER_V2 = struct.Struct("<4sHHIIqIIIQQH")
+# The header of version 1 snapshots, which were written before theaters had
+# a placement strategy and are restored with the "first" strategy
+HEADER_V1 = struct.Struct("<4sHHIIqIIIQQ")
+# ID position, row position from the screen, first seat, number of seats,
+# number of buffer seats
+BOOKING = struct.Struct("<IIIII")
+
+# The header flag set when the theater keeps its reservation details
+RETAIN_DETAILS = 1
+
+# The first line of every journal, followed by its generation
+GENERATION = "GENERATION"
+
+def save_snapshot(movie_theater, file_path, journal_generation=0):
+    """ Saves the state of a theater to a binary snapshot
+
+    The snapshot is written to a temporary file first and then renamed, so
+    a crash while saving leaves the previous snapshot intact.
+
+    The file is a fixed header followed by the number of seats of each row
+    from the screen to the back, the occupancy code of every seat row after
+    row, the reservation IDs and the reservation details as newline
+    separated text, and a fixed-size record for each booking. The
+    occupancy block is stored exactly as SeatRow keeps it in memory and
+    each block is decoded in one call on restore, so loading does not loop
+    over the seats or the reservations in Python.
+
+    Parameters
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater to save
+    file_path : str
+        The path to the snapshot file
+    journal_generation : int
+        The generation of the journal whose requests are all held by the
+        snapshot, 0 if the snapshot holds none of a journal
+
+    Returns
+    -------
+    file_path : str
+        The absolute path to the snapshot file
+    """
+    layout = movie_theater.layout
+    flags = RETAIN_DETAILS if movie_theater.retain_details else 0
+    # The IDs with details come first, in the order their details are
+    # written to the output file, followed by the IDs whose details are no
+    # longer in memory
+    res_ids = list(movie_theater.reservation_details)
+    res_ids += sorted(movie_theater.reservation_ids.difference(
+        movie_theater.reservation_details))
+    id_block = "\n".join(res_ids).encode()
+    details_block = "\n".join(str(res_details) for res_details in
+        movie_theater.reservation_details.values()).encode()
+    id_positions = {res_id: i for i, res_id in enumerate(res_ids)}
+    # The position of each row from the screen, which is its index in the
+    # layout
+    row_positions = {get_row_label(i): i for i in range(layout.num_rows)}
+    bookings = b"".join(BOOKING.pack(id_positions[res_id],
+        row_positions[row_id], first_seat, num_seats, num_buffer_seats)
+        for res_id, (row_id, first_seat, num_seats, num_buffer_seats) in
+        movie_theater.bookings.items())
+    chunks = [HEADER.pack(MAGIC, VERSION, flags, layout.space_between_res,
+        layout.num_rows, movie_theater.available_seats, len(res_ids),
+        len(movie_theater.reservation_details), len(movie_theater.bookings),
+        len(id_block), len(details_block),
+        PLACEMENTS.index(movie_theater.placement), journal_generation),
+        struct.pack("<%dI" % layout.num_rows, *layout.seats_per_row)]
+    for i in range(layout.num_rows):
+        chunks.append(bytes(
+            movie_theater.seating_map[get_row_label(i)].occupancy))
+    chunks += [id_block, details_block, bookings]
+    tmp_path = str(file_path) + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b"".join(chunks))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    return os.path.abspath(file_path)
+
+def load_snapshot(file_path, engine=MovieTheaterSeating):
+    """ Restores a theater from a binary snapshot
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the snapshot file
+    engine : class
+        The seating engine of the restored theater
+
+    Raises
+    ------
+    Exception
+        If the file is not a snapshot
+        If the snapshot was written in an unsupported version
+
+    Returns
+    -------
+    movie_theater : MovieTheaterSeating
+        The theater in the state it was saved in
+    """
+    with open(file_path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            raise Exception("Not a theater snapshot: " + str(file_path))
+    with buffer:
+        view = memoryview(buffer)
+        try:
+            return read_snapshot(view, file_path, engine)
+        finally:
+            view.release()
+
+def split_block(view, offset, length):
+    """ Decodes a block of newline separated text
+
+    Parameters
+    ----------
+    view : memoryview
+        The bytes of the snapshot file
+    offset : int
+        The position of the block in the file
+    length : int
+        The length of the block in bytes
+
+    Returns
+    -------
+    lines : list
+        The lines of the block, none if the block is empty
+    """
+    if length == 0:
+        return []
+    return str(view[offset:offset + length], 'utf-8').split("\n")
+
+def read_snapshot(view, file_path, engine):
+    """ Restores a theater from the bytes of a snapshot
+
+    Parameters
+    ----------
+    view : memoryview
+        The bytes of the snapshot file
+    file_path : str
+        The path to the snapshot file, used in error messages
+    engine : class
+        The seating engine of the restored theater
+
+    Raises
+    ------
+    Exception
+        If the bytes are not a snapshot
+        If the snapshot was written in an unsupported version
+
+    Returns
+    -------
+    movie_theater : MovieTheaterSeating
+        The theater in the state it was saved in
+    """
+    if len(view) < HEADER_V1.size or bytes(view[:4]) != MAGIC:
+        raise Exception("Not a theater snapshot: " + str(file_path))
+    version = struct.unpack_from("<H", view, 4)[0]
+    if version == VERSION:
+        header = HEADER
+    elif version == 2:
+        header = HEADER_V2
+    elif version == 1:
+        header = HEADER_V1
+    else:
+        raise Exception("Unsupported snapshot version %d" % version)
+    if len(view) < header.size:
+        raise Exception("Not a theater snapshot: " + str(file_path))
+    fields = header.unpack_from(view)
+    magic, version, flags, space_between_res, num_rows, available_seats, \
+        num_ids, num_details, num_bookings, id_length, details_length = \
+        fields[:11]
+    placement = "first"
+    if len(fields) > 11:
+        if fields[11] >= len(PLACEMENTS):
+            raise Exception("Not a theater snapshot: " + str(file_path))
+        placement = PLACEMENTS[fields[11]]
+    offset = header.size
+    seats_per_row = list(struct.unpack_from("<%dI" % num_rows, view,
+        offset))
+    offset += 4 * num_rows
+    movie_theater = engine(layout=TheaterLayout(seats_per_row,
+        space_between_res), retain_details=bool(flags & RETAIN_DETAILS),
+        placement=placement)
+    # Rebuild each row and its free runs from its slice of the occupancy
+    # block. Rows with every seat free keep the shared empty row
+    row_ids = []
+    for i, num_seats in enumerate(seats_per_row):
+        row_ids.append(get_row_label(i))
+        occupancy = view[offset:offset + num_seats]
+        if FREE_RUN.fullmatch(occupancy) is None:
+            movie_theater.seating_map[row_ids[i]] = SeatRow.from_occupancy(
+                occupancy, space_between_res)
+        offset += num_seats
+    movie_theater.row_index = movie_theater.generate_row_index()
+    movie_theater.available_seats = available_seats
+    res_ids = split_block(view, offset, id_length)
+    offset += id_length
+    movie_theater.reservation_ids = set(res_ids)
+    movie_theater.reservation_details = dict(zip(res_ids[:num_details],
+        split_block(view, offset, details_length)))
+    offset += details_length
+    movie_theater.bookings = {res_ids[id_position]: (row_ids[row_position],
+        first_seat, num_seats, num_buffer_seats) for id_position,
+        row_position, first_seat, num_seats, num_buffer_seats in
+        BOOKING.iter_unpack(view[offset:offset + num_bookings * \
+        BOOKING.size])}
+    return movie_theater
+
+def get_snapshot_generation(file_path):
+    """ Reads the generation of the journal a snapshot holds
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the snapshot file
+
+    Raises
+    ------
+    Exception
+        If the file is not a snapshot
+
+    Returns
+    -------
+    journal_generation : int
+        The generation of the journal whose requests are all held by the
+        snapshot, 0 for snapshots written before the generation was saved
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER_V1.size or data[:4] != MAGIC:
+        raise Exception("Not a theater snapshot: " + str(file_path))
+    if struct.unpack_from("<H", data, 4)[0] != VERSION:
+        return 0
+    if len(data) < HEADER.size:
+        raise Exception("Not a theater snapshot: " + str(file_path))
+    return HEADER.unpack(data)[-1]
+
+def get_journal_generation(journal_path):
+    """ Reads the generation of a journal from its first line
+
+    Parameters
+    ----------
+    journal_path : str
+        The path to the journal file
+
+    Raises
+    ------
+    Exception
+        If the first line starts a generation but has no valid number
+
+    Returns
+    -------
+    generation : int
+        The generation of the journal, 1 if the journal does not exist yet,
+        is empty or was written before journals had a generation
+    """
+    if not os.path.exists(journal_path):
+        return 1
+    with open(journal_path, 'r') as f:
+        line = f.readline()
+    if not line.startswith(GENERATION + " "):
+        return 1
+    try:
+        return int(line.split()[1])
+    except (IndexError, ValueError):
+        raise Exception("Invalid journal entry: " + line.strip())
+
+class SeatingJournal():
+    """
+    A class used to record the requests made to a theater in an append-only
+    journal.
+
+    Every request is appended to the journal and flushed before it is
+    applied, so replaying the journal on top of the last snapshot gives the
+    theater back in the state it was in. Requests that failed are replayed
+    too and fail again the same way, which keeps the reservation IDs in the
+    same state.
+
+    The journal starts with its generation, which goes up by one at every
+    checkpoint. A snapshot records the generation of the journal it holds
+    every request of, so a journal that was not replaced yet when a
+    checkpoint crashed is not replayed again on restore.
+
+    Attributes
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater the requests are made to
+    journal_path : str
+        The path to the journal file
+    journal : file
+        The journal file, opened for appending
+    generation : int
+        The generation of the journal
+    sync : bool
+        Whether each entry is also forced to disk with fsync
+
+    Methods
+    -------
+    append(*entry)
+        Appends one request to the journal
+    make_reservation(res_id, num_seats_reserved)
+        Books the seats for a new reservation ID
+    cancel_reservation(res_id)
+        Cancels a reservation
+    modify_reservation(res_id, num_seats_reserved)
+        Changes the number of seats of a reservation
+    checkpoint(snapshot_path)
+        Saves a snapshot of the theater and starts the next generation of
+        the journal
+    close()
+        Closes the journal file
+    """
+
+    def __init__(self, movie_theater, journal_path, sync=False):
+        """
+        Parameters
+        ----------
+        movie_theater : MovieTheaterSeating
+            The theater the requests are made to
+        journal_path : str
+            The path to the journal file
+        sync : bool
+            Whether each entry is also forced to disk with fsync
+        """
+        self.movie_theater = movie_theater
+        self.journal_path = journal_path
+        self.generation = get_journal_generation(journal_path)
+        self.journal = open(journal_path, 'a')
+        self.sync = sync
+        # A new journal starts with its generation
+        if self.journal.tell() == 0:
+            self.append(GENERATION, self.generation)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, *entry):
+        """ Appends one request to the journal
+
+        Parameters
+        ----------
+        entry : str
+            The operation and its arguments
+
+        Returns
+        -------
+        None
+        """
+        self.journal.write(" ".join(str(field) for field in entry) + "\n")
+        self.journal.flush()
+        if self.sync:
+            os.fsync(self.journal.fileno())
+
+    def make_reservation(self, res_id, num_seats_reserved):
+        """ Books the seats for a new reservation ID
+
+        Parameters
+        ----------
+        The same as MovieTheaterSeating.make_reservation
+
+        Returns
+        -------
+        res_details : str
+            A string with the reservation details for this reservation ID
+        """
+        self.append("BOOK", res_id, num_seats_reserved)
+        return self.movie_theater.make_reservation(res_id,
+            num_seats_reserved)
+
+    def cancel_reservation(self, res_id):
+        """ Cancels a reservation
+
+        Parameters
+        ----------
+        The same as MovieTheaterSeating.cancel_reservation
+
+        Returns
+        -------
+        None
+        """
+        self.append("CANCEL", res_id)
+        return self.movie_theater.cancel_reservation(res_id)
+
+    def modify_reservation(self, res_id, num_seats_reserved):
+        """ Changes the number of seats of a reservation
+
+        Parameters
+        ----------
+        The same as MovieTheaterSeating.modify_reservation
+
+        Returns
+        -------
+        res_details : str
+            A string with the new reservation details for this reservation ID
+        """
+        self.append("MODIFY", res_id, num_seats_reserved)
+        return self.movie_theater.modify_reservation(res_id,
+            num_seats_reserved)
+
+    def checkpoint(self, snapshot_path):
+        """ Saves a snapshot of the theater and starts the next generation of
+        the journal
+
+        The snapshot is saved before the journal is replaced. A crash in
+        between leaves a snapshot that holds the generation of the old
+        journal, so restore does not replay the old journal again. The next
+        generation is written to a temporary file first and then renamed,
+        so a crash while replacing the journal leaves the old one intact.
+
+        Parameters
+        ----------
+        snapshot_path : str
+            The path to the snapshot file
+
+        Returns
+        -------
+        snapshot_path : str
+            The absolute path to the snapshot file
+        """
+        snapshot_path = save_snapshot(self.movie_theater, snapshot_path,
+            self.generation)
+        # The snapshot now holds every request in the journal
+        tmp_path = str(self.journal_path) + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("%s %d\n" % (GENERATION, self.generation + 1))
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal.close()
+        os.replace(tmp_path, self.journal_path)
+        self.generation += 1
+        self.journal = open(self.journal_path, 'a')
+        return snapshot_path
+
+    def close(self):
+        """ Closes the journal file
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self.journal.close()
+
+def replay_journal(movie_theater, journal_path, snapshot_generation=0):
+    """ Applies the requests in a journal to a theater
+
+    Parameters
+    ----------
+    movie_theater : MovieTheaterSeating
+        The theater to apply the requests to
+    journal_path : str
+        The path to the journal file
+    snapshot_generation : int
+        The generation of the journal the theater already holds every
+        request of. A journal of this generation or an older one is skipped
+
+    Raises
+    ------
+    Exception
+        If an entry of the journal is not a known request
+
+    Returns
+    -------
+    num_entries : int
+        The number of requests applied
+    """
+    # The checkpoint that saved the snapshot crashed before it replaced
+    # the journal
+    if get_journal_generation(journal_path) <= snapshot_generation:
+        return 0
+    num_entries = 0
+    with open(journal_path, 'r') as f:
+        for i, line in enumerate(f):
+            # A crash while appending can leave a last entry without its
+            # newline, which was never applied
+            if not line.endswith("\n"):
+                break
+            entry = line.split()
+            if i == 0 and entry[:1] == [GENERATION]:
+                continue
+            try:
+                if entry[0] == "BOOK":
+                    movie_theater.make_reservation(entry[1], int(entry[2]))
+                elif entry[0] == "CANCEL":
+                    movie_theater.cancel_reservation(entry[1])
+                elif entry[0] == "MODIFY":
+                    movie_theater.modify_reservation(entry[1],
+                        int(entry[2]))
+                else:
+                    raise ValueError(line)
+            except (IndexError, ValueError):
+                raise Exception("Invalid journal entry: " + line.strip())
+            except Exception:
+                # The request failed the same way when it was first made
+                pass
+            num_entries += 1
+    return num_entries
+
+def restore(snapshot_path, journal_path, layout=None,
+    engine=MovieTheaterSeating, placement="first"):
+    """ Recovers a theater from its last snapshot and its journal
+
+    Parameters
+    ----------
+    snapshot_path : str
+        The path to the snapshot file
+    journal_path : str
+        The path to the journal file
+    layout : TheaterLayout
+        The geometry of the theater if there is no snapshot yet
+    engine : class
+        The seating engine of the recovered theater
+    placement : str
+        The placement strategy of the theater if there is no snapshot yet.
+        A snapshot holds the strategy of the theater it was saved from
+
+    Returns
+    -------
+    movie_theater : MovieTheaterSeating
+        The theater in the state it was in after the last journaled request
+    """
+    snapshot_generation = 0
+    if os.path.exists(snapshot_path):
+        movie_theater = load_snapshot(snapshot_path, engine)
+        snapshot_generation = get_snapshot_generation(snapshot_path)
+    else:
+        movie_theater = engine(layout=layout, placement=placement)
+    if os.path.exists(journal_path):
+        replay_journal(movie_theater, journal_path, snapshot_generation)
+    return movie_theater
+
+def main():
+    """ Main function to recover a theater and write its reservations
+
+    Parameters
+    ----------
+    None
+
+    Raises
+    ------
+    Exception
+        If the wrong number of arguments is provided in the terminal
+
+    Returns
+    -------
+    None
+    """
+    if len(sys.argv) < 3 or len(sys.argv) > 4:
+        raise Exception("Usage: python3 seating_snapshot.py " + \
+            "<snapshot_file> <journal_file> [output_file]")
+    movie_theater = restore(sys.argv[1], sys.argv[2])
+    movie_theater.write_output(sys.argv[3] if len(sys.argv) == 4 else None)
+
+if __name__ == "__main__":
+    main()
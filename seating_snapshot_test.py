@@ -0,0 +1,224 @@
+'''
+Description: This script contains unit tests for the seating_snapshot.py
+script.
+python3 seating_snapshot_test.py
+'''
+
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from movie_theater_seating import MovieTheaterSeating
+from seating_snapshot import SeatingJournal, save_snapshot, load_snapshot, \
+    replay_journal, restore, HEADER, HEADER_V1, HEADER_V2
+
+THIS_DIR = Path(__file__)
+
+class TestSeatingSnapshot(unittest.TestCase):
+    """
+    Tests the functions in seating_snapshot.py.
+    """
+    def setUp(self):
+        """
+        Prepares the context for each test to be run under
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.tmp_dir.name)
+        self.snapshot_path = self.output_dir / "theater.snapshot"
+        self.journal_path = self.output_dir / "theater.journal"
+        self.movie_theater = MovieTheaterSeating()
+        self.movie_theater.process_requests(THIS_DIR.parent /
+            'test_data/input.txt', self.output_dir / "output.txt")
+
+    def tearDown(self):
+        """
+        Removes the files written by each test
+        """
+        self.tmp_dir.cleanup()
+
+    def assertSameState(self, movie_theater, other):
+        """
+        Checks that two theaters are in the same state
+        """
+        self.assertEqual(movie_theater.layout.seats_per_row,
+            other.layout.seats_per_row)
+        self.assertEqual(movie_theater.available_seats,
+            other.available_seats)
+        self.assertEqual(list(movie_theater.reservation_details.items()),
+            list(other.reservation_details.items()))
+        self.assertEqual(movie_theater.reservation_ids,
+            other.reservation_ids)
+        self.assertEqual(movie_theater.bookings, other.bookings)
+        self.assertEqual(movie_theater.row_index, other.row_index)
+        for row_id, row_seats in movie_theater.seating_map.items():
+            other_seats = other.seating_map[row_id]
+            self.assertEqual(row_seats.occupancy, other_seats.occupancy)
+            self.assertEqual(row_seats.run_starts, other_seats.run_starts)
+            self.assertEqual(row_seats.run_ends, other_seats.run_ends)
+            self.assertEqual(row_seats.capacities, other_seats.capacities)
+            self.assertEqual(row_seats.free, other_seats.free)
+
+    def test_save_and_load_snapshot(self):
+        """
+        Tests the save_snapshot and load_snapshot functions.
+        """
+        self.movie_theater.cancel_reservation("R003")
+        self.movie_theater.make_reservation("R100", 6)
+        self.assertEqual(save_snapshot(self.movie_theater,
+            self.snapshot_path), str(self.snapshot_path.resolve()))
+        restored = load_snapshot(self.snapshot_path)
+        self.assertSameState(self.movie_theater, restored)
+        # Both theaters seat the next requests the same way
+        for res_id, num_seats in (("R101", 3), ("R102", 20), ("R103", 1)):
+            self.assertEqual(restored.make_reservation(res_id, num_seats),
+                self.movie_theater.make_reservation(res_id, num_seats))
+        self.assertSameState(self.movie_theater, restored)
+
+    def test_load_snapshot_without_details(self):
+        """
+        Tests restoring a theater that does not keep its details in memory.
+        """
+        movie_theater = MovieTheaterSeating(retain_details=False)
+        movie_theater.process_requests(THIS_DIR.parent /
+            'test_data/input.txt', self.output_dir / "output.txt")
+        save_snapshot(movie_theater, self.snapshot_path)
+        restored = load_snapshot(self.snapshot_path)
+        self.assertFalse(restored.retain_details)
+        self.assertSameState(movie_theater, restored)
+        with self.assertRaises(Exception):
+            restored.make_reservation("R001", 1)
+
+    def test_load_snapshot_errors(self):
+        """
+        Tests that files that are not snapshots are rejected.
+        """
+        self.snapshot_path.write_bytes(b"")
+        with self.assertRaises(Exception):
+            load_snapshot(self.snapshot_path)
+        self.snapshot_path.write_bytes(b"R001 2\n" * 10)
+        with self.assertRaises(Exception):
+            load_snapshot(self.snapshot_path)
+        save_snapshot(self.movie_theater, self.snapshot_path)
+        data = bytearray(self.snapshot_path.read_bytes())
+        struct.pack_into("<H", data, 4, 99)
+        self.snapshot_path.write_bytes(bytes(data))
+        with self.assertRaisesRegex(Exception, "version 99"):
+            load_snapshot(self.snapshot_path)
+
+    def test_seating_journal(self):
+        """
+        Tests the SeatingJournal class and the restore function.
+        """
+        with SeatingJournal(self.movie_theater, self.journal_path) as journal:
+            self.assertEqual(journal.generation, 1)
+            journal.checkpoint(self.snapshot_path)
+            self.assertEqual(journal.generation, 2)
+            self.assertEqual(self.journal_path.read_text(), "GENERATION 2\n")
+            journal.make_reservation("R100", 4)
+            journal.cancel_reservation("R002")
+            journal.modify_reservation("R001", 3)
+            with self.assertRaises(Exception):
+                journal.make_reservation("R100", 1)
+            with self.assertRaises(Exception):
+                journal.modify_reservation("R100", 200)
+        self.assertEqual(self.journal_path.read_text().splitlines(),
+            ["GENERATION 2", "BOOK R100 4", "CANCEL R002", "MODIFY R001 3", "BOOK R100 1",
+            "MODIFY R100 200"])
+        restored = restore(self.snapshot_path, self.journal_path)
+        self.assertSameState(self.movie_theater, restored)
+
+    def test_checkpoint_crash(self):
+        """
+        Tests that a checkpoint that crashed after saving the snapshot and
+        before replacing the journal does not replay the journal again.
+        """
+        with SeatingJournal(self.movie_theater, self.journal_path) as journal:
+            with self.assertRaises(Exception):
+                journal.modify_reservation("R001", 5)
+            journal.cancel_reservation("R003")
+            # The first step of checkpoint, without replacing the journal.
+            # Replaying the journal again would move R001 to the seats of
+            # R003, now that they are free
+            save_snapshot(self.movie_theater, self.snapshot_path,
+                journal.generation)
+        restored = restore(self.snapshot_path, self.journal_path)
+        self.assertSameState(self.movie_theater, restored)
+        self.assertEqual(replay_journal(restored, self.journal_path, 1), 0)
+        # The journal is carried on and replaced at the next checkpoint
+        with SeatingJournal(self.movie_theater, self.journal_path) as journal:
+            self.assertEqual(journal.generation, 1)
+            journal.make_reservation("R101", 2)
+            journal.checkpoint(self.snapshot_path)
+            journal.cancel_reservation("R101")
+        restored = restore(self.snapshot_path, self.journal_path)
+        self.assertSameState(self.movie_theater, restored)
+
+    def test_restore_placement(self):
+        """
+        Tests that a restored theater keeps its placement strategy, so the
+        journal is replayed into the same seats.
+        """
+        movie_theater = MovieTheaterSeating(placement="center")
+        with SeatingJournal(movie_theater, self.journal_path) as journal:
+            journal.make_reservation("R1", 4)
+            journal.checkpoint(self.snapshot_path)
+            self.assertEqual(journal.make_reservation("R2", 2), "J4 J5")
+        restored = restore(self.snapshot_path, self.journal_path)
+        self.assertEqual(restored.placement, "center")
+        self.assertSameState(movie_theater, restored)
+        # Without a snapshot the placement is passed in, and the journal
+        # after the checkpoint seats R2 in the center of an empty row
+        self.snapshot_path.unlink()
+        restored = restore(self.snapshot_path, self.journal_path,
+            placement="center")
+        self.assertEqual(restored.placement, "center")
+        self.assertEqual(restored.reservation_details["R2"], "J10 J11")
+
+    def test_load_snapshot_version_1(self):
+        """
+        Tests that snapshots written before the placement strategy was
+        saved are still restored.
+        """
+        save_snapshot(self.movie_theater, self.snapshot_path)
+        data = bytearray(self.snapshot_path.read_bytes())
+        struct.pack_into("<H", data, 4, 1)
+        # The version 1 header has no placement strategy
+        del data[HEADER_V1.size:HEADER.size]
+        self.snapshot_path.write_bytes(bytes(data))
+        restored = load_snapshot(self.snapshot_path)
+        self.assertEqual(restored.placement, "first")
+        self.assertSameState(self.movie_theater, restored)
+
+    def test_load_snapshot_version_2(self):
+        """
+        Tests that snapshots written before the journal generation was saved
+        are still restored and hold none of the journal.
+        """
+        self.movie_theater.placement = "best_fit"
+        save_snapshot(self.movie_theater, self.snapshot_path, 3)
+        data = bytearray(self.snapshot_path.read_bytes())
+        struct.pack_into("<H", data, 4, 2)
+        # The version 2 header has no journal generation
+        del data[HEADER_V2.size:HEADER.size]
+        self.snapshot_path.write_bytes(bytes(data))
+        self.journal_path.write_text("BOOK R100 2\n")
+        restored = restore(self.snapshot_path, self.journal_path)
+        self.assertEqual(restored.placement, "best_fit")
+        self.assertEqual(self.movie_theater.make_reservation("R100", 2),
+            restored.reservation_details["R100"])
+        self.assertSameState(self.movie_theater, restored)
+
+    def test_replay_journal(self):
+        """
+        Tests the replay_journal function.
+        """
+        self.journal_path.write_text("BOOK R001 2\nBOOK R002 3\nBOOK R003")
+        movie_theater = restore(self.snapshot_path, self.journal_path)
+        # The last entry was cut off before its newline and is skipped
+        self.assertEqual(movie_theater.reservation_ids, {"R001", "R002"})
+        self.journal_path.write_text("SELL R001 2\n")
+        with self.assertRaises(Exception):
+            replay_journal(movie_theater, self.journal_path)
+
+if __name__ == '__main__':
+    unittest.main()